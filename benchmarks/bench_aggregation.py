@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+Сравнение движков агрегации pl_json (AGG_ENGINE): "python" (build_university)
+и "numpy" (build_university_columnar). Нужны results/universities.json и rating_*.json
+от предыдущего прогона pl_json.py.
+
+    python benchmarks/bench_aggregation.py [--repeat 5]
+
+Рейтинги заранее читаются в общий кэш, так что время — только извлечение баллов
+и агрегация. Печатает JSON с лучшим временем, пиковой памятью (tracemalloc) и
+флагом побайтного совпадения university_*.json и вкладов в GLOBAL.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import pl_json
+import score_columns
+
+def dump(result) -> str:
+    uni_out, contrib = result
+    return json.dumps([uni_out, pl_json.contrib_to_json(contrib)], ensure_ascii=False, indent=2)
+
+def run(build, unis, rating_cache) -> list:
+    return [build(uni, rating_cache) for uni in unis]
+
+def measure(build, unis, rating_cache, repeat: int) -> dict:
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        run(build, unis, rating_cache)
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    # пик по одному университету за раз: выходы не копятся между итерациями
+    peak = 0
+    for uni in unis:
+        tracemalloc.start()
+        build(uni, rating_cache)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return {"seconds": round(best, 4), "peak_kb_per_university": round(peak / 1024, 1)}
+
+def main(args):
+    unis = pl_json.load_json_sync(os.path.join(pl_json.RESULTS_DIR, "universities.json"))
+    if not unis:
+        sys.exit("Нет results/universities.json — сначала python pl_json.py")
+    rating_cache = pl_json.new_rating_cache()
+    reference = run(pl_json.build_university, unis, rating_cache)
+
+    engines = {"python": pl_json.build_university}
+    if score_columns.available():
+        engines["numpy"] = pl_json.build_university_columnar
+    results = []
+    for name, build in engines.items():
+        out = run(build, unis, rating_cache)
+        identical = all(dump(a) == dump(b) for a, b in zip(reference, out))
+        results.append({"engine": name, "universities": len(unis), "identical": identical,
+                        **measure(build, unis, rating_cache, args.repeat)})
+    print(json.dumps({"engines": results, "rating_cache": rating_cache.counters()}, ensure_ascii=False, indent=2))
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--repeat", type=int, default=5)
+    main(ap.parse_args())
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+rating_core.clean_text / norm_space (и parse.clean_text) против прежней реализации
+(копия ниже — эталон): get_text(" ", strip=True) -> replace("\\n") -> re.sub(r"\\s+").
+
+Проверка совпадения:
+  * все ячейки .cell и p.university-name из reports*.html, <td>/<th> и заголовки
+    рейтингов (дерево BeautifulSoup), элементы index.html;
+  * norm_space на каждом символе Unicode, окружённом текстом, и на случайных строках
+    из пробельных символов и букв.
+Затем время на всех ячейках reports: прежний и новый clean_text.
+
+    python benchmarks/bench_clean_text.py [--repeat 5] [--ratings 200]
+"""
+import os
+import re
+import sys
+import glob
+import json
+import time
+import random
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import parse
+import rating_core
+from html_backend import make_soup
+
+# --------- Эталон: прежняя реализация ---------
+def legacy_norm_space(s):
+    if s is None:
+        return None
+    return re.sub(r"\s+", " ", s.replace("\n", " ")).strip()
+
+def legacy_clean_text(tag):
+    if tag is None:
+        return None
+    if hasattr(tag, "get_text"):
+        return legacy_norm_space(tag.get_text(" ", strip=True))
+    return legacy_norm_space(str(tag))
+
+# --------- Входы ---------
+def collect_tags(n_ratings: int) -> tuple[list, list]:
+    """(ячейки reports — для замера, все проверяемые теги)"""
+    cells, tags = [], []
+    for path in sorted(glob.glob("reports*.html")):
+        with open(path, encoding="utf-8") as f:
+            soup = make_soup(f.read())
+        for card in soup.select("li.card-item"):
+            tags.append(card.select_one("p.university-name"))
+            for row in card.select(".rows.border-top, .rows:has(.d-lg-flex)"):
+                cells.extend(row.select(".cell"))
+    tags.extend(cells)
+    for path in sorted(glob.glob(os.path.join("downloaded", "personalcabinet_report_Ranjir*.html")))[:n_ratings]:
+        with open(path, encoding="utf-8") as f:
+            soup = make_soup(f.read())
+        tags.extend(soup.select("div.text-right span, p.headerColor b, div.cityColir, tbody td, tbody th"))
+    with open("index.html", encoding="utf-8") as f:
+        soup = make_soup(f.read())
+    tags.extend(soup.select("li.universities-item a, li.universities-item p, li.universities-item div"))
+    return cells, tags
+
+def synthetic_strings(rnd: random.Random, n: int) -> list[str]:
+    out = [f"a{chr(cp)}b {chr(cp)}" for cp in range(0x110000) if not 0xD800 <= cp <= 0xDFFF]
+    alphabet = [" ", "\n", "\t", "\r", "\x0b", "\x0c", "\x1c", "\x85", "\xa0", " ", "　", "x", "Ж", "1"]
+    out += ["".join(rnd.choice(alphabet) for _ in range(rnd.randint(0, 12))) for _ in range(n)]
+    return out
+
+def best_time(fn, items: list, repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for x in items:
+            fn(x)
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--ratings", type=int, default=200, help="сколько страниц рейтинга проверить через дерево")
+    args = ap.parse_args()
+
+    cells, tags = collect_tags(args.ratings)
+    strings = synthetic_strings(random.Random(1), 50000)
+    mismatches = {
+        "tags": sum(rating_core.clean_text(t) != legacy_clean_text(t) for t in tags),
+        "tags_parse_py": sum(parse.clean_text(t) != legacy_clean_text(t) for t in tags if t),
+        "strings": sum(rating_core.norm_space(s) != legacy_norm_space(s) for s in strings),
+    }
+    legacy = best_time(legacy_clean_text, cells, args.repeat)
+    fast = best_time(rating_core.clean_text, cells, args.repeat)
+    print(json.dumps({
+        "tags_checked": len(tags),
+        "strings_checked": len(strings),
+        "mismatches": mismatches,
+        "report_cells": len(cells),
+        "seconds": {"legacy": round(legacy, 4), "clean_text": round(fast, 4)},
+        "speedup": round(legacy / fast, 2),
+    }, indent=2))
+    if any(mismatches.values()):
+        sys.exit(1)
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+direction_text против прежних parse_threshold / parse_specialty (копии ниже — эталон).
+
+Тексты берутся из всех reports*.html (ячейки порога и специальности, как в
+parse_faculties_from_report) плюс случайные строки из тех же кусков. Проверяется
+полное совпадение результатов во всех трёх формах (pl_json/parse.py dict, pl_sql tuple,
+parse.py 4-tuple), затем время на поток строк в порядке страниц: прежние regex,
+новый разбор без кэша и с кэшем.
+
+    python benchmarks/bench_direction_text.py [--repeat 5] [--fuzz 20000]
+"""
+import os
+import re
+import sys
+import glob
+import json
+import time
+import random
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import direction_text
+import parse
+import pl_json
+import pl_sql
+from html_backend import make_soup
+from rating_core import clean_text
+
+# --------- Эталон: прежняя реализация ---------
+def legacy_threshold(text):
+    if not text:
+        return None
+    res = {"main_score": None, "extra_required": None, "extra_count": 0, "subjects": {}}
+    m = re.search(r"Негизги балл-(\d+)", text)
+    if m:
+        res["main_score"] = int(m.group(1))
+    if "Доп. предмет не обязательно" in text:
+        res["extra_required"] = False
+    elif "Кошумча" in text:
+        res["extra_required"] = True
+    m2 = re.search(r"Кошумча\s*.-(\d+)\s*сабак", text)
+    if m2:
+        res["extra_count"] = int(m2.group(1))
+    for subj, score in re.findall(r"([А-Яа-яЁёA-Za-z.\s]+)-(\d+)", text):
+        subj = subj.strip()
+        if subj.startswith("Негизги") or subj.startswith("Кошумча"):
+            continue
+        res["subjects"][subj] = int(score)
+    return res
+
+def legacy_threshold_sql(text):
+    if not text:
+        return None, None, None
+    r = legacy_threshold(text)
+    m2 = re.search(r"Кошумча\s*.-(\d+)\s*сабак", text)
+    return r["main_score"], int(m2.group(1)) if m2 else None, r["subjects"] or None
+
+def legacy_specialty(full_text):
+    if not full_text:
+        return None, None, None, False
+    voucher = "Ваучер" in full_text
+    mm = re.match(r"^(.*?)\[", full_text)
+    major = mm.group(1).strip() if mm else full_text.strip()
+    sm = re.search(r"\[(.*?)\]", full_text)
+    specialty = sm.group(1).strip() if sm else None
+    types = re.findall(r"\((.*?)\)", full_text)
+    if types:
+        types = [t.strip() for t in types if "Ваучер" not in t]
+        education_type = ", ".join(types) if types else None
+    else:
+        education_type = None
+    return major, specialty, education_type, voucher
+
+# --------- Тексты ---------
+def report_texts() -> tuple[list[str], list[str]]:
+    thresholds, specialties = [], []
+    for path in sorted(glob.glob("reports*.html")):
+        with open(path, encoding="utf-8") as f:
+            soup = make_soup(f.read())
+        for row in soup.select(".rows.border-top, .rows:has(.d-lg-flex)"):
+            cols = row.select(".cell")
+            if len(cols) > 1:
+                specialties.append(clean_text(cols[1]))
+            if len(cols) > 5:
+                thresholds.append(clean_text(cols[5]))
+    return thresholds, specialties
+
+def fuzz_texts(seed_texts: list[str], n: int, rnd: random.Random) -> list[str]:
+    pieces = [p for t in seed_texts if t for p in re.split(r"(\s+|-|\[|\]|\(|\))", t) if p]
+    pieces += ["Негизги балл-", "Кошумча", ".-", "сабак", "-", "[", "]", "(", ")", "\n", " ", "Ваучер",
+               "Доп. предмет не обязательно", "12", "0", "ү"]
+    return [""] + ["".join(rnd.choice(pieces) for _ in range(rnd.randint(1, 14))) for _ in range(n)]
+
+def check(thresholds: list[str], specialties: list[str]) -> int:
+    bad = 0
+    for t in thresholds:
+        direction_text.threshold_info.cache_clear()
+        if pl_json.parse_threshold(t) != legacy_threshold(t) or parse.parse_threshold(t) != legacy_threshold(t):
+            bad += 1
+        elif pl_sql.parse_threshold(t) != legacy_threshold_sql(t):
+            bad += 1
+    for t in specialties:
+        want = legacy_specialty(t)
+        if parse.parse_specialty(t) != want or pl_json.parse_specialty(t) != want[:3] \
+                or pl_sql.parse_specialty(t) != want[:3]:
+            bad += 1
+    return bad
+
+def best_time(fn, texts: list[str], repeat: int, before=None) -> float:
+    best = None
+    for _ in range(repeat):
+        if before:
+            before()
+        t0 = time.perf_counter()
+        for t in texts:
+            fn(t)
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best
+
+def clear_caches() -> None:
+    direction_text.threshold_info.cache_clear()
+    direction_text.specialty_info.cache_clear()
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--fuzz", type=int, default=20000)
+    args = ap.parse_args()
+
+    thresholds, specialties = report_texts()
+    rnd = random.Random(1)
+    mismatches = {
+        "reports": check(thresholds, specialties),
+        "fuzz": check(fuzz_texts(thresholds, args.fuzz, rnd), fuzz_texts(specialties, args.fuzz, rnd)),
+    }
+    rows = list(zip(thresholds, specialties))
+
+    def legacy_row(pair):
+        legacy_threshold(pair[0])
+        legacy_specialty(pair[1])
+
+    def new_row(pair):
+        pl_json.parse_threshold(pair[0])
+        pl_json.parse_specialty(pair[1])
+
+    def new_row_uncached(pair):
+        clear_caches()
+        new_row(pair)
+
+    result = {
+        "rows": len(rows),
+        "distinct_thresholds": len(set(thresholds)),
+        "distinct_specialties": len(set(specialties)),
+        "mismatches": mismatches,
+        "seconds": {
+            "legacy_regex": round(best_time(legacy_row, rows, args.repeat), 5),
+            "direction_text_uncached": round(best_time(new_row_uncached, rows, args.repeat), 5),
+            "direction_text_cached": round(best_time(new_row, rows, args.repeat, clear_caches), 5),
+        },
+    }
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if any(mismatches.values()):
+        sys.exit(1)
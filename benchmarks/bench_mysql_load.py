@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Сравнение загрузчиков заявок pl_sql: "row" (insert_application), "bulk"
+(insert_applications_bulk) и "infile" (InfileBatch + load_infile в одной транзакции,
+вторичные индексы сняты на время загрузки — как полный реимпорт в пустые таблицы).
+
+Нужен MySQL/MariaDB с local_infile=ON, например:
+    docker run --rm -e MYSQL_ROOT_PASSWORD=root -p 8889:3306 mysql:8 --local-infile=1
+    python benchmarks/bench_mysql_load.py --rows 50000 --db admissions_bench
+
+Бенчмарк создаёт в указанной базе минимальные таблицы applications + 4 таблицы связей
+(колонки как в pl_sql), очищает их перед каждым прогоном и печатает JSON с временем
+и строками/с для каждого загрузчика.
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import aiomysql
+import pl_sql
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS applications (
+        id BIGINT AUTO_INCREMENT PRIMARY KEY,
+        certificate_no VARCHAR(32), main_score INT, extra_score INT, total_score INT,
+        category VARCHAR(128), date_text VARCHAR(32), admitted TINYINT,
+        specialty_ids JSON, faculty_ids JSON, university_ids JSON, raw_data MEDIUMTEXT,
+        natural_key BINARY(16), UNIQUE KEY uq_applications_natural_key (natural_key),
+        KEY idx_certificate (certificate_no), KEY idx_total (total_score)
+    )""",
+    """CREATE TABLE IF NOT EXISTS specialty_applications (
+        specialty_id BIGINT, application_id BIGINT, KEY idx_sa (specialty_id, application_id))""",
+    """CREATE TABLE IF NOT EXISTS application_specialties (
+        application_id BIGINT, specialty_id BIGINT, KEY idx_as (application_id, specialty_id))""",
+    """CREATE TABLE IF NOT EXISTS application_faculties (
+        application_id BIGINT, faculty_id BIGINT, KEY idx_af (application_id, faculty_id))""",
+    """CREATE TABLE IF NOT EXISTS application_universities (
+        application_id BIGINT, university_id BIGINT, KEY idx_au (application_id, university_id))""",
+]
+
+ROWS_PER_SPECIALTY = 40
+
+def synthetic_rows(n: int, seed: int = 1) -> list[dict]:
+    rnd = random.Random(seed)
+    rows = []
+    for i in range(n):
+        main = rnd.randint(110, 245)
+        extra = rnd.choice([0, rnd.randint(60, 240)])
+        rows.append({
+            "certificate": str(5_000_000 + i),
+            "main_score": main,
+            "extra_score": extra,
+            "total_score": main + extra,
+            "category": rnd.choice(["Бишкек", "Малый город", "Село", "Высокогорье"]),
+            "date": "15.07.2025 10:28:01",
+            "admitted": rnd.randint(0, 1),
+            "raw_html": f'<tr class="coloredRowText">\n<th scope="row">{i}</th>\n<td>{5_000_000 + i}</td>\n</tr>'
+        })
+    return rows
+
+def by_specialty(rows: list[dict]):
+    for k in range(0, len(rows), ROWS_PER_SPECIALTY):
+        spec = k // ROWS_PER_SPECIALTY + 1
+        yield spec, rows[k:k + ROWS_PER_SPECIALTY]
+
+async def reset(pool):
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            for ddl in SCHEMA:
+                await cur.execute(ddl)
+            for table in pl_sql.INFILE_TABLES:
+                await cur.execute(f"TRUNCATE TABLE `{table}`")
+        await conn.commit()
+
+async def run_row(pool, rows):
+    async with pool.acquire() as conn:
+        await conn.begin()
+        async with conn.cursor() as cur:
+            for spec, chunk in by_specialty(rows):
+                for r in chunk:
+                    await pl_sql.insert_application(
+                        cur, certificate_no=r["certificate"], main_score=r["main_score"],
+                        extra_score=r["extra_score"], total_score=r["total_score"], category=r["category"],
+                        date_text=r["date"], admitted=r["admitted"], specialty_id=spec, faculty_id=1,
+                        university_id=1, raw_html=r["raw_html"]
+                    )
+        await conn.commit()
+
+async def run_bulk(pool, rows):
+    async with pool.acquire() as conn:
+        await conn.begin()
+        async with conn.cursor() as cur:
+            for spec, chunk in by_specialty(rows):
+                await pl_sql.insert_applications_bulk(cur, chunk, specialty_id=spec, faculty_id=1, university_id=1)
+        await conn.commit()
+
+async def run_infile(pool, rows):
+    await pl_sql.drop_secondary_indexes(pool)
+    try:
+        async with pool.acquire() as conn:
+            await conn.begin()
+            async with conn.cursor() as cur:
+                batch = pl_sql.InfileBatch()
+                for spec, chunk in by_specialty(rows):
+                    batch.add(chunk, specialty_id=spec, faculty_id=1, university_id=1)
+                await pl_sql.load_infile(cur, batch)
+            await conn.commit()
+    finally:
+        await pl_sql.restore_secondary_indexes(pool)
+
+LOADERS = {"row": run_row, "bulk": run_bulk, "infile": run_infile}
+
+async def main(args):
+    dsn = dict(pl_sql.MYSQL_DSN, db=args.db)
+    pool = await aiomysql.create_pool(**dsn, maxsize=2)
+    rows = synthetic_rows(args.rows)
+    results = []
+    try:
+        for name in args.loaders:
+            await reset(pool)
+            t0 = time.perf_counter()
+            await LOADERS[name](pool, rows)
+            dt = time.perf_counter() - t0
+            results.append({"loader": name, "rows": len(rows), "seconds": round(dt, 3),
+                            "rows_per_sec": round(len(rows) / dt, 1)})
+            print(f"✅ {name}: {dt:.2f}s", file=sys.stderr)
+    finally:
+        pool.close()
+        await pool.wait_closed()
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rows", type=int, default=20000)
+    ap.add_argument("--db", default="admissions_bench")
+    ap.add_argument("--loaders", nargs="+", default=list(LOADERS), choices=list(LOADERS))
+    asyncio.run(main(ap.parse_args()))
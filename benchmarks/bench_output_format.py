@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Сравнение форматов вывода output_format: время сериализации / чтения и размер.
+Нужны results/rating_*.json, universities/*.json и results/stats.json от прогона pl_json.py
+(RATINGS_FORMAT = "json").
+
+    python benchmarks/bench_output_format.py [--repeat 3] [--limit 500]
+
+Варианты:
+  stdlib   — json.dumps(ensure_ascii=False, indent=2), как было
+  pretty   — dumps_json(pretty=True) (orjson, если установлен; байты те же)
+  compact  — dumps_json(pretty=False)
+  ndjson / msgpack — только для рейтингов (msgpack — если установлен)
+Печатает JSON: секунды на запись и чтение (лучшее из repeat), мегабайты и флаг
+совпадения прочитанных данных с исходными.
+"""
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import output_format
+from output_format import dump_rating, dumps_json, load_rating, loads_json
+
+def stdlib_dumps(obj) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+
+def best(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return round(min(times), 4)
+
+def measure(name: str, docs: list, dumps, loads, repeat: int) -> dict:
+    blobs = [dumps(d) for d in docs]
+    return {
+        "format": name,
+        "write_seconds": best(lambda: [dumps(d) for d in docs], repeat),
+        "read_seconds": best(lambda: [loads(b) for b in blobs], repeat),
+        "megabytes": round(sum(map(len, blobs)) / 2**20, 2),
+        "identical": all(loads(b) == d for b, d in zip(blobs, docs)),
+    }
+
+def load_all(paths: list[str]) -> list:
+    out = []
+    for p in paths:
+        with open(p, "rb") as f:
+            out.append(json.loads(f.read()))
+    return out
+
+def main(args):
+    rating_paths = sorted(glob.glob(os.path.join("results", "rating_*.json")))[:args.limit]
+    output_paths = sorted(glob.glob(os.path.join("universities", "*.json")))
+    stats_path = os.path.join("results", "stats.json")
+    if not rating_paths or not output_paths or not os.path.exists(stats_path):
+        sys.exit("Нет results/rating_*.json, universities/*.json или results/stats.json — сначала python pl_json.py")
+    ratings = load_all(rating_paths)
+    outputs = load_all(output_paths + [stats_path])
+
+    rating_variants = {
+        "stdlib": (stdlib_dumps, json.loads),
+        "pretty": (lambda d: dump_rating(d, "json"), lambda b: load_rating(b, "json")),
+        "compact": (lambda d: dump_rating(d, "json", pretty=False), lambda b: load_rating(b, "json")),
+    }
+    for fmt in output_format.available_formats():
+        if fmt != "json":
+            rating_variants[fmt] = (lambda d, fmt=fmt: dump_rating(d, fmt), lambda b, fmt=fmt: load_rating(b, fmt))
+    output_variants = {
+        "stdlib": (stdlib_dumps, json.loads),
+        "pretty": (dumps_json, loads_json),
+        "compact": (lambda d: dumps_json(d, pretty=False), loads_json),
+    }
+
+    results = {
+        "orjson": output_format.orjson is not None,
+        "ratings": {"files": len(ratings),
+                    "variants": [measure(n, ratings, d, l, args.repeat) for n, (d, l) in rating_variants.items()]},
+        "universities_and_stats": {"files": len(outputs),
+                                   "variants": [measure(n, outputs, d, l, args.repeat)
+                                                for n, (d, l) in output_variants.items()]},
+        "pretty_bytes_identical": all(dumps_json(d) == stdlib_dumps(d) for d in outputs + ratings),
+    }
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--limit", type=int, default=None, help="сколько рейтингов взять (по умолчанию все)")
+    main(ap.parse_args())
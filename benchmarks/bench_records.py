@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Модель записей рейтинга: сколько памяти держат разобранные документы всех рейтингов
+(как в pl_json.parse_all_ratings до записи rating_*.json) и сколько стоит извлечь из них
+допущенные баллы (pl_json.extract_rating_scores, вход стадии 3).
+
+    python benchmarks/bench_records.py [--repeat 3] [--limit N]
+
+Печатает JSON: время разбора, удерживаемая память (tracemalloc, после gc), время
+извлечения баллов и md5 сериализованных документов — по нему сравниваются прогоны
+разных коммитов (вывод rating_*.json должен совпадать).
+"""
+import os
+import gc
+import sys
+import json
+import time
+import hashlib
+import argparse
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import pl_json
+from output_format import dump_rating
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--limit", type=int, default=None)
+    args = ap.parse_args()
+
+    paths = pl_json.list_rating_files()[:args.limit]
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    docs = pl_json.parse_rating_chunk(paths)
+    parse_seconds = time.perf_counter() - t0
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    best = None
+    for _ in range(args.repeat):
+        t0 = time.perf_counter()
+        for d in docs:
+            pl_json.extract_rating_scores(d)
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+
+    digest = hashlib.md5()
+    for d in docs:
+        digest.update(dump_rating(d, "json", pretty=True))
+    rows = sum(len(t["records"]) for d in docs for t in d["tables"])
+    print(json.dumps({
+        "files": len(paths),
+        "rows": rows,
+        "parse_seconds": round(parse_seconds, 3),
+        "retained_kb": retained // 1024,
+        "bytes_per_row": round(retained / rows, 1) if rows else None,
+        "extract_scores_seconds": round(best, 4),
+        "json_md5": digest.hexdigest(),
+    }, indent=2))
@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""
+Генератор синтетического корпуса: index.html, reports*.html и
+downloaded/personalcabinet_report_Ranjir{b,k}_*.html с той же разметкой, на которую
+опираются парсеры (li.universities-item / a.university-name, li.card-item / .rows / .cell,
+div.text-right span, p.headerColor b, table.table / div.cityColir / tbody tr).
+
+Масштаб 1 ≈ реальный корпус (77 вузов, ~2 500 рейтингов, ~30 000 заявок);
+--scale умножает число заявок в рейтинге, --pages — число направлений (и файлов).
+
+    python benchmarks/gen_corpus.py benchmarks/corpus/x10 --scale 10 [--pages 1] [--seed 1]
+"""
+import os
+import random
+import argparse
+from html import escape
+
+UNIVERSITIES = 77
+DIRECTIONS_PER_UNIVERSITY = 32         # ~2 477 рейтингов при pages=1
+FACULTIES_PER_UNIVERSITY = 5
+ROWS_PER_RATING = 20                   # среднее для непустого рейтинга при scale=1
+EMPTY_RATING_SHARE = 0.35              # доля рейтингов без заявок (как в реальных данных)
+FORMS = [("Контракт", 0.76), ("Бюджет", 0.19), ("Ваучер", 0.05)]
+CATEGORIES = [("Бишкек", 2.59), ("Малый город", 0.86), ("Село", 9.5), ("Высокогорье", 1.2)]
+MAJORS = ["Педагогика", "Агрономия", "Журналистика", "Экономика", "Юриспруденция", "Менеджмент",
+          "Информатика", "Медицина", "Архитектура", "Психология"]
+EDUCATION = ["Күндүзгү бакалавр", "Сырттан бакалавр", "Очная бакалавр"]
+SUBJECTS = ["Тарых", "Англ.тили", "Математика", "Химия", "Биология", "Физика"]
+
+RATING_HEAD = """<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8" /><title>Рейтинг</title></head>
+<body>
+    <div class="container-fluid print">
+        <div>
+            <div class="text-right">
+                <b>Утверждаю</b><br />
+                <span>{rector_title}</span><br />
+                <span>{rector}</span><br />
+                <span>_______________________</span><br />
+                <span>"______"________________</span><br />
+            </div>
+            <p class="text-center text-secondary" style="font-size: 24px ">
+                <b>Ранжированный по категориям список абитуриентов, участвующих в конкурсе ({form}. 1-тур).</b>
+            </p>
+            <p class="text-center headerColor m-0" style="font-size: 22px">
+                <b>{program}</b>
+            </p>
+            <p class="text-center headerColor m-0" style="font-size: 18px">
+                План набора абитуриентов по специальности: {plan} .
+            </p>
+        </div>
+"""
+RATING_TAIL = """    </div>
+</body>
+</html>
+"""
+BUDGET_TABLE_HEAD = """            <table class="table table-sm table-bordered text-center">
+                <thead class="thead-light">
+                    <tr>
+                        <th scope="col" colspan="7"><div class="text-center cityColir">{category}: {coef}</div></th>
+                    </tr>
+                    <tr>
+                        <th scope="col">п/п</th>
+                        <th scope="col">Номер сертификата</th>
+                        <th scope="col">Осн. балл</th>
+                        <th scope="col">Доп.балл</th>
+                        <th scope="col">Сумма баллов</th>
+                        <th scope="col">Дата регистрации</th>
+                    </tr>
+                </thead>
+                <tbody>
+"""
+CONTRACT_TABLE_HEAD = """            <table class="table table-sm table-bordered text-center">
+                <thead class="thead-light">
+                    <tr>
+                        <th scope="col">№</th>
+                        <th scope="col">Номер сертификата</th>
+                        <th scope="col">Осн. балл</th>
+                        <th scope="col">Доп.балл</th>
+                        <th scope="col">Сумма баллов</th>
+                        <th scope="col">Категория местности</th>
+                        <th scope="col">Дата</th>
+                    </tr>
+                </thead>
+                <tbody>
+"""
+TABLE_TAIL = """                </tbody>
+            </table>
+"""
+
+def weighted(rnd: random.Random, items: list[tuple]) -> str:
+    return rnd.choices([x for x, _ in items], weights=[w for _, w in items])[0]
+
+# --------- Рейтинг ---------
+def applicant(rnd: random.Random, cert: int) -> tuple:
+    main = rnd.randint(100, 245)
+    extra = 0 if rnd.random() < 0.5 else rnd.randint(60, 240)
+    date = f"{rnd.randint(10, 20)}.07.2025 {rnd.randint(0, 23):02d}:{rnd.randint(0, 59):02d}:{rnd.randint(0, 59):02d}"
+    return cert, rnd.random() < 0.7, main, extra, main + extra, date
+
+def row_html(num: int, app: tuple, category: str | None) -> str:
+    cert, admitted, main, extra, total, date = app
+    cls = "coloredRowText coloredRow" if admitted else "coloredRowText "
+    cells = [f"(Реком) {cert}" if admitted else f" {cert}", main, extra, total]
+    if category is not None:
+        cells.append(category)
+    cells.append(date)
+    tds = "".join(f"\n                            <td>{escape(str(c))}</td>" for c in cells)
+    return (f'                        <tr class="{cls}">\n'
+            f'                            <th scope="row">{num}</th>{tds}\n'
+            f'                        </tr>\n')
+
+def rating_html(rnd: random.Random, form: str, program: str, n_rows: int, next_cert) -> str:
+    out = [RATING_HEAD.format(rector_title="Ректор СИНТ", rector="Иванов И.И.", form=form,
+                              program=escape(program), plan=rnd.randint(5, 100))]
+    if n_rows:
+        apps = sorted((applicant(rnd, next_cert()) for _ in range(n_rows)), key=lambda a: -a[4])
+        if form == "Контракт":
+            out.append(CONTRACT_TABLE_HEAD)
+            out.extend(row_html(i + 1, a, weighted(rnd, CATEGORIES)) for i, a in enumerate(apps))
+            out.append(TABLE_TAIL)
+        else:
+            by_cat = {}
+            for a in apps:
+                by_cat.setdefault(weighted(rnd, CATEGORIES), []).append(a)
+            for cat, coef in CATEGORIES:
+                if cat in by_cat:
+                    out.append(BUDGET_TABLE_HEAD.format(category=cat, coef=coef))
+                    out.extend(row_html(i + 1, a, None) for i, a in enumerate(by_cat[cat]))
+                    out.append(TABLE_TAIL)
+    out.append(RATING_TAIL)
+    return "".join(out)
+
+# --------- reports*.html ---------
+def direction_html(code: str, specialty_text: str, form: str, amount: int, plan: int, threshold: str,
+                   registered: int, rating_href: str) -> str:
+    return f"""<div class="rows">
+<div class="d-lg-flex">
+<div class="d-flex">
+<div class="cell sm-text" style="width:70px">{code}</div>
+<div class="cell napr sm-text">{escape(specialty_text)} <span style="color: #ef7f1a;"></span></div>
+<div class="cell oplata sm-text">{form}</div>
+<div class="cell oplata sm-text">{amount}</div>
+<div class="cell sm-text" style="width:70px">{plan}</div>
+<div class="cell porog sm-text">{threshold}</div>
+<div class="cell plan sm-text">{registered} </div>
+</div>
+<div class="d-flex">
+<div class="sm-text mr-2 mb-2">
+<div class="yellow-color text-center">
+<a class="" href="{rating_href}" title="Көрүү">Көрүү</a>
+</div>
+</div>
+</div>
+</div>
+</div>
+"""
+
+def faculty_html(name: str, directions: list[str]) -> str:
+    return f"""<li class="card-item ml-2 mt-3">
+<div class="scrolling-wrapper">
+<div class="row mx-0">
+<div class="rows">
+<p class="university-name color-blue">{escape(name)}</p>
+</div>
+<div class="rows">
+<div class="cell sm-text opacity-5" style="width:70px">Шифр</div>
+<div class="cell napr sm-text opacity-5">Багыт/адистиги</div>
+</div>
+{"".join(directions)}</div>
+</div>
+</li>
+"""
+
+def university_li(name: str, report: str, uid: int) -> str:
+    return f"""        <li class="universities-item iso-item 1 ">
+            <p><a href="{report}?id_university={uid}" class="university-name name">{escape(name)}</a></p>
+            <div class="tn-text opacity-5">Адрес:</div>
+            <p class="sm-text">г. Бишкек, ул. Синтетическая {uid}</p>
+            <div class="tn-text opacity-5">Ректор:</div>
+            <p class="sm-text">Ректор {uid}</p>
+            <div class="tn-text opacity-5">Сайт::</div>
+            <a href="https://u{uid}.example.kg/" target="blank" class="sm-text">https://u{uid}.example.kg</a>
+        </li>
+"""
+
+# --------- Корпус ---------
+def generate(out_dir: str, scale: float = 1, pages: int = 1, seed: int = 1,
+             universities: int = UNIVERSITIES) -> dict:
+    """Пишет корпус в out_dir; возвращает счётчики (вузы, рейтинги, заявки, байты)"""
+    rnd = random.Random(seed)
+    os.makedirs(os.path.join(out_dir, "downloaded"), exist_ok=True)
+    cert = [5_000_000]
+
+    def next_cert() -> int:
+        cert[0] += 1
+        return cert[0]
+
+    counts = {"universities": universities, "ratings": 0, "applicants": 0, "bytes": 0}
+
+    def write(rel: str, text: str) -> None:
+        data = text.encode("utf-8")
+        counts["bytes"] += len(data)
+        with open(os.path.join(out_dir, rel), "wb") as f:
+            f.write(data)
+
+    index_items = []
+    rating_id = 1000
+    for u in range(1, universities + 1):
+        report = f"reports{u:04x}.html"
+        name = f"{u}. Синтетический университет №{u}"
+        index_items.append(university_li(name, report, u))
+        faculties = {}
+        for _ in range(DIRECTIONS_PER_UNIVERSITY * pages):
+            rating_id += 1
+            form = weighted(rnd, FORMS)
+            kind = "Ranjirk" if form == "Контракт" else "Ranjirb"
+            href = f"downloaded/personalcabinet_report_{kind}_i-{rating_id}_t-1.html"
+            major = rnd.choice(MAJORS)
+            specialty_text = f"{major} [{major} {rating_id % 7}] (\n{rnd.choice(EDUCATION)})"
+            subject = rnd.choice(SUBJECTS)
+            threshold = (f"Негизги балл-{rnd.choice([110, 120, 130])}  <br/>"
+                         + (f" Кошумча .-1 сабак {subject}-60" if rnd.random() < 0.4 else ""))
+            n_rows = 0 if rnd.random() < EMPTY_RATING_SHARE else max(1, int(rnd.expovariate(1 / ROWS_PER_RATING) * scale))
+            write(href, rating_html(rnd, form, f"{specialty_text} (Факультет {u})", n_rows, next_cert))
+            counts["ratings"] += 1
+            counts["applicants"] += n_rows
+            fac = f"{rnd.randint(1, FACULTIES_PER_UNIVERSITY)}. Факультет {u}"
+            faculties.setdefault(fac, []).append(direction_html(
+                str(500000 + rating_id % 300000), specialty_text, form,
+                0 if form != "Контракт" else rnd.choice([31000, 54000, 120000]),
+                rnd.randint(5, 100), threshold, n_rows, href))
+        write(report, '<html><head><meta charset="utf-8"/></head><body>\n'
+                      '<ul class="d-flex flex-wrap justify-content-start">\n'
+              + "".join(faculty_html(f, d) for f, d in sorted(faculties.items()))
+              + "</ul>\n</body></html>\n")
+
+    write("index.html", '<html><head><meta charset="utf-8"/></head><body>\n<ul>\n'
+          + "".join(index_items) + "</ul>\n</body></html>\n")
+    return counts
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("out_dir")
+    ap.add_argument("--scale", type=float, default=1)
+    ap.add_argument("--pages", type=int, default=1)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--universities", type=int, default=UNIVERSITIES)
+    args = ap.parse_args()
+    c = generate(args.out_dir, args.scale, args.pages, args.seed, args.universities)
+    print(f"✅ Корпус: {args.out_dir} — вузов {c['universities']}, рейтингов {c['ratings']}, "
+          f"заявок {c['applicants']}, {c['bytes'] / 2**20:.1f} МБ")
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+Набор бенчмарков pipeline на синтетическом корпусе (benchmarks/gen_corpus.py).
+
+Для каждого масштаба корпус генерируется один раз (benchmarks/corpus/x<N>, переиспользуется),
+затем в отдельном процессе прогоняются стадии pl_json по очереди:
+  ratings      — стадия 1: HTML рейтингов -> баллы в памяти + rating_*.json
+  universities — стадия 2: index.html + reports*.html -> universities.json
+  aggregate    — стадия 3: university_*.json + глобальные накопители
+  stats        — стадия 4: stats.json
+  score_index  — стадия 5: score_index.json
+  sqlite       — pl_sqlite.run_pipeline целиком (--sqlite)
+  export       — export_arrow.export_applications (--export, нужен pyarrow)
+Каждая стадия: время (perf_counter), прирост пикового RSS, при --tracemalloc — пик
+Python-аллокаций (замедляет прогон, поэтому по умолчанию выключен).
+
+Результат — JSON (коммит, окружение, корпус, стадии) в benchmarks/results/; два
+результата сравниваются по стадиям:
+    python benchmarks/run_bench.py --scales 1 10 [--sqlite] [--export] [--tracemalloc]
+    python benchmarks/run_bench.py --compare old.json new.json [--fail-over 1.2]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import resource
+import subprocess
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+CORPUS_DIR = os.path.join(HERE, "corpus")
+RESULTS_DIR = os.path.join(HERE, "results")
+DEFAULT_SCALES = [1, 10]
+
+def git_commit() -> str | None:
+    try:
+        out = subprocess.run(["git", "-C", ROOT, "rev-parse", "--short", "HEAD"],
+                             capture_output=True, text=True, check=True)
+        dirty = subprocess.run(["git", "-C", ROOT, "status", "--porcelain", "--untracked-files=no"],
+                               capture_output=True, text=True).stdout.strip()
+        return out.stdout.strip() + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def max_rss_kb() -> int:
+    # Linux: ru_maxrss в КБ; дочерние процессы (пул парсинга) — отдельно
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children)
+
+# --------- Корпус ---------
+def ensure_corpus(scale: float, pages: int, seed: int) -> tuple[str, dict]:
+    from gen_corpus import generate
+    path = os.path.join(CORPUS_DIR, f"x{scale:g}" + (f"_p{pages}" if pages != 1 else "") + f"_s{seed}")
+    meta_path = os.path.join(path, "corpus.json")
+    if os.path.exists(meta_path):
+        with open(meta_path, encoding="utf-8") as f:
+            return path, json.load(f)
+    t0 = time.perf_counter()
+    counts = generate(path, scale, pages, seed)
+    counts.update(scale=scale, pages=pages, seed=seed, generate_seconds=round(time.perf_counter() - t0, 3))
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(counts, f, ensure_ascii=False, indent=2)
+    return path, counts
+
+# --------- Прогон стадий (в дочернем процессе, cwd = корпус) ---------
+class Stages:
+    def __init__(self, use_tracemalloc: bool):
+        self.use_tracemalloc = use_tracemalloc
+        self.results = []
+
+    async def run(self, name: str, fn, *args):
+        if self.use_tracemalloc:
+            tracemalloc.start()
+        rss0 = max_rss_kb()
+        t0 = time.perf_counter()
+        result = fn(*args)
+        if asyncio.iscoroutine(result):
+            result = await result
+        dt = time.perf_counter() - t0
+        row = {"stage": name, "seconds": round(dt, 4), "rss_growth_kb": max_rss_kb() - rss0,
+               "max_rss_kb": max_rss_kb()}
+        if self.use_tracemalloc:
+            row["py_peak_kb"] = tracemalloc.get_traced_memory()[1] // 1024
+            tracemalloc.stop()
+        self.results.append(row)
+        print(f"  {name:<13} {dt:8.3f} с  RSS {row['max_rss_kb'] / 1024:7.1f} МБ", file=sys.stderr)
+        return result
+
+async def run_pipeline_stages(use_tracemalloc: bool, with_sqlite: bool, with_export: bool) -> list[dict]:
+    import pl_json
+    for d in (pl_json.RESULTS_DIR, pl_json.UNIVERSITIES_DIR, pl_json.CACHE_DIR):
+        os.makedirs(d, exist_ok=True)
+    st = Stages(use_tracemalloc)
+    handoff, pending = {}, []
+
+    async def ratings():
+        await pl_json.parse_all_ratings(manifest=None, handoff=handoff, pending=pending)
+        await asyncio.gather(*pending)
+        pending.clear()
+
+    await st.run("ratings", ratings)
+    universities = await st.run("universities", pl_json.build_universities_json, None, pending)
+    await asyncio.gather(*pending)
+    GLOBAL = await st.run("aggregate", pl_json.build_university_files_and_collect_global,
+                          universities, None, handoff)
+    await st.run("stats", pl_json.build_stats_json, GLOBAL)
+    await st.run("score_index", pl_json.build_score_index, universities, None, handoff)
+    if with_sqlite:
+        import pl_sqlite
+        await st.run("sqlite", pl_sqlite.run_pipeline)
+    if with_export:
+        import export_arrow
+        if export_arrow.pa is None:
+            st.results.append({"stage": "export", "skipped": "нет pyarrow"})
+        else:
+            await st.run("export", export_arrow.export_applications)
+    return st.results
+
+def worker(corpus: str, use_tracemalloc: bool, with_sqlite: bool, with_export: bool) -> None:
+    os.chdir(corpus)
+    stages = asyncio.run(run_pipeline_stages(use_tracemalloc, with_sqlite, with_export))
+    print(json.dumps(stages, ensure_ascii=False))
+
+# --------- Сравнение ---------
+def compare(old_path: str, new_path: str, fail_over: float | None) -> int:
+    with open(old_path, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)
+    print(f"{old.get('commit')} -> {new.get('commit')}")
+    old_runs = {r["corpus"]["scale"]: r for r in old["runs"]}
+    regressions = 0
+    for run in new["runs"]:
+        scale = run["corpus"]["scale"]
+        base = old_runs.get(scale)
+        if base is None:
+            continue
+        base_stages = {s["stage"]: s for s in base["stages"] if "seconds" in s}
+        print(f"x{scale:g}:")
+        for s in run["stages"]:
+            b = base_stages.get(s["stage"])
+            if b is None or "seconds" not in s:
+                continue
+            ratio = s["seconds"] / b["seconds"] if b["seconds"] else float("inf")
+            flag = ""
+            if fail_over is not None and ratio > fail_over:
+                flag = "  ❌"
+                regressions += 1
+            print(f"  {s['stage']:<13} {b['seconds']:8.3f} -> {s['seconds']:8.3f} с  x{ratio:5.2f}"
+                  f"  RSS {b['max_rss_kb'] / 1024:7.1f} -> {s['max_rss_kb'] / 1024:7.1f} МБ{flag}")
+    return 1 if regressions else 0
+
+# --------- Запуск ---------
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--scales", type=float, nargs="+", default=DEFAULT_SCALES)
+    ap.add_argument("--pages", type=int, default=1, help="множитель числа направлений/файлов")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--tracemalloc", action="store_true")
+    ap.add_argument("--sqlite", action="store_true")
+    ap.add_argument("--export", action="store_true")
+    ap.add_argument("--out", default=None, help="файл результата (по умолчанию benchmarks/results/...)")
+    ap.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    ap.add_argument("--fail-over", type=float, default=None, help="код выхода 1, если стадия медленнее в N раз")
+    ap.add_argument("--worker", metavar="CORPUS", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.compare:
+        return compare(*args.compare, args.fail_over)
+    if args.worker:
+        worker(args.worker, args.tracemalloc, args.sqlite, args.export)
+        return 0
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "tracemalloc": args.tracemalloc,
+        "runs": [],
+    }
+    for scale in args.scales:
+        corpus, counts = ensure_corpus(scale, args.pages, args.seed)
+        print(f"x{scale:g}: рейтингов {counts['ratings']}, заявок {counts['applicants']}, "
+              f"{counts['bytes'] / 2**20:.1f} МБ", file=sys.stderr)
+        cmd = [sys.executable, os.path.abspath(__file__), "--worker", corpus]
+        cmd += [flag for flag, on in (("--tracemalloc", args.tracemalloc), ("--sqlite", args.sqlite),
+                                      ("--export", args.export)) if on]
+        t0 = time.perf_counter()
+        proc = subprocess.run(cmd, capture_output=True, text=True, env={**os.environ, "PYTHONPATH": ROOT})
+        sys.stderr.write(proc.stderr)
+        if proc.returncode != 0:
+            print(f"❌ x{scale:g}: прогон упал", file=sys.stderr)
+            return proc.returncode
+        stages = json.loads(proc.stdout.strip().splitlines()[-1])
+        report["runs"].append({"corpus": counts, "wall_seconds": round(time.perf_counter() - t0, 3),
+                               "stages": stages})
+
+    out = args.out
+    if out is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        out = os.path.join(RESULTS_DIR, f"bench_{commit or 'nogit'}_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"✅ Результат: {out}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+LRU-кэш с бюджетом памяти в байтах.
+
+Размер значения считает переданная функция sizeof(value). При превышении бюджета
+вытесняются давно не использованные записи; значение больше всего бюджета
+не кэшируется вовсе. Загрузчик промаха передаётся в get() или один раз в конструктор. Счётчики hits / misses / evictions — для подбора бюджета.
+"""
+from collections import OrderedDict
+
+class BoundedLRU:
+    def __init__(self, budget_bytes: int, sizeof, load=None):
+        self.budget = budget_bytes
+        self._sizeof = sizeof
+        self._load = load
+        self._data = OrderedDict()    # key -> (value, size)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, load=None):
+        """Значение из кэша или load(key) с сохранением в кэш"""
+        item = self._data.get(key)
+        if item is not None:
+            self.hits += 1
+            self._data.move_to_end(key)
+            return item[0]
+        self.misses += 1
+        value = (load or self._load)(key)
+        size = self._sizeof(value)
+        if size <= self.budget:
+            while self.bytes + size > self.budget:
+                _, (_, old_size) = self._data.popitem(last=False)
+                self.bytes -= old_size
+                self.evictions += 1
+            self._data[key] = (value, size)
+            self.bytes += size
+        return value
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key) -> bool:
+        return key in self._data
+
+    def counters(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._data),
+            "bytes": self.bytes,
+            "budget_bytes": self.budget
+        }
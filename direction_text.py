@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Разбор текстовых полей направления из reports*.html — общий для parse.py, pl_json и pl_sql.
+
+    threshold_info("Негизги балл-110 Кошумча .-2 сабак Биология-60 Химия-60")
+        -> ThresholdInfo(main_score=110, extra_required=True, extra_count=2,
+                         subjects=(("Биология", 60), ("Химия", 60)))
+    specialty_info("Педагогика [Башталгыч билим берүү] ( Күндүзгү бакалавр) (Ваучер)")
+        -> SpecialtyInfo("Педагогика", "Башталгыч билим берүү", "Күндүзгү бакалавр", voucher=True)
+
+Порог разбирается одним проходом токенизатора «текст-число»: из тех же токенов берутся
+основной балл (первый токен, оканчивающийся на «Негизги балл») и предметы; отдельный
+поиск «Кошумча .-N сабак» — только если в тексте есть «Кошумча». Результаты совпадают
+с прежними re.search/findall побайтно, включая их особенности (например, предмет
+«сабак Биология» после «Кошумча .-2 сабак»).
+
+Тексты порогов и специальностей повторяются в тысячах строк, поэтому оба разбора
+мемоизированы; возвращаются неизменяемые объекты, вызывающие строят из них свою форму.
+"""
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+
+TEXT_CACHE_SIZE = 8192                 # различных текстов на каждый разбор
+
+_SUBJECT_SCORE = re.compile(r"([А-Яа-яЁёA-Za-z.\s]+)-(\d+)")
+_EXTRA_COUNT = re.compile(r"Кошумча\s*.-(\d+)\s*сабак")
+_SPECIALTY = re.compile(r"\[(.*?)\]")
+_TYPES = re.compile(r"\((.*?)\)")
+
+MAIN_SCORE_LABEL = "Негизги балл"
+EXTRA_LABEL = "Кошумча"
+EXTRA_OPTIONAL = "Доп. предмет не обязательно"
+VOUCHER = "Ваучер"
+
+@dataclass(frozen=True, slots=True)
+class ThresholdInfo:
+    main_score: int | None
+    extra_required: bool | None        # False — «Доп. предмет не обязательно», True — есть «Кошумча»
+    extra_count: int | None            # N из «Кошумча .-N сабак»; None — не указано
+    subjects: tuple                    # ((предмет, балл), ...) в порядке текста, без повторов
+
+    def to_dict(self) -> dict:
+        """Форма results/universities.json (pl_json, parse.py): новый dict на каждый вызов"""
+        return {
+            "main_score": self.main_score,
+            "extra_required": self.extra_required,
+            "extra_count": self.extra_count or 0,
+            "subjects": dict(self.subjects)
+        }
+
+@dataclass(frozen=True, slots=True)
+class SpecialtyInfo:
+    major: str | None
+    specialty: str | None
+    education_type: str | None         # все (...) кроме Ваучер, через ", "
+    voucher: bool
+
+@lru_cache(maxsize=TEXT_CACHE_SIZE)
+def threshold_info(text: str | None) -> ThresholdInfo | None:
+    if not text:
+        return None
+    main_score = None
+    subjects = {}
+    for m in _SUBJECT_SCORE.finditer(text):
+        raw, score = m.group(1), int(m.group(2))
+        # «Негизги балл-N» всегда целиком попадает в конец токена: перед «-» стоит «балл»
+        if main_score is None and raw.endswith(MAIN_SCORE_LABEL):
+            main_score = score
+        subj = raw.strip()
+        if subj.startswith("Негизги") or subj.startswith(EXTRA_LABEL):
+            continue
+        subjects[subj] = score
+
+    extra_required = None
+    extra_count = None
+    if EXTRA_OPTIONAL in text:
+        extra_required = False
+    has_extra = EXTRA_LABEL in text
+    if has_extra:
+        if extra_required is None:
+            extra_required = True
+        m = _EXTRA_COUNT.search(text)
+        if m:
+            extra_count = int(m.group(1))
+    return ThresholdInfo(main_score, extra_required, extra_count, tuple(subjects.items()))
+
+@lru_cache(maxsize=TEXT_CACHE_SIZE)
+def specialty_info(text: str | None) -> SpecialtyInfo | None:
+    if not text:
+        return None
+    # major — всё до первой «[» (если до неё нет перевода строки), иначе весь текст
+    bracket = text.find("[")
+    if bracket >= 0 and "\n" not in text[:bracket]:
+        major = text[:bracket].strip()
+    else:
+        major = text.strip()
+    m = _SPECIALTY.search(text)
+    specialty = m.group(1).strip() if m else None
+    types = [t.strip() for t in _TYPES.findall(text) if VOUCHER not in t]
+    return SpecialtyInfo(major, specialty, ", ".join(types) if types else None, VOUCHER in text)
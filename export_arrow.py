@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+Колоночная выгрузка всех заявок для аналитики: один набор данных вместо 2 477 rating_*.json.
+
+Рейтинги разбираются тем же потоком rating_core.iter_rating_items, что и в
+pl_json.parse_rating_file; ключи направления (университет, факультет, код, форма)
+берутся из results/universities.json (нет файла -> строится как в pl_json, стадия 2).
+
+Колонки типизированы: баллы — int32 (null, если не число), admitted — bool,
+date — timestamp, строковые ключи и category — dictionary (каждое значение хранится
+один раз). Набор разбит по PARTITION_BY (hive; значения в именах каталогов pyarrow
+всегда URL-кодирует: payment_form=%D0%91%D1%8E%D0%B4%D0%B6%D0%B5%D1%82 — это «Бюджет»,
+читатель с partitioning="hive" декодирует их обратно) и каждый раз пишется заново
+целиком — разделы пропавших форм оплаты не остаются:
+  "parquet" — сжатый, читается везде
+  "arrow"   — Arrow IPC без сжатия, отображается в память (memory-map) без копирования
+
+    python export_arrow.py
+    duckdb:  SELECT category, avg(total_score) FROM 'results/applications/**/*.parquet' GROUP BY 1
+    polars:  pl.scan_parquet("results/applications/**/*.parquet", hive_partitioning=True)
+    pyarrow: pyarrow.dataset.dataset("results/applications", format="arrow", partitioning="hive")
+
+Нужен пакет pyarrow; остальному pipeline он не нужен.
+"""
+import os
+import sys
+import shutil
+import asyncio
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+import pl_json
+from rating_core import RatingRow, RatingTable, iter_rating_items, parse_int_safe
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+except ImportError:
+    pa = None
+
+EXPORT_DIR = os.path.join(pl_json.RESULTS_DIR, "applications")
+EXPORT_FORMAT = "parquet"              # "parquet" | "arrow"
+PARTITION_BY = ["payment_form"]        # колонки-ключи разбиения (пусто -> без разбиения)
+DATE_FORMAT = "%d.%m.%Y %H:%M:%S"      # "15.07.2025 10:28:01"
+
+# колонки направления (из universities.json) и заявки (из рейтинга)
+KEY_COLUMNS = ["university", "faculty", "code", "payment_form", "rating_file"]
+ROW_COLUMNS = ["table_no", "num", "certificate", "note", "main_score", "extra_score", "total_score",
+               "category", "date", "admitted"]
+
+def schema():
+    dict_str = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema(
+        [(name, dict_str) for name in KEY_COLUMNS] + [
+            ("table_no", pa.int16()),
+            ("num", pa.int32()),
+            ("certificate", pa.string()),
+            ("note", pa.string()),
+            ("main_score", pa.int32()),
+            ("extra_score", pa.int32()),
+            ("total_score", pa.int32()),
+            ("category", dict_str),
+            ("date", pa.timestamp("s")),
+            ("admitted", pa.bool_()),
+        ]
+    )
+
+# --------- Рейтинг -> колонки ---------
+def parse_date(text: str | None) -> datetime | None:
+    if not text:
+        return None
+    try:
+        return datetime.strptime(text, DATE_FORMAT)
+    except ValueError:
+        return None
+
+def rating_columns(html_path: str) -> dict:
+    """Один рейтинг -> {колонка: список значений} (только колонки ROW_COLUMNS)"""
+    cols = {name: [] for name in ROW_COLUMNS}
+    table_no = -1
+    for item in iter_rating_items(html_path):
+        if isinstance(item, RatingTable):
+            table_no += 1
+        elif isinstance(item, RatingRow):
+            cols["table_no"].append(max(table_no, 0))
+            cols["num"].append(parse_int_safe(item.num))
+            cols["certificate"].append(item.certificate)
+            cols["note"].append(item.note)
+            cols["main_score"].append(item.main)
+            cols["extra_score"].append(item.extra)
+            cols["total_score"].append(item.total)
+            cols["category"].append(item.category or "Неизвестно")
+            cols["date"].append(parse_date(item.date))
+            cols["admitted"].append(item.admitted)
+    return cols
+
+def rating_columns_chunk(paths: list[str]) -> list[dict]:
+    """Рабочая единица для пула процессов"""
+    return [rating_columns(p) for p in paths]
+
+def parse_ratings(paths: list[str], workers: int, chunk_size: int) -> dict:
+    if workers <= 1:
+        return dict(zip(paths, rating_columns_chunk(paths)))
+    chunks = [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        parts = list(pool.map(rating_columns_chunk, chunks))
+    return dict(zip(paths, (cols for part in parts for cols in part)))
+
+# --------- Направления из universities.json ---------
+def load_universities() -> list[dict]:
+    unis = pl_json.load_json_sync(os.path.join(pl_json.RESULTS_DIR, "universities.json"))
+    if unis is None:
+        unis = asyncio.run(pl_json.build_universities_json())
+    return unis
+
+def export_units(universities: list[dict]) -> list[tuple]:
+    """(университет, факультет, код, форма, rating_json, html) для каждого направления с рейтингом"""
+    units = []
+    for uni in universities:
+        for fac in uni.get("faculties", []):
+            for d in fac.get("directions", []):
+                rpath = d.get("rating_json")
+                if not rpath:
+                    continue
+                html = pl_json.rating_html_path(rpath)
+                if os.path.exists(html):
+                    units.append((uni.get("name"), fac.get("faculty_name"), d.get("code"),
+                                  d.get("payment_form"), os.path.basename(html), html))
+    return units
+
+def build_table(units: list[tuple], ratings: dict):
+    columns = {name: [] for name in KEY_COLUMNS + ROW_COLUMNS}
+    for *keys, html in units:
+        rows = ratings[html]
+        n = len(rows["num"])
+        for name, value in zip(KEY_COLUMNS, keys):
+            columns[name].extend([value] * n)
+        for name in ROW_COLUMNS:
+            columns[name].extend(rows[name])
+    sch = schema()
+    arrays = []
+    for field in sch:
+        if pa.types.is_dictionary(field.type):
+            arrays.append(pa.array(columns[field.name], type=pa.string()).dictionary_encode())
+        else:
+            arrays.append(pa.array(columns[field.name], type=field.type))
+    return pa.Table.from_arrays(arrays, schema=sch)
+
+# --------- Выгрузка ---------
+def export_applications(out_dir: str = EXPORT_DIR, fmt: str = EXPORT_FORMAT,
+                        workers: int = pl_json.PARSE_WORKERS,
+                        chunk_size: int = pl_json.PARSE_CHUNK_SIZE):
+    if pa is None:
+        raise RuntimeError("Для выгрузки нужен pyarrow: pip install pyarrow")
+    if fmt not in ("parquet", "arrow"):
+        raise ValueError(f"Неизвестный формат выгрузки: {fmt} (есть: parquet, arrow)")
+
+    units = export_units(load_universities())
+    ratings = parse_ratings(sorted({u[-1] for u in units}), workers, chunk_size)
+    table = build_table(units, ratings)
+
+    partitioning = None
+    if PARTITION_BY:
+        partitioning = ds.partitioning(table.select(PARTITION_BY).schema, flavor="hive")
+    # набор пишется рядом и подменяет прежний целиком: старые разделы не переживают выгрузку,
+    # упавшая запись не портит прежний набор
+    staging = out_dir.rstrip(os.sep) + ".tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    ds.write_dataset(
+        table, staging, format="ipc" if fmt == "arrow" else "parquet",
+        partitioning=partitioning, existing_data_behavior="error",
+        basename_template="part-{i}." + ("arrow" if fmt == "arrow" else "parquet")
+    )
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(staging, out_dir)
+    return table
+
+if __name__ == "__main__":
+    try:
+        t = export_applications()
+    except RuntimeError as e:
+        sys.exit(str(e))
+    print(f"✅ Заявок выгружено: {t.num_rows} -> {EXPORT_DIR} ({EXPORT_FORMAT})")
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Выбор HTML-парсера для BeautifulSoup.
+
+Все парсеры (рейтинги, reports*.html, index.html) строят дерево через make_soup(),
+поэтому бэкенд переключается в одном месте. По умолчанию берётся первый доступный
+из HTML_BACKENDS: lxml (C, в разы быстрее) -> html.parser (stdlib, всегда есть).
+
+Проверка, что извлечённые данные не зависят от бэкенда:
+    python html_backend.py [файлы...]
+"""
+import os
+import sys
+from bs4 import BeautifulSoup, FeatureNotFound
+
+# Порядок предпочтения: быстрые C-парсеры -> чистый Python
+HTML_BACKENDS = ["lxml", "html.parser"]
+
+_backend: str | None = None
+
+def available_backends() -> list[str]:
+    out = []
+    for name in HTML_BACKENDS:
+        try:
+            BeautifulSoup("", name)
+        except FeatureNotFound:
+            continue
+        out.append(name)
+    return out
+
+def set_backend(name: str | None) -> None:
+    """None -> автоматический выбор при следующем make_soup()"""
+    global _backend
+    if name is not None and name not in available_backends():
+        raise ValueError(f"HTML-бэкенд недоступен: {name} (есть: {', '.join(available_backends())})")
+    _backend = name
+
+def get_backend() -> str:
+    global _backend
+    if _backend is None:
+        _backend = available_backends()[0]
+    return _backend
+
+def make_soup(markup) -> BeautifulSoup:
+    return BeautifulSoup(markup, get_backend())
+
+# --------- Дифференциальная проверка бэкендов ---------
+def _extract_all(rating_paths: list[str], report_paths: list[str], index_path: str) -> dict:
+    import pl_json
+    import pl_sql
+    import parse
+
+    out = {"ratings": {}, "ratings_sql": {}, "reports": {}, "reports_sql": {}, "reports_parse": {}}
+    for path in rating_paths:
+        with open(path, "r", encoding="utf-8") as f:
+            html = f.read()
+        out["ratings"][path] = pl_json.parse_rating_html(html, os.path.basename(path))
+        header, rows = pl_sql.parse_rating_table(html)
+        # raw_html — сериализация дерева, она законно зависит от парсера
+        out["ratings_sql"][path] = (header, [{k: v for k, v in r.items() if k != "raw_html"} for r in rows])
+    for path in report_paths:
+        with open(path, "r", encoding="utf-8") as f:
+            html = f.read()
+        out["reports"][path] = pl_json.parse_faculties_from_report(html)
+        out["reports_sql"][path] = [
+            {"faculty_name": fac["faculty_name"],
+             "directions": [{k: v for k, v in d.items() if k != "raw_html"} for d in fac["directions"]]}
+            for fac in pl_sql.parse_faculties_from_report(html)
+        ]
+        out["reports_parse"][path] = parse.parse_faculties(path)
+    out["index"] = parse.parse_universities(index_path)
+    return out
+
+def compare_backends(rating_paths: list[str], report_paths: list[str], index_path: str,
+                     backends: list[str] | None = None) -> list[str]:
+    """Прогоняет все парсеры каждым бэкендом; возвращает список расхождений (пустой -> совпадает)"""
+    backends = backends or available_backends()
+    previous = _backend
+    results = {}
+    try:
+        for name in backends:
+            set_backend(name)
+            results[name] = _extract_all(rating_paths, report_paths, index_path)
+    finally:
+        set_backend(previous)
+
+    diffs = []
+    ref_name = backends[0]
+    ref = results[ref_name]
+    for name in backends[1:]:
+        other = results[name]
+        for section, items in ref.items():
+            if section == "index":
+                if items != other[section]:
+                    diffs.append(f"{ref_name} != {name}: {section}")
+                continue
+            for path, value in items.items():
+                if value != other[section].get(path):
+                    diffs.append(f"{ref_name} != {name}: {section} {path}")
+    return diffs
+
+if __name__ == "__main__":
+    import glob
+    args = sys.argv[1:]
+    ratings = [p for p in args if "personalcabinet_report" in p] or sorted(
+        glob.glob(os.path.join("downloaded", "personalcabinet_report_Ranjir*.html")))
+    reports = [p for p in args if "personalcabinet_report" not in p] or sorted(glob.glob("reports*.html"))
+    print(f"Бэкенды: {', '.join(available_backends())}")
+    diffs = compare_backends(ratings, reports, "index.html")
+    for d in diffs:
+        print(f"❌ {d}")
+    if diffs:
+        sys.exit(1)
+    print(f"✅ Данные идентичны: {len(ratings)} рейтингов, {len(reports)} reports")
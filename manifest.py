@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Манифест инкрементальной сборки (results/manifest.json).
+
+Для каждого входного файла хранится размер, mtime и sha256 содержимого, для каждой
+единицы сборки (университет, свод universities.json) — отпечаток её входов.
+Если размер и mtime не изменились, хэш не пересчитывается (как make/rsync);
+если изменились, но хэш прежний (перекачали тот же файл) — файл считается неизменным.
+
+Манифест другой версии парсера игнорируется целиком -> полная пересборка.
+"""
+import os
+import json
+import hashlib
+
+MANIFEST_NAME = "manifest.json"
+
+def file_digest(path: str, block_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            h.update(block)
+    return h.hexdigest()
+
+def fingerprint(*parts) -> str:
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(json.dumps(part, ensure_ascii=False, sort_keys=True).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+class Manifest:
+    def __init__(self, path: str, version: str):
+        self.path = path
+        self.version = version
+        old = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                old = json.load(f)
+        if old.get("parser_version") != version:
+            old = {}
+        self._old_files = old.get("files", {})
+        self._old_units = old.get("units", {})
+        # в новый манифест попадает только то, что встретилось в этом прогоне
+        self.files = {}
+        self.units = {}
+
+    def check_file(self, path: str) -> bool:
+        """Запоминает состояние файла; True -> файл новый или изменился"""
+        st = os.stat(path)
+        prev = self._old_files.get(path)
+        if prev and prev["size"] == st.st_size and prev["mtime"] == st.st_mtime_ns:
+            digest = prev["sha256"]
+        else:
+            digest = file_digest(path)
+        self.files[path] = {"size": st.st_size, "mtime": st.st_mtime_ns, "sha256": digest}
+        return not prev or prev["sha256"] != digest
+
+    def digest(self, path: str) -> str | None:
+        state = self.files.get(path) or self._old_files.get(path)
+        return state["sha256"] if state else None
+
+    def check_unit(self, key: str, fp: str) -> bool:
+        """True -> отпечаток входов единицы сборки изменился (или её ещё не было)"""
+        self.units[key] = fp
+        return self._old_units.get(key) != fp
+
+    def vanished_units(self, prefix: str = "") -> list[str]:
+        """Единицы прошлого прогона (ключ без prefix), не встреченные в этом: их выходы устарели"""
+        return [k[len(prefix):] for k in self._old_units if k.startswith(prefix) and k not in self.units]
+
+    def vanished_files(self) -> list[str]:
+        """Входные файлы прошлого прогона, которых в этом уже нет"""
+        return [p for p in self._old_files if p not in self.files]
+
+    def save(self) -> None:
+        data = {"parser_version": self.version, "files": self.files, "units": self.units}
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.path)
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""
+Метрики прогона pipeline: время (wall / CPU) и счётчики по стадиям, гистограммы задержек,
+опциональный профиль каждой стадии.
+
+    run = RunMetrics("pl_json", profile="cprofile", profile_dir="results/profile")
+    with run:                                   # активный прогон для count()/observe()
+        with run.stage("ratings"):
+            count("files", len(paths))
+            observe("db_execute", seconds)      # гистограмма внутри текущей стадии
+    run.write("results/run_report.json", history="results/run_history.ndjson")
+
+count()/observe() вне активного прогона — no-op, поэтому функции стадий можно вызывать
+и без метрик (бенчмарки, другие скрипты). Фоновые задачи (asyncio) пишут в стадию,
+активную в момент выполнения.
+
+Сравнить два последних прогона из истории:
+    python metrics.py results/run_history.ndjson
+"""
+import os
+import sys
+import time
+import cProfile
+from contextlib import contextmanager
+from output_format import dumps_json, loads_json
+
+try:
+    import pyinstrument
+except ImportError:
+    pyinstrument = None
+
+PROFILERS = ("cprofile", "pyinstrument")
+# верхние границы корзин гистограммы задержек, секунды (последняя корзина — +inf)
+LATENCY_BOUNDS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_active = None
+
+class Histogram:
+    __slots__ = ("counts", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BOUNDS) + 1)
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        i = 0
+        while i < len(LATENCY_BOUNDS) and seconds > LATENCY_BOUNDS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def to_json(self) -> dict:
+        n = sum(self.counts)
+        buckets = {f"le_{b:g}": c for b, c in zip(LATENCY_BOUNDS, self.counts) if c}
+        if self.counts[-1]:
+            buckets["le_inf"] = self.counts[-1]
+        return {"count": n, "sum_seconds": round(self.total, 6), "max_seconds": round(self.max, 6),
+                "avg_seconds": round(self.total / n, 6) if n else None, "buckets": buckets}
+
+class Stage:
+    __slots__ = ("name", "wall", "cpu", "children_cpu", "counters", "gauges", "histograms", "profile_file")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.children_cpu = 0.0     # пул процессов: учитывается после завершения воркеров
+        self.counters = {}          # count(): суммируются в totals отчёта
+        self.gauges = {}            # gauge(): последнее значение (доли, флаги)
+        self.histograms = {}
+        self.profile_file = None
+
+    def to_json(self) -> dict:
+        out = {"stage": self.name, "wall_seconds": round(self.wall, 4), "cpu_seconds": round(self.cpu, 4)}
+        if self.children_cpu:
+            out["children_cpu_seconds"] = round(self.children_cpu, 4)
+        out["counters"] = self.counters
+        if self.gauges:
+            out["gauges"] = self.gauges
+        if self.histograms:
+            out["histograms"] = {k: h.to_json() for k, h in self.histograms.items()}
+        if self.profile_file:
+            out["profile"] = self.profile_file
+        return out
+
+def children_cpu() -> float:
+    t = os.times()
+    return t.children_user + t.children_system
+
+class RunMetrics:
+    def __init__(self, name: str, profile: str | None = None, profile_dir: str = "profile"):
+        if profile is not None and profile not in PROFILERS:
+            raise ValueError(f"Неизвестный профилировщик: {profile} (есть: {', '.join(PROFILERS)})")
+        if profile == "pyinstrument" and pyinstrument is None:
+            raise RuntimeError("Для профиля pyinstrument нужен пакет: pip install pyinstrument")
+        self.name = name
+        self.profile = profile
+        self.profile_dir = profile_dir
+        self.stages = {}
+        self.current = None
+        self.run_stage = Stage("run")      # счётчики вне стадий
+        self.started_at = time.strftime("%Y-%m-%dT%H:%M:%S")
+        self._t0 = time.perf_counter()
+        self._c0 = time.process_time()
+        self._cc0 = children_cpu()
+
+    def __enter__(self) -> "RunMetrics":
+        global _active
+        _active = self
+        return self
+
+    def __exit__(self, *exc) -> None:
+        global _active
+        _active = None
+
+    @contextmanager
+    def stage(self, name: str):
+        st = self.stages.get(name) or Stage(name)
+        self.stages[name] = st
+        prev, self.current = self.current, st
+        profiler = self._start_profile()
+        t0, c0, cc0 = time.perf_counter(), time.process_time(), children_cpu()
+        try:
+            yield st
+        finally:
+            st.wall += time.perf_counter() - t0
+            st.cpu += time.process_time() - c0
+            st.children_cpu += children_cpu() - cc0
+            self.current = prev
+            if profiler is not None:
+                st.profile_file = self._stop_profile(profiler, name)
+
+    # --------- Профиль стадии ---------
+    def _start_profile(self):
+        if self.profile == "cprofile":
+            p = cProfile.Profile()
+            p.enable()
+            return p
+        if self.profile == "pyinstrument":
+            p = pyinstrument.Profiler()
+            p.start()
+            return p
+        return None
+
+    def _stop_profile(self, profiler, name: str) -> str:
+        os.makedirs(self.profile_dir, exist_ok=True)
+        if self.profile == "cprofile":
+            profiler.disable()
+            path = os.path.join(self.profile_dir, f"{self.name}_{name}.prof")   # snakeviz / pstats
+            profiler.dump_stats(path)
+        else:
+            profiler.stop()
+            path = os.path.join(self.profile_dir, f"{self.name}_{name}.html")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(profiler.output_html())
+        return path
+
+    # --------- Отчёт ---------
+    def report(self) -> dict:
+        totals = {}
+        for st in self.stages.values():
+            for k, v in st.counters.items():
+                totals[k] = totals.get(k, 0) + v
+        out = {
+            "pipeline": self.name,
+            "started_at": self.started_at,
+            "wall_seconds": round(time.perf_counter() - self._t0, 4),
+            "cpu_seconds": round(time.process_time() - self._c0, 4),
+            "children_cpu_seconds": round(children_cpu() - self._cc0, 4),
+            "profile": self.profile,
+            "stages": [st.to_json() for st in self.stages.values()],
+            "totals": totals,
+        }
+        if self.run_stage.counters or self.run_stage.gauges or self.run_stage.histograms:
+            out["outside_stages"] = self.run_stage.to_json()
+        return out
+
+    def write(self, path: str, history: str | None = None) -> dict:
+        """Отчёт в path (tmp + os.replace); history — дописать строку в NDJSON-историю прогонов"""
+        rep = self.report()
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(dumps_json(rep, pretty=True))
+        os.replace(tmp, path)
+        if history is not None:
+            with open(history, "ab") as f:
+                f.write(dumps_json(rep, pretty=False) + b"\n")
+        return rep
+
+# --------- Запись из кода стадий ---------
+def _target() -> Stage | None:
+    run = _active
+    if run is None:
+        return None
+    return run.current or run.run_stage
+
+def count(key: str, n: int | float = 1) -> None:
+    st = _target()
+    if st is not None:
+        st.counters[key] = st.counters.get(key, 0) + n
+
+def gauge(key: str, value) -> None:
+    st = _target()
+    if st is not None:
+        st.gauges[key] = value
+
+def observe(name: str, seconds: float) -> None:
+    st = _target()
+    if st is not None:
+        h = st.histograms.get(name)
+        if h is None:
+            h = st.histograms[name] = Histogram()
+        h.observe(seconds)
+
+def active() -> bool:
+    return _active is not None
+
+# --------- Сравнение прогонов ---------
+def compare_reports(old: dict, new: dict) -> list[str]:
+    base = {s["stage"]: s for s in old.get("stages", [])}
+    lines = [f"{old.get('started_at')} -> {new.get('started_at')}"]
+    for s in new.get("stages", []):
+        b = base.get(s["stage"])
+        if b is None:
+            lines.append(f"  {s['stage']:<16} {'':>8}    {s['wall_seconds']:8.3f} с  (новая стадия)")
+            continue
+        ratio = s["wall_seconds"] / b["wall_seconds"] if b["wall_seconds"] else float("inf")
+        lines.append(f"  {s['stage']:<16} {b['wall_seconds']:8.3f} -> {s['wall_seconds']:8.3f} с  x{ratio:5.2f}")
+    return lines
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit("python metrics.py results/run_history.ndjson")
+    with open(sys.argv[1], "rb") as f:
+        runs = [loads_json(line) for line in f if line.strip()]
+    runs = [r for r in runs if runs and r.get("pipeline") == runs[-1].get("pipeline")]
+    if len(runs) < 2:
+        sys.exit("В истории меньше двух прогонов")
+    print("\n".join(compare_reports(runs[-2], runs[-1])))
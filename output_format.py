@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Сериализация выходных файлов pipeline.
+
+JSON (universities/university_*.json, stats.json, universities.json) пишется через
+orjson, если он установлен: при indent=2 байты те же, что у json.dumps(ensure_ascii=False,
+indent=2), но в разы быстрее; "compact" — без отступов и пробелов. Без orjson — stdlib json.
+Схема файлов от формата не зависит.
+
+Рейтинги (results/rating_*) — самые большие файлы, для них есть форматы:
+  "json"    — один документ, как раньше (rating_*.json)
+  "ndjson"  — rating_*.ndjson: первая строка — шапка документа, где у таблиц вместо
+              "records" стоит "record_count", дальше по строке на каждую заявку
+  "msgpack" — rating_*.msgpack, нужен пакет msgpack
+В universities.json ссылки остаются на rating_*.json; фактический файл — rating_path().
+
+Сравнение форматов по времени и размеру: python benchmarks/bench_output_format.py
+"""
+import os
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+RATING_FORMATS = {"json": ".json", "ndjson": ".ndjson", "msgpack": ".msgpack"}
+
+def available_formats() -> list[str]:
+    return [fmt for fmt in RATING_FORMATS if fmt != "msgpack" or msgpack is not None]
+
+def check_format(fmt: str) -> None:
+    if fmt not in available_formats():
+        raise ValueError(f"Формат рейтингов недоступен: {fmt} (есть: {', '.join(available_formats())})")
+
+# --------- JSON ---------
+def to_jsonable(obj):
+    """Объекты с to_json() (rating_core.RatingRow) сериализуются как их dict"""
+    to_json = getattr(obj, "to_json", None)
+    if to_json is None:
+        raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+    return to_json()
+
+def dumps_json(obj, pretty: bool = True) -> bytes:
+    if orjson is not None:
+        option = orjson.OPT_PASSTHROUGH_DATACLASS | (orjson.OPT_INDENT_2 if pretty else 0)
+        return orjson.dumps(obj, default=to_jsonable, option=option)
+    if pretty:
+        return json.dumps(obj, ensure_ascii=False, indent=2, default=to_jsonable).encode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=to_jsonable).encode("utf-8")
+
+def loads_json(data: bytes):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+# --------- Рейтинги ---------
+def rating_path(path: str, fmt: str) -> str:
+    """results/rating_*.json -> файл рейтинга в формате fmt"""
+    return os.path.splitext(path)[0] + RATING_FORMATS[fmt]
+
+def dump_rating(data: dict, fmt: str, pretty: bool = True) -> bytes:
+    if fmt == "json":
+        return dumps_json(data, pretty)
+    if fmt == "msgpack":
+        return msgpack.packb(data, use_bin_type=True, default=to_jsonable)
+    head = dict(data)
+    head["tables"] = [{**{k: v for k, v in tbl.items() if k != "records"}, "record_count": len(tbl["records"])}
+                      for tbl in data["tables"]]
+    lines = [dumps_json(head, pretty=False)]
+    lines.extend(dumps_json(rec, pretty=False) for tbl in data["tables"] for rec in tbl["records"])
+    return b"\n".join(lines) + b"\n"
+
+def load_rating(raw: bytes, fmt: str) -> dict:
+    if fmt == "json":
+        return loads_json(raw)
+    if fmt == "msgpack":
+        return msgpack.unpackb(raw, raw=False)
+    lines = raw.splitlines()
+    data = loads_json(lines[0])
+    pos = 1
+    for tbl in data["tables"]:
+        n = tbl.pop("record_count")
+        tbl["records"] = [loads_json(line) for line in lines[pos:pos + n]]
+        pos += n
+    return data
+
+def read_rating(path: str, fmt: str) -> dict | None:
+    """Рейтинг по ссылке rating_*.json из universities.json; None — файла нет"""
+    path = rating_path(path, fmt)
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return load_rating(f.read(), fmt)
@@ -1,82 +1,30 @@
 import os
-import re
 import json
-from bs4 import BeautifulSoup
+import rating_core
+from html_backend import make_soup
+from direction_text import specialty_info, threshold_info
 
 def clean_text(tag):
     """Извлекает текст без переносов строк и с нормализацией пробелов"""
     if not tag:
         return None
-    text = tag.get_text(" ", strip=True)
-    text = text.replace("\n", " ")
-    text = re.sub(r"\s+", " ", text)  # убираем лишние пробелы
-    return text.strip()
+    return rating_core.clean_text(tag)
 
 def parse_threshold(text: str):
     """Парсит строку threshold в структурированные данные"""
-    if not text:
-        return None
-
-    result = {
-        "main_score": None,
-        "extra_required": None,
-        "extra_count": 0,
-        "subjects": {}
-    }
-
-    # Основной балл
-    main_match = re.search(r"Негизги балл-(\d+)", text)
-    if main_match:
-        result["main_score"] = int(main_match.group(1))
-
-    # Доп. предмет обязателен / нет
-    if "Доп. предмет не обязательно" in text:
-        result["extra_required"] = False
-    elif "Кошумча" in text:
-        result["extra_required"] = True
-
-    # Количество обязательных предметов
-    count_match = re.search(r"Кошумча\s*.-(\d+)\s*сабак", text)
-    if count_match:
-        result["extra_count"] = int(count_match.group(1))
-
-    # Предметы с баллами
-    for subj, score in re.findall(r"([А-Яа-яЁёA-Za-z.\s]+)-(\d+)", text):
-        subj = subj.strip()
-        score = int(score)
-        if not subj.startswith("Негизги") and not subj.startswith("Кошумча"):
-            result["subjects"][subj] = score
-
-    return result
+    info = threshold_info(text)
+    return info.to_dict() if info is not None else None
 
 def parse_specialty(full_text: str):
     """Делит строку specialty на major, specialty, education_type, voucher"""
-    if not full_text:
+    info = specialty_info(full_text)
+    if info is None:
         return None, None, None, False
-
-    voucher = "Ваучер" in full_text
-
-    # major = всё до [
-    major_match = re.match(r"^(.*?)\[", full_text)
-    major = major_match.group(1).strip() if major_match else full_text.strip()
-
-    # specialty = внутри [ ]
-    specialty_match = re.search(r"\[(.*?)\]", full_text)
-    specialty = specialty_match.group(1).strip() if specialty_match else None
-
-    # education_type = всё в скобках (), кроме Ваучер
-    types = re.findall(r"\((.*?)\)", full_text)
-    if types:
-        types = [t.strip() for t in types if "Ваучер" not in t]
-        education_type = ", ".join(types) if types else None
-    else:
-        education_type = None
-
-    return major, specialty, education_type, voucher
+    return info.major, info.specialty, info.education_type, info.voucher
 
 def parse_universities(index_path):
     with open(index_path, "r", encoding="utf-8") as f:
-        soup = BeautifulSoup(f, "html.parser")
+        soup = make_soup(f)
 
     universities = []
     for li in soup.select("li.universities-item"):
@@ -113,7 +61,7 @@ def parse_universities(index_path):
 
 def parse_faculties(report_path):
     with open(report_path, "r", encoding="utf-8") as f:
-        soup = BeautifulSoup(f, "html.parser")
+        soup = make_soup(f)
 
     faculties = []
     for card in soup.select("li.card-item"):
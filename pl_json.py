@@ -1,12 +1,27 @@
 # -*- coding: utf-8 -*-
 import os
-import re
-import json
+import sys
+import time
 import asyncio
+import hashlib
 import aiofiles
-import statistics
-from bs4 import BeautifulSoup
+from array import array
+import metrics
+import score_columns
+import score_index
+from score_summary import HISTOGRAM_BIN, ScoreSummary
+from bounded_cache import BoundedLRU
+from direction_text import specialty_info, threshold_info
+from output_format import check_format, dump_rating, dumps_json, loads_json, rating_path, read_rating
+from html_backend import make_soup
+from manifest import MANIFEST_NAME, Manifest, fingerprint
+from metrics import RunMetrics
+from rating_core import (
+    RatingRow, clean_text, parse_int_safe, iter_rating_items, iter_rating_items_html,
+    rating_json_from_items, rating_json_name
+)
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 
 # --------- Конфиг путей ---------
 INDEX_HTML = "index.html"              # корневой индекс
@@ -15,8 +30,57 @@ RATINGS_HTML_DIR = "downloaded"        # исходные personalcabinet_report
 RESULTS_DIR = "results"                # rating_*.json, universities.json, stats.json
 UNIVERSITIES_DIR = "universities"      # финальные university_*.json (без студентов)
 
+# Парсинг рейтингов: BeautifulSoup держит GIL, поэтому распараллеливаем процессами
+PARSE_WORKERS = os.cpu_count() or 1         # 1 -> без пула, в текущем процессе
+PARSE_CHUNK_SIZE = 32                  # файлов на одну задачу воркера
+
+# Инкрементальная сборка: results/manifest.json + кэш вкладов университетов
+INCREMENTAL = True
+PARSER_VERSION = "3"                   # менять при любом изменении формата выходных JSON
+CACHE_DIR = os.path.join(RESULTS_DIR, "cache")
+
+# Агрегация баллов университета: "numpy" — колоночный движок score_columns (если NumPy
+# установлен), "python" — накопление списков по уровням. Результат байт-в-байт одинаковый.
+AGG_ENGINE = "numpy"
+
+# Допущенные баллы рейтингов (не документы целиком) в LRU-кэше с бюджетом памяти;
+# рейтинг переиспользуется, если его делят несколько направлений/университетов
+RATING_CACHE_BUDGET = 32 * 1024 * 1024   # байт
+
+# Стадия 3 получает разобранные рейтинги и universities.json из памяти (handoff),
+# а results/rating_*.json и universities.json — побочный вывод: пишутся в фоне
+# параллельно стадии 3 или не пишутся вовсе (False).
+# Без них инкрементальная сборка перепарсит рейтинги и universities.json заново
+WRITE_INTERMEDIATE = True
+
+# Формат вывода (output_format): "pretty" — отступ 2, как раньше; "compact" — без пробелов.
+# Схема файлов не меняется; кэш вкладов results/cache всегда компактный
+OUTPUT_JSON = "pretty"
+# results/rating_*: "json" | "ndjson" (строка на заявку) | "msgpack" (нужен msgpack)
+RATINGS_FORMAT = "json"
+
+# Стадия 5: индекс «куда я прохожу с баллом X» для запросов bisect'ом (score_index)
+BUILD_SCORE_INDEX = True
+SCORE_INDEX_PATH = os.path.join(RESULTS_DIR, "score_index.json")
+
+# Маркер завершённой сборки: пишется атомарно последним; query_service по нему
+# понимает, что выходы целиком готовы, и подменяет данные в памяти.
+# BUILDING_MARKER лежит всё время сборки (stats.json и universities/*.json переписываются
+# на месте): пока он есть, query_service выходы не читает. Упавшая сборка его не снимает.
+BUILD_MARKER = os.path.join(RESULTS_DIR, "build.json")
+BUILDING_MARKER = os.path.join(RESULTS_DIR, "building.json")
+
+# Метрики прогона (metrics): время/CPU, файлы, строки, байты и кэш по стадиям ->
+# results/run_report.json рядом со stats.json + строка в results/run_history.ndjson.
+# PROFILE: None | "cprofile" | "pyinstrument" — профиль каждой стадии в PROFILE_DIR
+RUN_REPORT_PATH = os.path.join(RESULTS_DIR, "run_report.json")
+RUN_HISTORY_PATH = os.path.join(RESULTS_DIR, "run_history.ndjson")
+PROFILE = None
+PROFILE_DIR = os.path.join(RESULTS_DIR, "profile")
+
 os.makedirs(RESULTS_DIR, exist_ok=True)
 os.makedirs(UNIVERSITIES_DIR, exist_ok=True)
+os.makedirs(CACHE_DIR, exist_ok=True)
 
 FORMS = ["Бюджет", "Контракт", "Ваучер"]
 SCORE_KEYS = {
@@ -26,198 +90,125 @@ SCORE_KEYS = {
 }
 
 # --------- Утилиты ---------
-def norm_space(s: str | None) -> str | None:
-    if s is None:
-        return None
-    return re.sub(r"\s+", " ", s.replace("\n", " ")).strip()
-
-def clean_text(tag) -> str | None:
-    if tag is None:
-        return None
-    if hasattr(tag, "get_text"):
-        return norm_space(tag.get_text(" ", strip=True))
-    return norm_space(str(tag))
-
 async def read_file(path: str) -> str:
+    metrics.count("files_read")
+    metrics.count("bytes_read", os.path.getsize(path))
     async with aiofiles.open(path, "r", encoding="utf-8") as f:
         return await f.read()
 
-async def write_json(path: str, obj) -> None:
-    async with aiofiles.open(path, "w", encoding="utf-8") as f:
-        await f.write(json.dumps(obj, ensure_ascii=False, indent=2))
+async def write_bytes(path: str, data: bytes) -> None:
+    metrics.count("files_written")
+    metrics.count("bytes_written", len(data))
+    async with aiofiles.open(path, "wb") as f:
+        await f.write(data)
+
+async def write_json(path: str, obj, pretty: bool | None = None) -> None:
+    await write_bytes(path, dumps_json(obj, OUTPUT_JSON == "pretty" if pretty is None else pretty))
+
+async def write_rating(path: str, data: dict) -> None:
+    await write_bytes(rating_path(path, RATINGS_FORMAT), dump_rating(data, RATINGS_FORMAT, OUTPUT_JSON == "pretty"))
 
 def load_json_sync(path: str):
     if not os.path.exists(path):
         return None
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-def parse_int_safe(x: str | None) -> int | None:
-    if not x:
-        return None
-    digits = re.sub(r"[^\d]", "", str(x))
-    if not digits:
-        return None
-    try:
-        return int(digits)
-    except ValueError:
-        return None
+    with open(path, "rb") as f:
+        return loads_json(f.read())
 
 def safe_stats(values: list[int] | list[float]):
-    if not values:
-        return None
-    return {
-        "min": min(values),
-        "avg": round(statistics.mean(values), 2),
-        "max": max(values)
-    }
+    return ScoreSummary.of(values, distribution=False).stats()
 
 # --------- Threshold ---------
 def parse_threshold(text: str | None):
-    if not text:
-        return None
-    res = {
-        "main_score": None,
-        "extra_required": None,
-        "extra_count": 0,
-        "subjects": {}
-    }
-    m = re.search(r"Негизги балл-(\d+)", text)
-    if m:
-        res["main_score"] = int(m.group(1))
-    if "Доп. предмет не обязательно" in text:
-        res["extra_required"] = False
-    elif "Кошумча" in text:
-        res["extra_required"] = True
-    m2 = re.search(r"Кошумча\s*.-(\d+)\s*сабак", text)
-    if m2:
-        res["extra_count"] = int(m2.group(1))
-    for subj, score in re.findall(r"([А-Яа-яЁёA-Za-z.\s]+)-(\d+)", text):
-        subj = subj.strip()
-        if subj.startswith("Негизги") or subj.startswith("Кошумча"):
-            continue
-        res["subjects"][subj] = int(score)
-    return res
+    info = threshold_info(text)
+    return info.to_dict() if info is not None else None
 
 # --------- Specialty ---------
 def parse_specialty(full_text: str | None):
-    if not full_text:
+    info = specialty_info(full_text)
+    if info is None:
         return None, None, None
-    mm = re.match(r"^(.*?)\[", full_text)
-    major = mm.group(1).strip() if mm else full_text.strip()
-    sm = re.search(r"\[(.*?)\]", full_text)
-    specialty = sm.group(1).strip() if sm else None
-    types = re.findall(r"\((.*?)\)", full_text)
-    if types:
-        types = [t.strip() for t in types if "Ваучер" not in t]
-        education_type = ", ".join(types) if types else None
-    else:
-        education_type = None
-    return major, specialty, education_type
-
-# --------- Сертификат ---------
-def parse_certificate(text: str | None):
-    admitted = False
-    note = None
-    if not text:
-        return None, admitted, note
-    if "(Реком" in text:
-        admitted = True
-        text = text.replace("(Реком)", "").strip()
-    m = re.search(r"\[(.*)\]", text)
-    if m:
-        note = m.group(1).strip()
-        text = re.sub(r"\[.*\]", "", text).strip()
-    return text, admitted, note
-
-# --------- Парсинг rating HTML -> JSON ---------
-async def parse_rating_file(html_path: str) -> dict:
-    html = await read_file(html_path)
-    soup = BeautifulSoup(html, "html.parser")
-
-    data = {
-        "file": os.path.basename(html_path),
-        "university": None,
-        "director": None,
-        "program": None,
-        "admitted_count": 0,
-        "not_admitted_count": 0,
-        "tables": []
-    }
-
-    top_block = soup.select_one("div.text-right")
-    if top_block:
-        spans = top_block.find_all("span")
-        if len(spans) >= 1: data["university"] = clean_text(spans[0])
-        if len(spans) >= 2: data["director"] = clean_text(spans[1])
-
-    program_tag = soup.select_one("p.headerColor b")
-    if program_tag:
-        data["program"] = clean_text(program_tag)
+    return info.major, info.specialty, info.education_type
 
-    for table in soup.select("table.table"):
-        header = clean_text(table.select_one("div.cityColir"))
-        is_contract = header is None
-
-        records = []
-        for tr in table.select("tbody tr"):
-            cols = [clean_text(td) for td in tr.find_all(["td", "th"])]
-            if len(cols) < 2:
-                continue
-
-            cert_text, admitted, note = parse_certificate(cols[1])
-            if is_contract and len(cols) >= 6:
-                category = cols[5]
-            elif header:
-                category = header.split(":")[0].strip()
-            else:
-                category = None
-
-            record = {
-                "num": cols[0],
-                "certificate": cert_text,
-                "note": note,
-                "main_score": cols[2] if len(cols) > 2 else None,
-                "extra_score": cols[3] if len(cols) > 3 else None,
-                "total_score": cols[4] if len(cols) > 4 else None,
-                "category": category,
-                "date": cols[6] if is_contract and len(cols) >= 7 else (cols[5] if not is_contract and len(cols) >= 6 else None),
-                "admitted": admitted
-            }
+# --------- Парсинг rating HTML -> JSON (ядро — rating_core) ---------
+def parse_rating_html(html: str, file_name: str) -> dict:
+    return rating_json_from_items(file_name, iter_rating_items_html(html))
 
-            if admitted: data["admitted_count"] += 1
-            else:        data["not_admitted_count"] += 1
+def parse_rating_path(html_path: str) -> dict:
+    return rating_json_from_items(os.path.basename(html_path), iter_rating_items(html_path))
 
-            records.append(record)
-
-        data["tables"].append({"header": header, "records": records})
-
-    return data
-
-async def parse_all_ratings():
-    tasks = []
-    for fn in os.listdir(RATINGS_HTML_DIR):
-        if fn.startswith("personalcabinet_report_Ranjir") and fn.endswith(".html"):
-            tasks.append(asyncio.create_task(parse_rating_file(os.path.join(RATINGS_HTML_DIR, fn))))
-    results = await asyncio.gather(*tasks) if tasks else []
+async def parse_rating_file(html_path: str) -> dict:
+    return parse_rating_path(html_path)
+
+def parse_rating_chunk(paths: list[str]) -> list[dict]:
+    """Рабочая единица для пула процессов: синхронно парсит пачку файлов"""
+    return [parse_rating_path(path) for path in paths]
+
+def list_rating_files() -> list[str]:
+    # сортировка -> стабильный порядок результатов при любом числе воркеров
+    return sorted(
+        os.path.join(RATINGS_HTML_DIR, fn) for fn in os.listdir(RATINGS_HTML_DIR)
+        if fn.startswith("personalcabinet_report_Ranjir") and fn.endswith(".html")
+    )
+
+async def parse_ratings_parallel(paths: list[str], workers: int, chunk_size: int) -> list[dict]:
+    chunks = [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+    if not chunks:
+        return []
+    loop = asyncio.get_running_loop()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        parts = await asyncio.gather(*(loop.run_in_executor(pool, parse_rating_chunk, c) for c in chunks))
+    return [data for part in parts for data in part]
+
+def rating_json_path(file_name: str) -> str | None:
+    name = rating_json_name(file_name)
+    return os.path.join(RESULTS_DIR, name) if name else None
+
+def rating_html_path(rating_json: str) -> str:
+    # results/rating_b_<base>.json -> downloaded/<base>.html
+    base = os.path.splitext(os.path.basename(rating_json))[0]
+    return os.path.join(RATINGS_HTML_DIR, base[len("rating_b_"):] + ".html")
+
+async def parse_all_ratings(workers: int = PARSE_WORKERS, chunk_size: int = PARSE_CHUNK_SIZE,
+                            manifest: Manifest | None = None, handoff: dict | None = None,
+                            pending: list | None = None) -> list[str]:
+    """
+    Возвращает список перепарсенных HTML (с манифестом — только новые/изменённые).
+    handoff: сюда кладутся баллы рейтингов {results/rating_*.json: RatingScores} для стадии 3.
+    pending: запись rating_*.json не ждём, а добавляем задачи сюда (None -> пишем сразу).
+    """
+    paths = list_rating_files()
+    if manifest is not None:
+        # check_file вызывается для каждого файла: он же обновляет манифест
+        paths = [p for p in paths
+                 if manifest.check_file(p) or not os.path.exists(rating_path(rating_json_path(p) or "", RATINGS_FORMAT))]
+    if workers > 1:
+        results = await parse_ratings_parallel(paths, workers, chunk_size)
+    else:
+        results = parse_rating_chunk(paths)
+    if metrics.active():
+        metrics.count("files_read", len(paths))
+        metrics.count("bytes_read", sum(os.path.getsize(p) for p in paths))
+        metrics.count("rows", sum(len(t["records"]) for data in results for t in data["tables"]))
 
     save_tasks = []
     for data in results:
-        base = os.path.splitext(data["file"])[0]
-        if "Ranjirk" in base:
-            out = os.path.join(RESULTS_DIR, f"rating_r_{base}.json")
-        elif "Ranjirb" in base:
-            out = os.path.join(RESULTS_DIR, f"rating_b_{base}.json")
-        else:
+        out = rating_json_path(data["file"])
+        if out is None:
             continue
-        save_tasks.append(write_json(out, data))
-    if save_tasks:
+        if handoff is not None:
+            handoff[out] = extract_rating_scores(data)
+        if WRITE_INTERMEDIATE:
+            save_tasks.append(write_rating(out, data))
+    if pending is not None:
+        pending.extend(asyncio.create_task(t) for t in save_tasks)
+    elif save_tasks:
         await asyncio.gather(*save_tasks)
+    return paths
 
 # --------- Университеты (index + reports) ---------
 async def parse_universities_index() -> list[dict]:
     html = await read_file(INDEX_HTML)
-    soup = BeautifulSoup(html, "html.parser")
+    soup = make_soup(html)
 
     universities = []
     for li in soup.select("li.universities-item"):
@@ -250,7 +241,7 @@ async def parse_universities_index() -> list[dict]:
     return universities
 
 def parse_faculties_from_report(report_html: str) -> list[dict]:
-    soup = BeautifulSoup(report_html, "html.parser")
+    soup = make_soup(report_html)
     faculties = []
     for card in soup.select("li.card-item"):
         faculty_name = clean_text(card.select_one("p.university-name"))
@@ -298,7 +289,20 @@ def parse_faculties_from_report(report_html: str) -> list[dict]:
         faculties.append({"faculty_name": faculty_name, "directions": directions})
     return faculties
 
-async def build_universities_json():
+async def build_universities_json(manifest: Manifest | None = None, pending: list | None = None) -> list[dict]:
+    out_path = os.path.join(RESULTS_DIR, "universities.json")
+    if manifest is not None:
+        inputs = [INDEX_HTML] + sorted(
+            os.path.join(REPORTS_DIR, fn) for fn in os.listdir(REPORTS_DIR)
+            if fn.startswith("reports") and fn.endswith(".html")
+        )
+        for p in inputs:
+            manifest.check_file(p)
+        fp = fingerprint([manifest.digest(p) for p in inputs])
+        if not manifest.check_unit("universities.json", fp) and os.path.exists(out_path):
+            metrics.gauge("from_cache", True)
+            return load_json_sync(out_path)
+
     universities = await parse_universities_index()
 
     tasks = []
@@ -314,46 +318,162 @@ async def build_universities_json():
         htmls = await asyncio.gather(*tasks)
         for (i, _), html in zip(map_idx_path, htmls):
             universities[i]["faculties"] = parse_faculties_from_report(html)
+    metrics.count("universities", len(universities))
+    metrics.count("directions", sum(len(f["directions"]) for u in universities for f in u["faculties"]))
 
     # Полный свод (ничего не теряем: name/address/rector/site/report_file/faculties)
-    await write_json(os.path.join(RESULTS_DIR, "universities.json"), universities)
+    if WRITE_INTERMEDIATE:
+        if pending is not None:
+            pending.append(asyncio.create_task(write_json(out_path, universities)))
+        else:
+            await write_json(out_path, universities)
+    return universities
 
-# --------- Извлечение баллов admitted из rating_json в 3-х разрезах ---------
-def extract_scores_from_rating(rating_data: dict):
-    """
-    Возвращает кортеж словарей:
-    - overall: {'main':[], 'extra':[], 'total':[]}
-    - by_cat:  {'main':{'Бишкек':[], ...}, 'extra':{...}, 'total':{...}}
-    """
-    overall = {k: [] for k in SCORE_KEYS}  # k in ['main','extra','total']
-    by_cat = {k: defaultdict(list) for k in SCORE_KEYS}
+# --------- Сводки баллов уровня (направление / факультет / университет / GLOBAL) ---------
+def new_summaries() -> dict:
+    return {
+        "overall_scores": {k: ScoreSummary() for k in SCORE_KEYS},                            # kind
+        "by_form_scores": {f: {k: ScoreSummary() for k in SCORE_KEYS} for f in FORMS},        # form -> kind
+        "by_form_cat": {f: {k: defaultdict(ScoreSummary) for k in SCORE_KEYS} for f in FORMS},  # form -> kind -> cat
+        "contract_amounts": ScoreSummary(distribution=False)   # суммы, не баллы: без перцентилей
+    }
+
+def merge_summaries(into: dict, other: dict) -> None:
+    for kind in SCORE_KEYS:
+        into["overall_scores"][kind].merge(other["overall_scores"][kind])
+    for f in FORMS:
+        for kind in SCORE_KEYS:
+            into["by_form_scores"][f][kind].merge(other["by_form_scores"][f][kind])
+            for cat, summ in other["by_form_cat"][f][kind].items():
+                into["by_form_cat"][f][kind][cat].merge(summ)
+    into["contract_amounts"].merge(other["contract_amounts"])
+
+def summaries_stats(acc: dict) -> dict:
+    """Сводки уровня -> блок stats (все формы; у направлений отсутствующие формы помечаются отдельно)"""
+    return {
+        "overall_scores": {k: acc["overall_scores"][k].stats() for k in SCORE_KEYS},
+        "scores_by_form": {f: {k: acc["by_form_scores"][f][k].stats() for k in SCORE_KEYS} for f in FORMS},
+        "scores_by_form_category": {
+            f: {k: {cat: summ.stats() for cat, summ in acc["by_form_cat"][f][k].items()} for k in SCORE_KEYS}
+            for f in FORMS
+        },
+        "contract_payment": acc["contract_amounts"].stats()
+    }
 
+def summaries_to_json(acc: dict) -> dict:
+    return {
+        "overall_scores": {k: acc["overall_scores"][k].to_json() for k in SCORE_KEYS},
+        "by_form_scores": {f: {k: acc["by_form_scores"][f][k].to_json() for k in SCORE_KEYS} for f in FORMS},
+        "by_form_cat": {f: {k: {cat: summ.to_json() for cat, summ in acc["by_form_cat"][f][k].items()}
+                            for k in SCORE_KEYS} for f in FORMS},
+        "contract_amounts": acc["contract_amounts"].to_json()
+    }
+
+def summaries_from_json(data: dict) -> dict:
+    acc = new_summaries()
+    for k in SCORE_KEYS:
+        acc["overall_scores"][k] = ScoreSummary.from_json(data["overall_scores"][k])
+    for f in FORMS:
+        for k in SCORE_KEYS:
+            acc["by_form_scores"][f][k] = ScoreSummary.from_json(data["by_form_scores"][f][k])
+            for cat, summ in data["by_form_cat"][f][k].items():
+                acc["by_form_cat"][f][k][cat] = ScoreSummary.from_json(summ)
+    acc["contract_amounts"] = ScoreSummary.from_json(data["contract_amounts"])
+    return acc
+
+# --------- Баллы admitted из rating_json: компактные кортежи в LRU-кэше ---------
+class RatingScores:
+    """Допущенные баллы одного рейтинга в порядке записей: (категория, вид, балл) по колонкам"""
+    __slots__ = ("categories", "cat", "kind", "value")
+
+    def __init__(self):
+        self.categories = []           # индекс -> название категории
+        self.cat = array("H")
+        self.kind = array("B")         # индекс в SCORE_KEYS
+        self.value = array("i")
+
+    def nbytes(self) -> int:
+        return (sys.getsizeof(self.cat) + sys.getsizeof(self.kind) + sys.getsizeof(self.value)
+                + sys.getsizeof(self.categories) + sum(sys.getsizeof(c) for c in self.categories))
+
+def extract_rating_scores(rating_data: dict) -> RatingScores:
+    """Записи — RatingRow (разбор в этом прогоне, баллы уже int) или dict из rating_*.json"""
+    scores = RatingScores()
+    cat_index = {}
+    cat_append, kind_append, value_append = scores.cat.append, scores.kind.append, scores.value.append
     for tbl in rating_data.get("tables", []):
-        for rec in tbl.get("records", []):
-            if not rec.get("admitted"):
+        records = tbl.get("records", [])
+        if records and type(records[0]) is not RatingRow:
+            records = [RatingRow.from_json(rec) for rec in records]
+        for rec in records:
+            if not rec.admitted:
                 continue
-            cat = rec.get("category") or "Неизвестно"
-            for kind, field in SCORE_KEYS.items():
-                val = parse_int_safe(rec.get(field))
-                if val is None:
-                    continue
-                overall[kind].append(val)
-                by_cat[kind][cat].append(val)
-
+            cat = rec.category or "Неизвестно"
+            ci = cat_index.get(cat)
+            if ci is None:
+                ci = cat_index[cat] = len(scores.categories)
+                scores.categories.append(sys.intern(cat))
+            # порядок видов — как в SCORE_KEYS: main, extra, total
+            if rec.main is not None:
+                cat_append(ci)
+                kind_append(0)
+                value_append(rec.main)
+            if rec.extra is not None:
+                cat_append(ci)
+                kind_append(1)
+                value_append(rec.extra)
+            if rec.total is not None:
+                cat_append(ci)
+                kind_append(2)
+                value_append(rec.total)
+    return scores
+
+def load_rating_scores(rpath: str) -> RatingScores:
+    return extract_rating_scores(read_rating(rpath, RATINGS_FORMAT) or {})
+
+def new_rating_cache(budget: int = RATING_CACHE_BUDGET, handoff: dict | None = None) -> BoundedLRU:
+    """handoff — баллы, разобранные в этом же прогоне: берутся из памяти, а не с диска"""
+    def load(rpath: str) -> RatingScores | None:
+        scores = handoff.get(rpath) if handoff else None
+        if scores is not None:
+            metrics.count("rating_loads_memory")
+        elif os.path.exists(rating_path(rpath, RATINGS_FORMAT)):
+            metrics.count("rating_loads_disk")
+            scores = load_rating_scores(rpath)
+        return scores
+    # None (рейтинга нет ни в памяти, ни на диске) тоже кэшируется
+    return BoundedLRU(budget, lambda scores: scores.nbytes() if scores is not None else 0, load)
+
+def record_cache_metrics(rating_cache: BoundedLRU) -> dict:
+    c = rating_cache.counters()
+    for k in ("hits", "misses", "evictions"):
+        metrics.count(f"rating_cache_{k}", c[k])
+    lookups = c["hits"] + c["misses"]
+    metrics.gauge("rating_cache_hit_rate", round(c["hits"] / lookups, 4) if lookups else None)
+    return c
+
+def rating_scores(rating_cache: BoundedLRU, rpath: str | None) -> RatingScores | None:
+    return rating_cache.get(rpath) if rpath else None
+
+# --------- Сводки баллов рейтинга в 3-х разрезах ---------
+def extract_scores_from_rating(scores: RatingScores):
+    """
+    Возвращает кортеж сводок:
+    - overall: {'main': ScoreSummary, 'extra': ..., 'total': ...}
+    - by_cat:  {'main': {'Бишкек': ScoreSummary, ...}, 'extra': {...}, 'total': {...}}
+    """
+    kinds = list(SCORE_KEYS)
+    overall = {k: ScoreSummary() for k in kinds}
+    by_cat = {k: defaultdict(ScoreSummary) for k in kinds}
+    for ci, k, val in zip(scores.cat, scores.kind, scores.value):
+        overall[kinds[k]].add(val)
+        by_cat[kinds[k]][scores.categories[ci]].add(val)
     return overall, by_cat
 
 # --------- Статистика для группы записей одного кода (несколько форм) ---------
-def compute_direction_group_stats(group_entries: list[dict], rating_cache: dict):
-    # инициализация накопителей
+def compute_direction_group_stats(group_entries: list[dict], rating_cache: BoundedLRU):
     has_form = {f: False for f in FORMS}
-    # overall
-    overall_scores = {k: [] for k in SCORE_KEYS}
-    # by form
-    by_form_scores = {f: {k: [] for k in SCORE_KEYS} for f in FORMS}
-    # by form + category
-    by_form_cat = {f: {k: defaultdict(list) for k in SCORE_KEYS} for f in FORMS}
-    # contract payments
-    contract_amounts = []
+    acc = new_summaries()
 
     for entry in group_entries:
         pf = entry.get("payment_form")
@@ -365,229 +485,395 @@ def compute_direction_group_stats(group_entries: list[dict], rating_cache: dict)
         if pf == "Контракт":
             val = parse_int_safe(entry.get("payment_amount"))
             if val and val > 0:
-                contract_amounts.append(val)
+                acc["contract_amounts"].add(val)
 
-        rpath = entry.get("rating_json")
-        if not rpath or not os.path.exists(rpath):
+        scores = rating_scores(rating_cache, entry.get("rating_json"))
+        if scores is None:
             continue
-        if rpath not in rating_cache:
-            rating_cache[rpath] = load_json_sync(rpath) or {}
-        rating_data = rating_cache[rpath]
-
-        ov, byc = extract_scores_from_rating(rating_data)
+        ov, byc = extract_scores_from_rating(scores)
 
         # накопление
         for kind in SCORE_KEYS:
-            overall_scores[kind].extend(ov[kind])
-            by_form_scores[pf][kind].extend(ov[kind])
-            for cat, lst in byc[kind].items():
-                by_form_cat[pf][kind][cat].extend(lst)
-
-    # агрегаты
-    stats_overall = {kind: safe_stats(overall_scores[kind]) for kind in SCORE_KEYS}
-    stats_by_form = {}
-    for f in FORMS:
-        if has_form[f]:
-            stats_by_form[f] = {kind: safe_stats(by_form_scores[f][kind]) for kind in SCORE_KEYS}
-        else:
-            stats_by_form[f] = "Форма отсутствует"
-    stats_by_form_cat = {}
-    for f in FORMS:
-        if has_form[f]:
-            stats_by_form_cat[f] = {
-                kind: {cat: safe_stats(vals) for cat, vals in by_form_cat[f][kind].items()}
-                for kind in SCORE_KEYS
-            }
-        else:
-            stats_by_form_cat[f] = "Форма отсутствует"
+            acc["overall_scores"][kind].merge(ov[kind])
+            acc["by_form_scores"][pf][kind].merge(ov[kind])
+            for cat, summ in byc[kind].items():
+                acc["by_form_cat"][pf][kind][cat].merge(summ)
 
-    contract_payment = safe_stats([v for v in contract_amounts if v and v > 0])
+    # агрегаты; формы, которых у направления нет, помечаются
+    stats = summaries_stats(acc)
+    for f in FORMS:
+        if not has_form[f]:
+            stats["scores_by_form"][f] = stats["scores_by_form_category"][f] = "Форма отсутствует"
     flags = {
         "has_contract": has_form["Контракт"],
         "has_budget": has_form["Бюджет"],
         "has_voucher": has_form["Ваучер"]
     }
 
-    # сырьё для агрегации уровней выше
-    raw = {
-        "overall_scores": overall_scores,                   # dict kind -> list
-        "by_form_scores": by_form_scores,                   # form -> kind -> list
-        "by_form_cat": by_form_cat,                         # form -> kind -> cat -> list
-        "contract_amounts": [v for v in contract_amounts if v and v > 0]
-    }
-    return flags, stats_overall, stats_by_form, stats_by_form_cat, contract_payment, raw
+    # сводки для слияния в уровни выше
+    return (flags, stats["overall_scores"], stats["scores_by_form"], stats["scores_by_form_category"],
+            stats["contract_payment"], acc)
 
 # --------- Сборка university_*.json + накопление для глобальной статистики/рейтингов ---------
-async def build_university_files_and_collect_global():
-    all_unis = load_json_sync(os.path.join(RESULTS_DIR, "universities.json")) or []
+def university_out_path(uni_name: str) -> str:
+    uni_name_safe = (uni_name.replace(" ", "_").replace('"', "").replace("«", "").replace("»", "").replace("/", "_"))
+    return os.path.join(UNIVERSITIES_DIR, f"university_{uni_name_safe}.json")
+
+def university_cache_path(uni_name: str) -> str:
+    return os.path.join(CACHE_DIR, f"university_{hashlib.sha1(uni_name.encode('utf-8')).hexdigest()}.json")
 
+def university_fingerprint(uni: dict, manifest: Manifest) -> str:
+    # входы университета: его запись из universities.json + содержимое всех его рейтингов
+    ratings = sorted({d["rating_json"] for fac in uni.get("faculties", []) for d in fac.get("directions", [])
+                      if d.get("rating_json")})
+    return fingerprint(PARSER_VERSION, OUTPUT_JSON, uni, [manifest.digest(rating_html_path(r)) for r in ratings])
+
+def build_university(uni: dict, rating_cache: BoundedLRU) -> tuple[dict, dict]:
+    """
+    Возвращает (uni_out, contrib):
+    - uni_out: содержимое university_*.json
+    - contrib: вклад университета в GLOBAL (сводки баллов + элементы рейтингов)
+    """
+    uni_name = uni["name"]
+    uni_acc = new_summaries()
+
+    # рейтинги-накопители (uni_name добавляется при слиянии в GLOBAL)
+    faculties_rank = {k: [] for k in SCORE_KEYS}      # list of (faculty_name, avg_kind)
+    directions_rank = {k: [] for k in SCORE_KEYS}     # list of (faculty_name, code, avg_kind)
+
+    faculties_out = []
+
+    for fac in uni.get("faculties", []):
+        fac_name = fac.get("faculty_name")
+
+        # сгруппировать направления по коду
+        groups = defaultdict(list)
+        for d in fac.get("directions", []):
+            code = d.get("code") or "Без кода"
+            groups[code].append(d)
+
+        fac_acc = new_summaries()
+        directions_out = []
+
+        for code, entries in groups.items():
+            base = entries[0]
+            flags, s_overall, s_by_form, s_by_form_cat, s_contract_payment, dir_acc = compute_direction_group_stats(
+                entries, rating_cache
+            )
+
+            # рейтинги направлений (по каждому виду баллов — берём avg total/main/extra)
+            for kind in SCORE_KEYS:
+                avg_k = s_overall[kind]["avg"] if s_overall.get(kind) else None
+                if avg_k is not None:
+                    directions_rank[kind].append((fac_name, code, avg_k))
+
+            # сводки направления -> факультет
+            merge_summaries(fac_acc, dir_acc)
+
+            # узел направления (без студентов) + флаги + контрактные суммы
+            directions_out.append({
+                "code": code,
+                "major": base.get("major"),
+                "specialty": base.get("specialty"),
+                "education_type": base.get("education_type"),
+                "has_contract": flags["has_contract"],
+                "has_budget": flags["has_budget"],
+                "has_voucher": flags["has_voucher"],
+                "contract_payment": s_contract_payment,
+                "stats": {
+                    "overall_scores": s_overall,                 # {'main':{..}, 'extra':{..}, 'total':{..}}
+                    "scores_by_form": s_by_form,                 # {'Бюджет': {'main':..,'extra':..,'total':..} | "Форма отсутствует"}
+                    "scores_by_form_category": s_by_form_cat     # {'Бюджет': {'main':{'Бишкек':..}, 'extra':.., 'total':..} | "Форма отсутствует"}
+                }
+            })
+
+        # агрегаты факультета
+        fac_stats = summaries_stats(fac_acc)
+
+        # рейтинг факультетов (по каждому виду баллов)
+        for kind in SCORE_KEYS:
+            avg_k = fac_stats["overall_scores"][kind]["avg"] if fac_stats["overall_scores"][kind] else None
+            if avg_k is not None:
+                faculties_rank[kind].append((fac_name, avg_k))
+
+        faculties_out.append({
+            "faculty_name": fac_name,
+            "stats": fac_stats,
+            "directions": directions_out
+        })
+
+        # сводки факультета -> универ
+        merge_summaries(uni_acc, fac_acc)
+
+    # агрегаты университета
+    uni_stats = summaries_stats(uni_acc)
+
+    uni_out = {
+        "name": uni_name,
+        "address": uni.get("address"),
+        "rector": uni.get("rector"),
+        "site": uni.get("site"),
+        "stats": uni_stats,
+        "faculties": faculties_out
+    }
+    contrib = {
+        "summaries": uni_acc,
+        # рейтинги университетов (по каждому виду баллов)
+        "universities": {
+            k: uni_stats["overall_scores"][k]["avg"] if uni_stats["overall_scores"][k] else None for k in SCORE_KEYS
+        },
+        "faculties_global": faculties_rank,
+        "directions_global": directions_rank
+    }
+    return uni_out, contrib
+
+# --------- Колоночный движок (AGG_ENGINE = "numpy") ---------
+def add_rating_columns(cols: score_columns.ScoreColumns, direction: int, form: int, scores: RatingScores) -> None:
+    """Допущенные баллы рейтинга -> колонки"""
+    cat_codes = [cols.cat_code(name) for name in scores.categories]
+    cols.extend(direction, form, scores.kind.tolist(), [cat_codes[ci] for ci in scores.cat], scores.value)
+
+def columnar_level(fine: dict, owner, n_owners: int, n_cats: int, n_values: int) -> dict:
+    """
+    Агрегаты уровня из групп (направление, форма, вид, категория, балл).
+    owner — массив: направление -> группа уровня (само направление / факультет / 0).
+    Возвращает {"overall": {(g, k): ScoreSummary}, "by_form": {(g, f, k): ScoreSummary},
+                "cats": {(g, f, k): [(первая позиция, категория, ScoreSummary)] в порядке появления}}
+    """
+    nf, nk = len(FORMS), len(SCORE_KEYS)
+    d, f, k, c, v = fine["parts"]
+    g = owner[d]
+    by_cat = score_columns.regroup(fine, [g, f, k, c, v], [n_owners, nf, nk, n_cats, n_values])
+    g, f, k, c, v = by_cat["parts"]
+    by_form = score_columns.regroup(by_cat, [g, f, k, v], [n_owners, nf, nk, n_values])
+    g, f, k, v = by_form["parts"]
+    overall = score_columns.regroup(by_form, [g, k, v], [n_owners, nk, n_values])
+
+    cats = defaultdict(list)
+    for (g, f, k, c), (first, summ) in score_columns.summaries(by_cat).items():
+        cats[g, f, k].append((first, c, summ))
+    for lst in cats.values():
+        lst.sort(key=lambda x: x[0])
+    return {
+        "overall": {key: summ for key, (_, summ) in score_columns.summaries(overall).items()},
+        "by_form": {key: summ for key, (_, summ) in score_columns.summaries(by_form).items()},
+        "cats": cats
+    }
+
+def columnar_node(level: dict, g: int, cat_names: list[str], has_form: dict | None = None):
+    """(overall_scores, scores_by_form, scores_by_form_category) группы g"""
+    kinds = list(enumerate(SCORE_KEYS))
+    empty = ScoreSummary()
+    overall = {kind: level["overall"].get((g, k), empty).stats() for k, kind in kinds}
+    by_form, by_form_cat = {}, {}
+    for fi, f in enumerate(FORMS):
+        if has_form is not None and not has_form[f]:
+            by_form[f] = by_form_cat[f] = "Форма отсутствует"
+            continue
+        by_form[f] = {kind: level["by_form"].get((g, fi, k), empty).stats() for k, kind in kinds}
+        by_form_cat[f] = {kind: {cat_names[c]: summ.stats() for _, c, summ in level["cats"].get((g, fi, k), [])}
+                          for k, kind in kinds}
+    return overall, by_form, by_form_cat
+
+def build_university_columnar(uni: dict, rating_cache: BoundedLRU) -> tuple[dict, dict]:
+    """То же, что build_university(), но каждый балл копируется один раз — в колонки"""
+    uni_name = uni["name"]
+    form_index = {f: i for i, f in enumerate(FORMS)}
+    cols = score_columns.ScoreColumns()
+
+    # 1) направления (группы по коду) в том же порядке, что и у build_university()
+    faculties = uni.get("faculties", [])
+    directions = []       # (code, base, has_form, contract_amounts)
+    fac_directions = []   # факультет -> индексы его направлений
+    fac_of_direction = []
+    for fi, fac in enumerate(faculties):
+        groups = defaultdict(list)
+        for d in fac.get("directions", []):
+            groups[d.get("code") or "Без кода"].append(d)
+        fac_directions.append([])
+        for code, entries in groups.items():
+            direction = len(directions)
+            has_form = {f: False for f in FORMS}
+            amounts = []
+            for entry in entries:
+                pf = entry.get("payment_form")
+                if pf not in FORMS:
+                    continue
+                has_form[pf] = True
+                if pf == "Контракт":
+                    val = parse_int_safe(entry.get("payment_amount"))
+                    if val and val > 0:
+                        amounts.append(val)
+                scores = rating_scores(rating_cache, entry.get("rating_json"))
+                if scores is None:
+                    continue
+                add_rating_columns(cols, direction, form_index[pf], scores)
+            directions.append((code, entries[0], has_form, amounts))
+            fac_directions[fi].append(direction)
+            fac_of_direction.append(fi)
+
+    # 2) одна редукция сырых баллов, дальше уровни — из её групп
+    arrays = cols.arrays()
+    nd, nf, nk, nc = max(len(directions), 1), len(FORMS), len(SCORE_KEYS), max(len(cols.cat_names), 1)
+    nv = int(arrays["value"].max()) + 1 if len(cols) else 1
+    fine = score_columns.reduce_rows(
+        [arrays["direction"], arrays["form"], arrays["kind"], arrays["cat"], arrays["value"]], [nd, nf, nk, nc, nv]
+    )
+    dir_level = columnar_level(fine, score_columns.owner_map(list(range(nd))), nd, nc, nv)
+    fac_level = columnar_level(fine, score_columns.owner_map(fac_of_direction), max(len(faculties), 1), nc, nv)
+    uni_level = columnar_level(fine, score_columns.owner_map([0] * nd), 1, nc, nv)
+    cat_names = cols.cat_names
+
+    # 3) university_*.json
+    faculties_rank = {k: [] for k in SCORE_KEYS}
+    directions_rank = {k: [] for k in SCORE_KEYS}
+    faculties_out = []
+    uni_contract_amounts = []
+    for fi, fac in enumerate(faculties):
+        fac_name = fac.get("faculty_name")
+        directions_out = []
+        fac_contract_amounts = []
+        for g in fac_directions[fi]:
+            code, base, has_form, amounts = directions[g]
+            s_overall, s_by_form, s_by_form_cat = columnar_node(dir_level, g, cat_names, has_form)
+            for kind in SCORE_KEYS:
+                if s_overall[kind]:
+                    directions_rank[kind].append((fac_name, code, s_overall[kind]["avg"]))
+            fac_contract_amounts.extend(amounts)
+            directions_out.append({
+                "code": code,
+                "major": base.get("major"),
+                "specialty": base.get("specialty"),
+                "education_type": base.get("education_type"),
+                "has_contract": has_form["Контракт"],
+                "has_budget": has_form["Бюджет"],
+                "has_voucher": has_form["Ваучер"],
+                "contract_payment": safe_stats(amounts),
+                "stats": {
+                    "overall_scores": s_overall,
+                    "scores_by_form": s_by_form,
+                    "scores_by_form_category": s_by_form_cat
+                }
+            })
+
+        f_overall, f_by_form, f_by_form_cat = columnar_node(fac_level, fi, cat_names)
+        for kind in SCORE_KEYS:
+            if f_overall[kind]:
+                faculties_rank[kind].append((fac_name, f_overall[kind]["avg"]))
+        faculties_out.append({
+            "faculty_name": fac_name,
+            "stats": {
+                "overall_scores": f_overall,
+                "scores_by_form": f_by_form,
+                "scores_by_form_category": f_by_form_cat,
+                "contract_payment": safe_stats(fac_contract_amounts)
+            },
+            "directions": directions_out
+        })
+        uni_contract_amounts.extend(fac_contract_amounts)
+
+    u_overall, u_by_form, u_by_form_cat = columnar_node(uni_level, 0, cat_names)
+    uni_out = {
+        "name": uni_name,
+        "address": uni.get("address"),
+        "rector": uni.get("rector"),
+        "site": uni.get("site"),
+        "stats": {
+            "overall_scores": u_overall,
+            "scores_by_form": u_by_form,
+            "scores_by_form_category": u_by_form_cat,
+            "contract_payment": safe_stats(uni_contract_amounts)
+        },
+        "faculties": faculties_out
+    }
+
+    # вклад в GLOBAL — сводки университета в том же виде, что у build_university()
+    acc = new_summaries()
+    for k, kind in enumerate(SCORE_KEYS):
+        acc["overall_scores"][kind].merge(uni_level["overall"].get((0, k), ScoreSummary()))
+        for fi, f in enumerate(FORMS):
+            acc["by_form_scores"][f][kind].merge(uni_level["by_form"].get((0, fi, k), ScoreSummary()))
+            for _, c, summ in uni_level["cats"].get((0, fi, k), []):
+                acc["by_form_cat"][f][kind][cat_names[c]].merge(summ)
+    acc["contract_amounts"] = ScoreSummary.of(uni_contract_amounts, distribution=False)
+    contrib = {
+        "summaries": acc,
+        "universities": {kind: u_overall[kind]["avg"] if u_overall[kind] else None for kind in SCORE_KEYS},
+        "faculties_global": faculties_rank,
+        "directions_global": directions_rank
+    }
+    return uni_out, contrib
+
+def new_global() -> dict:
     # глобальные накопители (по всем универам)
-    GLOBAL = {
-        "overall_scores": {k: [] for k in SCORE_KEYS},
-        "by_form_scores": {f: {k: [] for k in SCORE_KEYS} for f in FORMS},
-        "by_form_cat": {f: {k: defaultdict(list) for k in SCORE_KEYS} for f in FORMS},
-        "contract_amounts": [],
+    return {
+        "summaries": new_summaries(),
         # рейтинги-накопители
         "universities": {k: [] for k in SCORE_KEYS},      # list of (uni_name, avg_kind)
         "faculties_global": {k: [] for k in SCORE_KEYS},  # list of (uni_name, faculty_name, avg_kind)
         "directions_global": {k: [] for k in SCORE_KEYS}  # list of (uni_name, faculty_name, code, avg_kind)
     }
 
-    rating_cache = {}
+def contrib_to_json(contrib: dict) -> dict:
+    return dict(contrib, summaries=summaries_to_json(contrib["summaries"]))
 
-    for uni in all_unis:
-        uni_name = uni["name"]
-        uni_name_safe = (uni_name.replace(" ", "_").replace('"', "").replace("«", "").replace("»", "").replace("/", "_"))
-        out_path = os.path.join(UNIVERSITIES_DIR, f"university_{uni_name_safe}.json")
-
-        # накопители по универу
-        uni_overall_scores = {k: [] for k in SCORE_KEYS}
-        uni_by_form_scores = {f: {k: [] for k in SCORE_KEYS} for f in FORMS}
-        uni_by_form_cat = {f: {k: defaultdict(list) for k in SCORE_KEYS} for f in FORMS}
-        uni_contract_amounts = []
-
-        faculties_out = []
-
-        for fac in uni.get("faculties", []):
-            fac_name = fac.get("faculty_name")
-
-            # сгруппировать направления по коду
-            groups = defaultdict(list)
-            for d in fac.get("directions", []):
-                code = d.get("code") or "Без кода"
-                groups[code].append(d)
-
-            # накопители по факультету
-            fac_overall_scores = {k: [] for k in SCORE_KEYS}
-            fac_by_form_scores = {f: {k: [] for k in SCORE_KEYS} for f in FORMS}
-            fac_by_form_cat = {f: {k: defaultdict(list) for k in SCORE_KEYS} for f in FORMS}
-            fac_contract_amounts = []
-
-            directions_out = []
-
-            for code, entries in groups.items():
-                base = entries[0]
-                flags, s_overall, s_by_form, s_by_form_cat, s_contract_payment, raw = compute_direction_group_stats(
-                    entries, rating_cache
-                )
-
-                # рейтинги направлений (по каждому виду баллов — берём avg total/main/extra)
-                for kind in SCORE_KEYS:
-                    avg_k = s_overall[kind]["avg"] if s_overall.get(kind) else None
-                    if avg_k is not None:
-                        GLOBAL["directions_global"][kind].append((uni_name, fac_name, code, avg_k))
-
-                # накопление -> факультет
-                for kind in SCORE_KEYS:
-                    fac_overall_scores[kind].extend(raw["overall_scores"][kind])
-                for f in FORMS:
-                    for kind in SCORE_KEYS:
-                        fac_by_form_scores[f][kind].extend(raw["by_form_scores"][f][kind])
-                        for cat, lst in raw["by_form_cat"][f][kind].items():
-                            fac_by_form_cat[f][kind][cat].extend(lst)
-                fac_contract_amounts.extend(raw["contract_amounts"])
-
-                # узел направления (без студентов) + флаги + контрактные суммы
-                directions_out.append({
-                    "code": code,
-                    "major": base.get("major"),
-                    "specialty": base.get("specialty"),
-                    "education_type": base.get("education_type"),
-                    "has_contract": flags["has_contract"],
-                    "has_budget": flags["has_budget"],
-                    "has_voucher": flags["has_voucher"],
-                    "contract_payment": s_contract_payment,
-                    "stats": {
-                        "overall_scores": s_overall,                 # {'main':{..}, 'extra':{..}, 'total':{..}}
-                        "scores_by_form": s_by_form,                 # {'Бюджет': {'main':..,'extra':..,'total':..} | "Форма отсутствует"}
-                        "scores_by_form_category": s_by_form_cat     # {'Бюджет': {'main':{'Бишкек':..}, 'extra':.., 'total':..} | "Форма отсутствует"}
-                    }
-                })
-
-            # агрегаты факультета
-            fac_stats = {
-                "overall_scores": {k: safe_stats(fac_overall_scores[k]) for k in SCORE_KEYS},
-                "scores_by_form": {f: {k: safe_stats(fac_by_form_scores[f][k]) for k in SCORE_KEYS} for f in FORMS},
-                "scores_by_form_category": {
-                    f: {k: {cat: safe_stats(vals) for cat, vals in fac_by_form_cat[f][k].items()} for k in SCORE_KEYS}
-                    for f in FORMS
-                },
-                "contract_payment": safe_stats([v for v in fac_contract_amounts if v and v > 0])
-            }
+def contrib_from_json(data: dict) -> dict:
+    return dict(data, summaries=summaries_from_json(data["summaries"]))
 
-            # рейтинг факультетов (по каждому виду баллов)
-            for kind in SCORE_KEYS:
-                avg_k = fac_stats["overall_scores"][kind]["avg"] if fac_stats["overall_scores"][kind] else None
-                if avg_k is not None:
-                    GLOBAL["faculties_global"][kind].append((uni_name, fac_name, avg_k))
+def merge_university(GLOBAL: dict, uni_name: str, contrib: dict) -> None:
+    """Накопление вклада университета -> глобал"""
+    merge_summaries(GLOBAL["summaries"], contrib["summaries"])
 
-            faculties_out.append({
-                "faculty_name": fac_name,
-                "stats": fac_stats,
-                "directions": directions_out
-            })
+    for kind in SCORE_KEYS:
+        GLOBAL["universities"][kind].append((uni_name, contrib["universities"][kind]))
+        for fac_name, avg_k in contrib["faculties_global"][kind]:
+            GLOBAL["faculties_global"][kind].append((uni_name, fac_name, avg_k))
+        for fac_name, code, avg_k in contrib["directions_global"][kind]:
+            GLOBAL["directions_global"][kind].append((uni_name, fac_name, code, avg_k))
 
-            # накопление -> универ
-            for kind in SCORE_KEYS:
-                uni_overall_scores[kind].extend(fac_overall_scores[kind])
-            for f in FORMS:
-                for kind in SCORE_KEYS:
-                    uni_by_form_scores[f][kind].extend(fac_by_form_scores[f][kind])
-                    for cat, vals in fac_by_form_cat[f][kind].items():
-                        uni_by_form_cat[f][kind][cat].extend(vals)
-            uni_contract_amounts.extend([v for v in fac_contract_amounts if v and v > 0])
-
-        # агрегаты университета
-        uni_stats = {
-            "overall_scores": {k: safe_stats(uni_overall_scores[k]) for k in SCORE_KEYS},
-            "scores_by_form": {f: {k: safe_stats(uni_by_form_scores[f][k]) for k in SCORE_KEYS} for f in FORMS},
-            "scores_by_form_category": {
-                f: {k: {cat: safe_stats(vals) for cat, vals in uni_by_form_cat[f][k].items()} for k in SCORE_KEYS}
-                for f in FORMS
-            },
-            "contract_payment": safe_stats([v for v in uni_contract_amounts if v and v > 0])
-        }
+async def build_university_files_and_collect_global(all_unis: list[dict] | None = None,
+                                                    manifest: Manifest | None = None,
+                                                    handoff: dict | None = None):
+    if all_unis is None:
+        all_unis = load_json_sync(os.path.join(RESULTS_DIR, "universities.json")) or []
 
-        # рейтинги университетов (по каждому виду баллов)
-        for kind in SCORE_KEYS:
-            avg_k = uni_stats["overall_scores"][kind]["avg"] if uni_stats["overall_scores"][kind] else None
-            GLOBAL["universities"][kind].append((uni_name, avg_k))
+    GLOBAL = new_global()
+    rating_cache = new_rating_cache(handoff=handoff)
 
-        # накопление -> глобал
-        for kind in SCORE_KEYS:
-            GLOBAL["overall_scores"][kind].extend(uni_overall_scores[kind])
-        for f in FORMS:
-            for kind in SCORE_KEYS:
-                GLOBAL["by_form_scores"][f][kind].extend(uni_by_form_scores[f][kind])
-                for cat, vals in uni_by_form_cat[f][kind].items():
-                    GLOBAL["by_form_cat"][f][kind][cat].extend(vals)
-        GLOBAL["contract_amounts"].extend([v for v in uni_contract_amounts if v and v > 0])
+    for uni in all_unis:
+        uni_name = uni["name"]
+        out_path = university_out_path(uni_name)
+        cache_path = university_cache_path(uni_name)
+
+        # входы не менялись -> берём вклад из кэша, файл университета не трогаем
+        if manifest is not None:
+            changed = manifest.check_unit(f"university:{uni_name}", university_fingerprint(uni, manifest))
+            if not changed and os.path.exists(out_path) and os.path.exists(cache_path):
+                merge_university(GLOBAL, uni_name, contrib_from_json(load_json_sync(cache_path)))
+                metrics.count("universities_cached")
+                continue
+
+        if AGG_ENGINE == "numpy" and score_columns.available():
+            uni_out, contrib = build_university_columnar(uni, rating_cache)
+        else:
+            uni_out, contrib = build_university(uni, rating_cache)
+        merge_university(GLOBAL, uni_name, contrib)
+        metrics.count("universities_built")
 
         # запись файла университета (без студентов)
-        uni_out = {
-            "name": uni_name,
-            "address": uni.get("address"),
-            "rector": uni.get("rector"),
-            "site": uni.get("site"),
-            "stats": uni_stats,
-            "faculties": faculties_out
-        }
         await write_json(out_path, uni_out)
+        if manifest is not None:
+            await write_json(cache_path, contrib_to_json(contrib), pretty=False)
         print(f"✅ Сохранён университет: {out_path}")
 
+    c = record_cache_metrics(rating_cache)
+    print(f"✅ Кэш рейтингов: hits={c['hits']} misses={c['misses']} evictions={c['evictions']} "
+          f"entries={c['entries']} bytes={c['bytes']}/{c['budget_bytes']}")
     return GLOBAL
 
 # --------- Формирование results/stats.json (ГЛОБАЛКА + РЕЙТИНГИ) ---------
 async def build_stats_json(GLOBAL):
-    global_stats = {
-        "overall_scores": {k: safe_stats(GLOBAL["overall_scores"][k]) for k in SCORE_KEYS},
-        "scores_by_form": {f: {k: safe_stats(GLOBAL["by_form_scores"][f][k]) for k in SCORE_KEYS} for f in FORMS},
-        "scores_by_form_category": {
-            f: {k: {cat: safe_stats(vals) for cat, vals in GLOBAL["by_form_cat"][f][k].items()} for k in SCORE_KEYS}
-            for f in FORMS
-        },
-        "contract_payment": safe_stats(GLOBAL["contract_amounts"])
-    }
+    global_stats = summaries_stats(GLOBAL["summaries"])
 
     # рейтинги по КАЖДОМУ виду баллов
     def rank_unis(items):   # items: list[(name, avg)]
@@ -619,25 +905,101 @@ async def build_stats_json(GLOBAL):
         "notes": {
             "score_kinds": {"main": "main_score", "extra": "extra_score", "total": "total_score"},
             "forms": FORMS,
-            "contract_payment_stat_only_for_contract": True
+            "contract_payment_stat_only_for_contract": True,
+            "percentiles": "p25/p50/p75/p90, линейная интерполяция между соседними рангами",
+            "histogram": f"{{начало корзины: число допущенных}}, корзины по {HISTOGRAM_BIN} баллов"
         }
     }
     await write_json(os.path.join(RESULTS_DIR, "stats.json"), out)
     print(f"✅ Статистика сохранена: {os.path.join(RESULTS_DIR, 'stats.json')}")
 
-# --------- Главный пайплайн ---------
-async def main():
-    # 1) HTML рейтингов -> JSON
-    await parse_all_ratings()
+# --------- Индекс баллов ---------
+def build_score_index(universities: list[dict], manifest: Manifest | None = None,
+                      handoff: dict | None = None) -> None:
+    if manifest is not None:
+        fp = fingerprint(score_index.INDEX_VERSION, [university_fingerprint(uni, manifest) for uni in universities])
+        if not manifest.check_unit("score_index", fp) and os.path.exists(SCORE_INDEX_PATH):
+            return
+    rating_cache = new_rating_cache(handoff=handoff)
+    idx = score_index.build(universities, lambda rpath: rating_scores(rating_cache, rpath), list(SCORE_KEYS))
+    idx.save(SCORE_INDEX_PATH)
+    record_cache_metrics(rating_cache)
+    metrics.gauge("indexed_directions", len(idx.directions))
+    print(f"✅ Индекс баллов: {len(idx.directions)} направлений, {len(idx.keys)} ключей -> {SCORE_INDEX_PATH}")
 
-    # 2) Университеты с полными полями + faculties/directions (results/universities.json)
-    await build_universities_json()
+# --------- Главный пайплайн ---------
+async def main(incremental: bool = INCREMENTAL):
+    check_format(RATINGS_FORMAT)
+    # выходы сейчас начнут переписываться: снимок из них не читать до build.json
+    tmp = BUILDING_MARKER + ".tmp"
+    await write_json(tmp, {"pid": os.getpid(), "started_at": time.strftime("%Y-%m-%dT%H:%M:%S")})
+    os.replace(tmp, BUILDING_MARKER)
+
+    with RunMetrics("pl_json", PROFILE, PROFILE_DIR) as run:
+        await run_stages(run, incremental)
+        run.write(RUN_REPORT_PATH, RUN_HISTORY_PATH)
+
+    # маркер готовности выходов (tmp + os.replace: читатель видит старый или новый целиком)
+    tmp = BUILD_MARKER + ".tmp"
+    await write_json(tmp, {"build_id": time.time_ns(), "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S")})
+    os.replace(tmp, BUILD_MARKER)
+    os.remove(BUILDING_MARKER)
+
+def remove_stale_outputs(manifest: Manifest) -> None:
+    """
+    Удаляет university_*.json + кэш вклада университетов и rating_*.json рейтингов, пропавших
+    из входов с прошлого прогона (без этого они остаются в results/ и universities/ навсегда)
+    """
+    live = {p for key in manifest.units if key.startswith("university:")
+            for p in (university_out_path(key[len("university:"):]), university_cache_path(key[len("university:"):]))}
+    stale = [p for name in manifest.vanished_units("university:")
+             for p in (university_out_path(name), university_cache_path(name))]
+    stale += [rating_path(out, RATINGS_FORMAT) for out in map(rating_json_path, manifest.vanished_files()) if out]
+    for path in stale:
+        if path not in live and os.path.exists(path):
+            os.remove(path)
+            metrics.count("stale_outputs_removed")
+            print(f"✅ Удалён устаревший выход: {path}")
+
+async def run_stages(run: RunMetrics, incremental: bool) -> None:
+    # манифест: пропускаем неизменившиеся входы (None -> полная пересборка)
+    manifest = Manifest(os.path.join(RESULTS_DIR, MANIFEST_NAME), PARSER_VERSION) if incremental else None
+
+    # разобранные данные идут в стадию 3 из памяти; промежуточные JSON пишутся в фоне
+    handoff = {}
+    pending = []
+
+    # 1) HTML рейтингов -> баллы в памяти (+ results/rating_*.json)
+    with run.stage("ratings"):
+        changed = await parse_all_ratings(manifest=manifest, handoff=handoff, pending=pending)
+    print(f"✅ Рейтингов перепарсено: {len(changed)}")
+
+    # 2) Университеты с полными полями + faculties/directions (+ results/universities.json)
+    with run.stage("universities"):
+        universities = await build_universities_json(manifest, pending)
 
     # 3) Университетские файлы без студентов, только агрегаты; собрать глобальные накопители и рейтинги
-    GLOBAL = await build_university_files_and_collect_global()
+    with run.stage("aggregate"):
+        GLOBAL = await build_university_files_and_collect_global(universities, manifest, handoff)
 
     # 4) Глобальная stats.json (только общий уровень + рейтинги), во всех 3-х видах баллов
-    await build_stats_json(GLOBAL)
+    with run.stage("stats"):
+        await build_stats_json(GLOBAL)
+
+    # 5) Индекс (форма, категория, вид) -> направления по минимальному баллу допущенных
+    if BUILD_SCORE_INDEX:
+        with run.stage("score_index"):
+            build_score_index(universities, manifest, handoff)
+
+    # фоновая запись rating_*.json / universities.json (часть уже прошла во время стадий 2-3)
+    with run.stage("write_pending"):
+        if pending:
+            await asyncio.gather(*pending)
+
+    # манифест пишется последним: упавший прогон в следующий раз пересоберёт всё изменённое
+    if manifest is not None:
+        remove_stale_outputs(manifest)
+        manifest.save()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
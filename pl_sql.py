@@ -1,248 +1,662 @@
 # -*- coding: utf-8 -*-
 import os
 import re
+import sys
 import json
+import time
 import asyncio
+import hashlib
+import tempfile
 import aiofiles
-import aiomysql
 import statistics
-from bs4 import BeautifulSoup
+import metrics
+from html_backend import make_soup
+from direction_text import specialty_info, threshold_info
+from metrics import RunMetrics
+from output_format import check_format, dump_rating, rating_path
+from rating_core import (
+    RatingMeta, RatingRow, RatingJsonBuilder, clean_text, parse_int_safe,
+    iter_rating_items, iter_rating_items_html, rating_json_name
+)
 from collections import defaultdict
 from typing import Optional, Tuple
 
+# aiomysql нужен только для загрузки в MySQL; парсеры ниже (их берёт и pl_sqlite) работают без него
+try:
+    import aiomysql
+except ImportError:
+    aiomysql = None
+
+if aiomysql is not None:
+    class TimedCursor(aiomysql.Cursor):
+        """Курсор пула: каждый execute — запрос к серверу, его задержка -> metrics (db_execute)"""
+        async def execute(self, query, args=None):
+            # executemany aiomysql тоже сводится к execute (многострочный INSERT или цикл)
+            t0 = time.perf_counter()
+            try:
+                return await super().execute(query, args)
+            finally:
+                metrics.observe("db_execute", time.perf_counter() - t0)
+
 # --------- Конфиг файлов ---------
 INDEX_HTML = "index.html"
 REPORTS_DIR = "."
 RATINGS_HTML_DIR = "downloaded"
+RATING_JSON_DIR = "results"            # куда export_json=True пишет rating_*.json (как pl_json)
+EXPORT_RATING_JSON = False             # True -> заодно выгрузить rating_*.json из того же прохода
+RATINGS_FORMAT = "json"                # формат выгрузки, как pl_json.RATINGS_FORMAT: "json" | "ndjson" | "msgpack"
+
+# Загрузка заявок:
+#   "row"    — построчно через insert_application
+#   "bulk"   — многострочные INSERT по специальности (insert_applications_bulk)
+#   "infile" — TSV + LOAD DATA LOCAL INFILE в транзакции университета, только для
+#              специальностей без загруженных заявок (новых или при полном реимпорте в пустую
+#              applications); остальные идут через "bulk". При полном реимпорте неуникальные
+#              вторичные индексы снимаются на время загрузки (определения — в INDEX_BACKUP_PATH)
+APPLICATIONS_LOADER = "bulk"
+BULK_BATCH_SIZE = 1000                 # строк в одном INSERT (держим ниже max_allowed_packet)
+INFILE_TABLES = ["applications", "specialty_applications", "application_specialties",
+                 "application_faculties", "application_universities"]
+INDEX_BACKUP_PATH = os.path.join(RATING_JSON_DIR, "dropped_indexes.json")
+
+# Повторный импорт идемпотентен: у faculties / specialties / applications есть natural_key
+# (MD5 естественного ключа, UNIQUE). Неизменные строки не трогаются, изменённые обновляются,
+# заявки, пропавшие из рейтинга, и факультеты / специальности, пропавшие из reports*.html,
+# удаляются вместе со связями.
+#   faculties    — (университет, название)
+#   specialties  — (факультет, код, форма оплаты, страница рейтинга): одна пара код+форма
+#                  встречается у нескольких направлений (очное/заочное, разные профили)
+#   applications — (специальность, № сертификата)
+NATURAL_KEY_TABLES = ["faculties", "specialties", "applications"]
+LINK_TABLES = ["university_faculties", "faculty_specialties"] + INFILE_TABLES[1:]
+
+# Денормализованные faculty_ids / specialty_ids / application_ids после импорта:
+#   "incremental" — только родители, чьи связи изменились в этом прогоне
+#   "full"        — JSON_ARRAYAGG по всем таблицам связей (как раньше)
+#   "off"         — не поддерживать: колонки *_ids не обновляются и устаревают, актуальные
+#                   списки — только в таблицах связей (JSON_LISTS)
+JSON_LISTS_MODE = "incremental"
 
 # --------- Конфиг MySQL ---------
 MYSQL_DSN = dict(
     host="127.0.0.1", port=8889,
     user="root", password="root",
-    db="admissions", autocommit=True
+    db="admissions", autocommit=False,   # транзакции открываем явно: университет = одна транзакция
+    local_infile=True                    # для APPLICATIONS_LOADER = "infile"
 )
+POOL_MAXSIZE = 10
+INGEST_CONCURRENCY = POOL_MAXSIZE      # университетов, загружаемых одновременно
+INGEST_RETRIES = 3                     # попыток на университет при дедлоке
+RETRYABLE_MYSQL_ERRORS = {1205, 1213}  # lock wait timeout, deadlock
+
+# Метрики прогона (metrics): фазы run_pipeline, число и задержки запросов к MySQL ->
+# results/run_report_mysql.json; PROFILE: None | "cprofile" | "pyinstrument"
+RUN_REPORT_PATH = os.path.join(RATING_JSON_DIR, "run_report_mysql.json")
+RUN_HISTORY_PATH = os.path.join(RATING_JSON_DIR, "run_history_mysql.ndjson")
+PROFILE = None
+PROFILE_DIR = os.path.join(RATING_JSON_DIR, "profile")
 
 FORMS = ["Бюджет", "Контракт", "Ваучер"]
 SCORE_KEYS = {"main": "main_score", "extra": "extra_score", "total": "total_score"}
 
 # --------- Утилиты ---------
-def norm_space(s: Optional[str]) -> Optional[str]:
-    if s is None: return None
-    return re.sub(r"\s+", " ", s.replace("\n", " ")).strip()
-
-def clean_text(tag) -> Optional[str]:
-    if tag is None: return None
-    return norm_space(tag.get_text(" ", strip=True) if hasattr(tag, "get_text") else str(tag))
-
 async def read_file(path: str) -> str:
+    metrics.count("files_read")
+    metrics.count("bytes_read", os.path.getsize(path))
     async with aiofiles.open(path, "r", encoding="utf-8") as f:
         return await f.read()
 
-def parse_int_safe(x: Optional[str]) -> Optional[int]:
-    if not x: return None
-    digits = re.sub(r"[^\d]", "", str(x))
-    if not digits: return None
-    try:
-        return int(digits)
-    except ValueError:
-        return None
-
 def parse_threshold(text: Optional[str]):
-    if not text:
+    info = threshold_info(text)
+    if info is None:
         return None, None, None
-    main_pass = None
-    req_extra = None
-    extra_count = None
-    m = re.search(r"Негизги балл-(\d+)", text)
-    if m: main_pass = int(m.group(1))
-    if "Доп. предмет не обязательно" in text:
-        req_extra = False
-    elif "Кошумча" in text:
-        req_extra = True
-    m2 = re.search(r"Кошумча\s*.-(\d+)\s*сабак", text)
-    if m2: extra_count = int(m2.group(1))
-    subjects = {}
-    for subj, score in re.findall(r"([А-Яа-яЁёA-Za-z.\s]+)-(\d+)", text):
-        subj = subj.strip()
-        if subj.startswith("Негизги") or subj.startswith("Кошумча"): continue
-        subjects[subj] = int(score)
-    return main_pass, extra_count, subjects or None
+    return info.main_score, info.extra_count, dict(info.subjects) or None
 
 def parse_specialty(full_text: Optional[str]) -> Tuple[Optional[str], Optional[str], Optional[str]]:
-    if not full_text:
+    info = specialty_info(full_text)
+    if info is None:
         return None, None, None
-    mm = re.match(r"^(.*?)\[", full_text)
-    major = mm.group(1).strip() if mm else full_text.strip()
-    sm = re.search(r"\[(.*?)\]", full_text)
-    specialty = sm.group(1).strip() if sm else None
-    types = re.findall(r"\((.*?)\)", full_text)
-    education_type = None
-    if types:
-        types = [t.strip() for t in types if "Ваучер" not in t]
-        education_type = ", ".join(types) if types else None
-    return major, specialty, education_type
+    return info.major, info.specialty, info.education_type
 
 def is_part_time(education_type: Optional[str]) -> int:
     if not education_type: return 0
     return 1 if re.search(r"Сырттан", education_type, flags=re.I) else 0
 
-def parse_certificate(text: Optional[str]):
-    admitted = False
-    note = None
-    if not text:
-        return None, admitted, note
-    if "(Реком" in text:
-        admitted = True
-        text = text.replace("(Реком)", "").strip()
-    m = re.search(r"\[(.*)\]", text)
-    if m:
-        note = m.group(1).strip()
-        text = re.sub(r"\[.*\]", "", text).strip()
-    return text, admitted, note
-
 # --------- DB helpers ---------
 async def get_pool():
-    return await aiomysql.create_pool(**MYSQL_DSN, maxsize=10)
+    if aiomysql is None:
+        raise RuntimeError("Для загрузки в MySQL нужен aiomysql: pip install aiomysql (без сервера — pl_sqlite.py)")
+    return await aiomysql.create_pool(**MYSQL_DSN, maxsize=POOL_MAXSIZE, cursorclass=TimedCursor)
 
 async def exec_many(cur, sql, params_seq):
-    for params in params_seq:
-        await cur.execute(sql, params)
+    # aiomysql переписывает "INSERT ... VALUES (%s,...)" (пробел перед скобкой обязателен)
+    # в многострочный INSERT
+    params_seq = list(params_seq)
+    if params_seq:
+        await cur.executemany(sql, params_seq)
 
 # Upsert University по name (TEXT) через name_hash
-async def upsert_university(pool, name: str, site: Optional[str], address: Optional[str],
+async def upsert_university(cur, name: str, site: Optional[str], address: Optional[str],
                             rector: Optional[str], raw_html: Optional[str]) -> int:
+    sql = """
+    INSERT INTO universities(name, site, address, rector_name, raw_data, faculty_ids)
+    VALUES (%s, %s, %s, %s, %s, JSON_ARRAY())
+    ON DUPLICATE KEY UPDATE
+      site=VALUES(site), address=VALUES(address), rector_name=VALUES(rector_name),
+      raw_data=VALUES(raw_data);
+    """
+    await cur.execute(sql, (name, site, address, rector, raw_html))
+    # получить id (LAST_INSERT_ID на дублях не меняется, поэтому запрашиваем)
+    await cur.execute("SELECT id FROM universities WHERE name_hash=UNHEX(MD5(%s))", (name,))
+    row = await cur.fetchone()
+    return int(row[0])
+
+# Естественные ключи: natural_key = MD5(частей ключа), UNIQUE (см. ensure_natural_keys)
+def natural_key(*parts) -> bytes:
+    return hashlib.md5("\x1f".join("" if p is None else str(p) for p in parts).encode("utf-8")).digest()
+
+async def ensure_natural_keys(pool):
+    """
+    Добавляет natural_key BINARY(16) + UNIQUE туда, где его ещё нет. Строки, загруженные
+    до natural_key, upsert не находит — импорт загрузил бы всё второй раз, а восстановить
+    ключи по старым данным нельзя (прежние прогоны дублировали факультеты и специальности).
+    Поэтому заполненная таблица без ключей -> RuntimeError: нужен чистый реимпорт.
+    """
     async with pool.acquire() as conn:
         async with conn.cursor() as cur:
-            sql = """
-            INSERT INTO universities(name, site, address, rector_name, raw_data, faculty_ids)
-            VALUES (%s, %s, %s, %s, %s, JSON_ARRAY())
-            ON DUPLICATE KEY UPDATE
-              site=VALUES(site), address=VALUES(address), rector_name=VALUES(rector_name),
-              raw_data=VALUES(raw_data);
-            """
-            await cur.execute(sql, (name, site, address, rector, raw_html))
-            # получить id (LAST_INSERT_ID на дублях не меняется, поэтому запрашиваем)
-            await cur.execute("SELECT id FROM universities WHERE name_hash=UNHEX(MD5(%s))", (name,))
-            row = await cur.fetchone()
-            return int(row[0])
-
-async def insert_faculty(pool, name: str, raw_html: Optional[str]) -> int:
-    async with pool.acquire() as conn:
-        async with conn.cursor() as cur:
-            await cur.execute(
-                "INSERT INTO faculties(name, raw_data, specialty_ids) VALUES(%s,%s, JSON_ARRAY())",
-                (name, raw_html)
-            )
-            return cur.lastrowid
-
-async def link_university_faculty(pool, university_id: int, faculty_id: int):
-    async with pool.acquire() as conn:
-        async with conn.cursor() as cur:
-            await cur.execute(
-                "INSERT IGNORE INTO university_faculties(university_id, faculty_id) VALUES(%s,%s)",
-                (university_id, faculty_id)
-            )
+            missing, legacy = [], []
+            for table in NATURAL_KEY_TABLES:
+                await cur.execute("""
+                    SELECT 1 FROM information_schema.COLUMNS
+                    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = 'natural_key'
+                """, (table,))
+                if await cur.fetchone():
+                    await cur.execute(f"SELECT 1 FROM `{table}` WHERE natural_key IS NULL LIMIT 1")
+                else:
+                    missing.append(table)
+                    await cur.execute(f"SELECT 1 FROM `{table}` LIMIT 1")
+                if await cur.fetchone():
+                    legacy.append(table)
+            if legacy:
+                raise RuntimeError(
+                    f"В {', '.join(legacy)} есть строки без natural_key (загружены до идемпотентного импорта): "
+                    f"повторный импорт их задублирует. Нужен чистый реимпорт — очистите "
+                    f"{', '.join(NATURAL_KEY_TABLES + LINK_TABLES)} и запустите pl_sql.py снова"
+                )
+            for table in missing:
+                await cur.execute(f"ALTER TABLE `{table}` ADD COLUMN natural_key BINARY(16) NULL, "
+                                  f"ADD UNIQUE KEY `uq_{table}_natural_key` (natural_key)")
+        await conn.commit()
+
+# Upsert Faculty по (университет, название)
+async def upsert_faculty(cur, university_id: int, name: str, raw_html: Optional[str]) -> int:
+    key = natural_key(university_id, name)
+    await cur.execute("""
+        INSERT INTO faculties(name, raw_data, specialty_ids, natural_key) VALUES (%s, %s, JSON_ARRAY(), %s)
+        ON DUPLICATE KEY UPDATE raw_data=VALUES(raw_data)
+    """, (name, raw_html, key))
+    await cur.execute("SELECT id FROM faculties WHERE natural_key=%s", (key,))
+    row = await cur.fetchone()
+    return int(row[0])
+
+async def link_university_faculty(cur, university_id: int, faculty_id: int) -> bool:
+    await cur.execute(
+        "INSERT IGNORE INTO university_faculties(university_id, faculty_id) VALUES(%s,%s)",
+        (university_id, faculty_id)
+    )
+    return cur.rowcount > 0   # True -> связь новая
+
+SPECIALTY_COLUMNS = (
+    "code, specialty_name, major_name, faculty_name, university_name, "
+    "has_contract, has_budget, has_voucher, contract_amount_year, "
+    "is_part_time, main_pass_score, extra_pass_scores, required_extra_subjects, raw_data"
+)
 
-async def insert_specialty(pool, *, code: Optional[str], specialty_name: Optional[str],
+# Upsert Specialty по (факультет, код, форма оплаты, страница рейтинга)
+async def upsert_specialty(cur, *, faculty_id: int, payment_form: Optional[str], rating_file: Optional[str],
+                           code: Optional[str], specialty_name: Optional[str],
                            major_name: Optional[str], faculty_name: Optional[str],
                            university_name: Optional[str], has_contract: int,
                            has_budget: int, has_voucher: int, contract_amount: Optional[int],
                            is_part_time_flag: int, main_pass: Optional[int],
                            extra_count: Optional[int], extra_subjects: Optional[dict],
-                           raw_html: Optional[str]) -> int:
-    async with pool.acquire() as conn:
-        async with conn.cursor() as cur:
-            await cur.execute("""
-                INSERT INTO specialties (
-                  code, specialty_name, major_name, faculty_name, university_name,
-                  has_contract, has_budget, has_voucher, contract_amount_year,
-                  is_part_time, main_pass_score, extra_pass_scores, required_extra_subjects,
-                  application_ids, raw_data
-                ) VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s, JSON_ARRAY(), %s)
-            """, (
-                code, specialty_name, major_name, faculty_name, university_name,
-                has_contract, has_budget, has_voucher, contract_amount,
-                is_part_time_flag, main_pass,
-                json.dumps(extra_subjects, ensure_ascii=False) if extra_subjects else None,
-                extra_count, raw_html
-            ))
-            return cur.lastrowid
-
-async def link_faculty_specialty(pool, faculty_id: int, specialty_id: int):
-    async with pool.acquire() as conn:
-        async with conn.cursor() as cur:
-            await cur.execute(
-                "INSERT IGNORE INTO faculty_specialties(faculty_id, specialty_id) VALUES(%s,%s)",
-                (faculty_id, specialty_id)
-            )
-
-async def insert_application(pool, *, certificate_no: Optional[str],
+                           raw_html: Optional[str]) -> Tuple[int, bool]:
+    """Возвращает (id, создана ли запись сейчас)"""
+    key = natural_key(faculty_id, code, payment_form, rating_file)
+    params = (
+        code, specialty_name, major_name, faculty_name, university_name,
+        has_contract, has_budget, has_voucher, contract_amount,
+        is_part_time_flag, main_pass,
+        json.dumps(extra_subjects, ensure_ascii=False) if extra_subjects else None,
+        extra_count, raw_html
+    )
+    await cur.execute("SELECT id FROM specialties WHERE natural_key=%s", (key,))
+    row = await cur.fetchone()
+    if row:
+        # одинаковые значения MySQL не перезаписывает -> неизменная специальность не трогается
+        await cur.execute(
+            "UPDATE specialties SET " + ", ".join(f"{c}=%s" for c in SPECIALTY_COLUMNS.split(", ")) + " WHERE id=%s",
+            params + (row[0],)
+        )
+        return int(row[0]), False
+    await cur.execute(f"""
+        INSERT INTO specialties ({SPECIALTY_COLUMNS}, application_ids, natural_key)
+        VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s, JSON_ARRAY(), %s)
+    """, params + (key,))
+    return cur.lastrowid, True
+
+async def link_faculty_specialty(cur, faculty_id: int, specialty_id: int) -> bool:
+    await cur.execute(
+        "INSERT IGNORE INTO faculty_specialties(faculty_id, specialty_id) VALUES(%s,%s)",
+        (faculty_id, specialty_id)
+    )
+    return cur.rowcount > 0   # True -> связь новая
+
+async def insert_application(cur, *, certificate_no: Optional[str],
                              main_score: Optional[int], extra_score: Optional[int],
                              total_score: Optional[int], category: Optional[str],
                              date_text: Optional[str], admitted: int,
                              specialty_id: int, faculty_id: int, university_id: int,
                              raw_html: Optional[str]) -> int:
+    await cur.execute("""
+        INSERT INTO applications (
+          certificate_no, main_score, extra_score, total_score,
+          category, date_text, admitted,
+          specialty_ids, faculty_ids, university_ids, raw_data, natural_key
+        ) VALUES (%s,%s,%s,%s,%s,%s,%s,
+                  JSON_ARRAY(%s), JSON_ARRAY(%s), JSON_ARRAY(%s), %s, %s)
+    """, (
+        certificate_no, main_score, extra_score, total_score,
+        category, date_text, admitted,
+        specialty_id, faculty_id, university_id, raw_html,
+        natural_key(specialty_id, certificate_no)
+    ))
+    app_id = cur.lastrowid
+    # связи
+    await cur.execute("INSERT INTO specialty_applications(specialty_id, application_id) VALUES(%s,%s)",
+                      (specialty_id, app_id))
+    await cur.execute("INSERT INTO application_specialties(application_id, specialty_id) VALUES(%s,%s)",
+                      (app_id, specialty_id))
+    await cur.execute("INSERT INTO application_faculties(application_id, faculty_id) VALUES(%s,%s)",
+                      (app_id, faculty_id))
+    await cur.execute("INSERT INTO application_universities(application_id, university_id) VALUES(%s,%s)",
+                      (app_id, university_id))
+    return app_id
+
+APPLICATION_COLUMNS = (
+    "certificate_no, main_score, extra_score, total_score, category, date_text, admitted, "
+    "specialty_ids, faculty_ids, university_ids, raw_data, natural_key"
+)
+
+async def application_ids(cur, keys: list[bytes]) -> list[int]:
+    """
+    id заявок по natural_key в порядке keys. Диапазон из LAST_INSERT_ID() не годится: при
+    innodb_autoinc_lock_mode=2 (по умолчанию в MySQL 8) параллельные транзакции университетов
+    получают id вперемешку даже внутри одного многострочного INSERT / LOAD DATA.
+    """
+    found = {}
+    for i in range(0, len(keys), BULK_BATCH_SIZE):
+        chunk = keys[i:i + BULK_BATCH_SIZE]
+        marks = ",".join(["%s"] * len(chunk))
+        await cur.execute(f"SELECT id, natural_key FROM applications WHERE natural_key IN ({marks})", chunk)
+        found.update((bytes(key), int(app_id)) for app_id, key in await cur.fetchall())
+    missing = len(keys) - sum(k in found for k in keys)
+    if missing:
+        raise RuntimeError(f"Не найдено {missing} только что вставленных заявок по natural_key")
+    return [found[k] for k in keys]
+
+async def insert_applications_bulk(cur, rows: list[dict], *, specialty_id: int, faculty_id: int,
+                                   university_id: int) -> list[int]:
+    """
+    Заявки одной специальности пачками: многострочный INSERT на BULK_BATCH_SIZE строк
+    + по одному многострочному INSERT на каждую таблицу связей.
+    id для связей читаются обратно по natural_key (application_ids).
+    """
+    if not rows:
+        return []
+    # JSON-массивы считаем на клиенте: VALUES должен состоять только из %s
+    spec_json, fac_json, uni_json = (json.dumps([specialty_id]), json.dumps([faculty_id]),
+                                     json.dumps([university_id]))
+    app_ids = []
+    for i in range(0, len(rows), BULK_BATCH_SIZE):
+        batch = rows[i:i + BULK_BATCH_SIZE]
+        placeholders = ",".join(["(%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)"] * len(batch))
+        params, keys = [], []
+        for r in batch:
+            keys.append(natural_key(specialty_id, r["certificate"]))
+            params.extend((
+                r["certificate"], r["main_score"], r["extra_score"], r["total_score"],
+                r["category"], r["date"], r["admitted"],
+                spec_json, fac_json, uni_json, r["raw_html"], keys[-1]
+            ))
+        await cur.execute(f"INSERT INTO applications ({APPLICATION_COLUMNS}) VALUES {placeholders}", params)
+        app_ids.extend(await application_ids(cur, keys))
+
+    # связи
+    await exec_many(cur, "INSERT INTO specialty_applications(specialty_id, application_id) VALUES (%s,%s)",
+                    [(specialty_id, a) for a in app_ids])
+    await exec_many(cur, "INSERT INTO application_specialties(application_id, specialty_id) VALUES (%s,%s)",
+                    [(a, specialty_id) for a in app_ids])
+    await exec_many(cur, "INSERT INTO application_faculties(application_id, faculty_id) VALUES (%s,%s)",
+                    [(a, faculty_id) for a in app_ids])
+    await exec_many(cur, "INSERT INTO application_universities(application_id, university_id) VALUES (%s,%s)",
+                    [(a, university_id) for a in app_ids])
+    return app_ids
+
+# --------- Дельта заявок специальности ---------
+def application_values(r: dict) -> tuple:
+    """Сравниваемые поля заявки (порядок как в SELECT existing_applications)"""
+    return (r["main_score"], r["extra_score"], r["total_score"], r["category"], r["date"], r["admitted"])
+
+async def existing_applications(cur, specialty_id: int) -> dict:
+    """certificate_no -> (id, application_values) для уже загруженных заявок специальности"""
+    await cur.execute("""
+        SELECT a.id, a.certificate_no, a.main_score, a.extra_score, a.total_score,
+               a.category, a.date_text, a.admitted
+        FROM specialty_applications sa JOIN applications a ON a.id = sa.application_id
+        WHERE sa.specialty_id = %s
+    """, (specialty_id,))
+    return {row[1]: (row[0], tuple(row[2:])) for row in await cur.fetchall()}
+
+async def delete_where_in(cur, table: str, column: str, ids: list[int]) -> None:
+    for i in range(0, len(ids), BULK_BATCH_SIZE):
+        chunk = ids[i:i + BULK_BATCH_SIZE]
+        await cur.execute(f"DELETE FROM `{table}` WHERE {column} IN ({','.join(['%s'] * len(chunk))})", chunk)
+
+async def select_where_in(cur, sql: str, ids: list[int]) -> list[tuple]:
+    """sql с одним «IN ({marks})»; ids разбиваются на пачки по BULK_BATCH_SIZE"""
+    out = []
+    for i in range(0, len(ids), BULK_BATCH_SIZE):
+        chunk = ids[i:i + BULK_BATCH_SIZE]
+        await cur.execute(sql.format(marks=",".join(["%s"] * len(chunk))), chunk)
+        out.extend(await cur.fetchall())
+    return out
+
+async def delete_applications(cur, app_ids: list[int]) -> None:
+    for table in INFILE_TABLES[1:]:   # таблицы связей
+        await delete_where_in(cur, table, "application_id", app_ids)
+    await delete_where_in(cur, "applications", "id", app_ids)
+
+async def sync_applications(cur, rows: list[dict], *, specialty_id: int,
+                            is_new: bool) -> Tuple[list[dict], int]:
+    """
+    Изменённые заявки -> UPDATE, пропавшие из рейтинга -> DELETE (со связями).
+    Возвращает (новые заявки, число удалённых); новые вставляет выбранный APPLICATIONS_LOADER.
+    Только сдвиг номера в рейтинге (num / raw_data) изменением не считается.
+    """
+    seen, fresh, changed = set(), [], []
+    existing = {} if is_new else await existing_applications(cur, specialty_id)
+    for r in rows:
+        if r["certificate"] in seen:
+            continue   # (специальность, сертификат) — ключ; повтор в рейтинге не дублируем
+        seen.add(r["certificate"])
+        prev = existing.pop(r["certificate"], None)
+        if prev is None:
+            fresh.append(r)
+        elif prev[1] != application_values(r):
+            changed.append(application_values(r) + (r["raw_html"], prev[0]))
+
+    await exec_many(cur, """
+        UPDATE applications SET main_score=%s, extra_score=%s, total_score=%s,
+               category=%s, date_text=%s, admitted=%s, raw_data=%s
+        WHERE id=%s
+    """, changed)
+    if existing:
+        await delete_applications(cur, [app_id for app_id, _ in existing.values()])
+    return fresh, len(existing)
+
+# --------- Факультеты и специальности, пропавшие из reports*.html ---------
+async def prune_university(cur, university_id: int, faculty_ids: set[int], specialty_ids: set[int],
+                           touched: dict) -> None:
+    """
+    Удаляет факультеты и специальности университета, которых не было в этом проходе
+    (faculty_ids / specialty_ids — встреченные), вместе с их заявками и связями
+    """
+    await cur.execute("SELECT faculty_id FROM university_faculties WHERE university_id = %s", (university_id,))
+    linked = [int(row[0]) for row in await cur.fetchall()]
+    gone_faculties = [f for f in linked if f not in faculty_ids]
+    gone_specialties = []
+    pairs = await select_where_in(
+        cur, "SELECT faculty_id, specialty_id FROM faculty_specialties WHERE faculty_id IN ({marks})", linked)
+    for faculty_id, specialty_id in pairs:
+        if specialty_id not in specialty_ids:
+            gone_specialties.append(int(specialty_id))
+            if faculty_id in faculty_ids:
+                touched["faculties"].add(int(faculty_id))
+
+    if gone_specialties:
+        apps = await select_where_in(
+            cur, "SELECT application_id FROM specialty_applications WHERE specialty_id IN ({marks})",
+            gone_specialties)
+        await delete_applications(cur, [int(row[0]) for row in apps])
+        await delete_where_in(cur, "faculty_specialties", "specialty_id", gone_specialties)
+        await delete_where_in(cur, "specialties", "id", gone_specialties)
+    if gone_faculties:
+        touched["universities"].add(university_id)
+        await delete_where_in(cur, "university_faculties", "faculty_id", gone_faculties)
+        await delete_where_in(cur, "faculties", "id", gone_faculties)
+    metrics.count("faculties_deleted", len(gone_faculties))
+    metrics.count("specialties_deleted", len(gone_specialties))
+
+# --------- LOAD DATA LOCAL INFILE ---------
+def tsv_field(v) -> str:
+    # формат LOAD DATA по умолчанию: \t между полями, \n между строками, \\ — экранирование, \N — NULL
+    if v is None:
+        return "\\N"
+    return (str(v).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+            .replace("\r", "\\r").replace("\0", "\\0"))
+
+def tsv_line(values) -> str:
+    return "\t".join(tsv_field(v) for v in values) + "\n"
+
+class InfileBatch:
+    """
+    Новые заявки одного университета для LOAD DATA: копятся по специальностям и загружаются
+    load_infile в транзакции этого университета — откат университета откатывает и их.
+    """
+
+    def __init__(self):
+        self.items = []                # (specialty_id, faculty_id, university_id, rows)
+        self.specialties = set()
+
+    def add(self, rows: list[dict], *, specialty_id: int, faculty_id: int, university_id: int) -> None:
+        self.items.append((specialty_id, faculty_id, university_id, rows))
+        self.specialties.add(specialty_id)
+
+    def clear(self) -> None:
+        self.items = []
+        self.specialties = set()
+
+# natural_key в TSV — hex, в бинарный вид переводит SET; id выдаёт AUTO_INCREMENT
+INFILE_COLUMNS = {
+    "applications": "(" + APPLICATION_COLUMNS.replace("natural_key", "@natural_key") + ") "
+                    "SET natural_key = UNHEX(@natural_key)",
+    "specialty_applications": "(specialty_id, application_id)",
+    "application_specialties": "(application_id, specialty_id)",
+    "application_faculties": "(application_id, faculty_id)",
+    "application_universities": "(application_id, university_id)",
+}
+
+async def load_infile_table(cur, table: str, path: str, lines: list[str]) -> None:
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.writelines(lines)
+    await cur.execute(
+        f"LOAD DATA LOCAL INFILE %s INTO TABLE `{table}` CHARACTER SET utf8mb4 {INFILE_COLUMNS[table]}",
+        (path,)
+    )
+
+async def load_infile(cur, batch: InfileBatch) -> int:
+    """
+    Заявки батча: LOAD DATA в applications, id обратно по natural_key (application_ids),
+    затем LOAD DATA в таблицы связей. Вызывается внутри транзакции университета.
+    """
+    keys, owners, lines = [], [], []
+    for specialty_id, faculty_id, university_id, rows in batch.items:
+        spec_json, fac_json, uni_json = (json.dumps([specialty_id]), json.dumps([faculty_id]),
+                                         json.dumps([university_id]))
+        for r in rows:
+            keys.append(natural_key(specialty_id, r["certificate"]))
+            owners.append((specialty_id, faculty_id, university_id))
+            lines.append(tsv_line((
+                r["certificate"], r["main_score"], r["extra_score"], r["total_score"],
+                r["category"], r["date"], r["admitted"], spec_json, fac_json, uni_json, r["raw_html"],
+                keys[-1].hex()
+            )))
+    batch.clear()
+    if not keys:
+        return 0
+
+    with tempfile.TemporaryDirectory(prefix="admissions_infile_") as tmp:
+        await load_infile_table(cur, "applications", os.path.join(tmp, "applications.tsv"), lines)
+        app_ids = await application_ids(cur, keys)
+        links = {
+            "specialty_applications": [tsv_line((s, a)) for a, (s, _, _) in zip(app_ids, owners)],
+            "application_specialties": [tsv_line((a, s)) for a, (s, _, _) in zip(app_ids, owners)],
+            "application_faculties": [tsv_line((a, f)) for a, (_, f, _) in zip(app_ids, owners)],
+            "application_universities": [tsv_line((a, u)) for a, (_, _, u) in zip(app_ids, owners)],
+        }
+        for table, table_lines in links.items():
+            await load_infile_table(cur, table, os.path.join(tmp, f"{table}.tsv"), table_lines)
+    metrics.count("infile_rows", len(keys))
+    return len(keys)
+
+async def applications_empty(pool) -> bool:
     async with pool.acquire() as conn:
         async with conn.cursor() as cur:
-            await cur.execute("""
-                INSERT INTO applications (
-                  certificate_no, main_score, extra_score, total_score,
-                  category, date_text, admitted,
-                  specialty_ids, faculty_ids, university_ids, raw_data
-                ) VALUES (%s,%s,%s,%s,%s,%s,%s,
-                          JSON_ARRAY(%s), JSON_ARRAY(%s), JSON_ARRAY(%s), %s)
-            """, (
-                certificate_no, main_score, extra_score, total_score,
-                category, date_text, admitted,
-                specialty_id, faculty_id, university_id, raw_html
-            ))
-            app_id = cur.lastrowid
-            # связи
-            await cur.execute("INSERT INTO specialty_applications(specialty_id, application_id) VALUES(%s,%s)",
-                              (specialty_id, app_id))
-            await cur.execute("INSERT INTO application_specialties(application_id, specialty_id) VALUES(%s,%s)",
-                              (app_id, specialty_id))
-            await cur.execute("INSERT INTO application_faculties(application_id, faculty_id) VALUES(%s,%s)",
-                              (app_id, faculty_id))
-            await cur.execute("INSERT INTO application_universities(application_id, university_id) VALUES(%s,%s)",
-                              (app_id, university_id))
-            return app_id
-
-# Пересобираем JSON-списки *_ids из связей (после основного импорта)
-async def refresh_json_lists(pool):
+            await cur.execute("SELECT 1 FROM applications LIMIT 1")
+            row = await cur.fetchone()
+        await conn.commit()
+    return row is None
+
+# --------- Вторичные индексы на время полного реимпорта ---------
+def load_index_backup() -> dict:
+    """table -> {index: "ADD INDEX ..."} — снятые и ещё не восстановленные индексы"""
+    try:
+        with open(INDEX_BACKUP_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def save_index_backup(backup: dict) -> None:
+    os.makedirs(os.path.dirname(INDEX_BACKUP_PATH), exist_ok=True)
+    tmp = INDEX_BACKUP_PATH + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(backup, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, INDEX_BACKUP_PATH)
+
+async def index_names(cur, table: str) -> set[str]:
+    await cur.execute("""
+        SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+    """, (table,))
+    return {row[0] for row in await cur.fetchall()}
+
+async def drop_secondary_indexes(pool) -> None:
+    """
+    Снимает неуникальные вторичные индексы INFILE_TABLES (UNIQUE natural_key остаётся).
+    Определение индекса пишется в INDEX_BACKUP_PATH до DROP, поэтому его восстановит
+    restore_secondary_indexes — в этом прогоне или, если он упал, в следующем.
+    """
+    backup = load_index_backup()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            for table in INFILE_TABLES:
+                await cur.execute("""
+                    SELECT INDEX_NAME, INDEX_TYPE,
+                           GROUP_CONCAT(CONCAT('`', COLUMN_NAME, '`',
+                                               IF(SUB_PART IS NULL, '', CONCAT('(', SUB_PART, ')')))
+                                        ORDER BY SEQ_IN_INDEX)
+                    FROM information_schema.STATISTICS
+                    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME <> 'PRIMARY'
+                      AND NON_UNIQUE = 1
+                    GROUP BY INDEX_NAME, INDEX_TYPE
+                """, (table,))
+                for name, index_type, cols in await cur.fetchall():
+                    kind = "FULLTEXT INDEX" if index_type == "FULLTEXT" else "INDEX"
+                    backup.setdefault(table, {})[name] = f"ADD {kind} `{name}` ({cols})"
+                    save_index_backup(backup)
+                    try:
+                        await cur.execute(f"ALTER TABLE `{table}` DROP INDEX `{name}`")
+                    except aiomysql.OperationalError:
+                        # индекс держит внешний ключ (1553) — остаётся на месте
+                        del backup[table][name]
+                        save_index_backup(backup)
+
+async def restore_secondary_indexes(pool) -> int:
+    """Возвращает индексы из INDEX_BACKUP_PATH (одним ALTER на таблицу); файл удаляется после успеха"""
+    backup = load_index_backup()
+    restored = 0
     async with pool.acquire() as conn:
         async with conn.cursor() as cur:
-            # universities.faculty_ids
-            await cur.execute("""
-                UPDATE universities u
-                JOIN (
-                  SELECT university_id, JSON_ARRAYAGG(faculty_id) AS arr
-                  FROM university_faculties GROUP BY university_id
-                ) t ON t.university_id = u.id
-                SET u.faculty_ids = t.arr
-            """)
-            # faculties.specialty_ids
-            await cur.execute("""
-                UPDATE faculties f
-                JOIN (
-                  SELECT faculty_id, JSON_ARRAYAGG(specialty_id) AS arr
-                  FROM faculty_specialties GROUP BY faculty_id
-                ) t ON t.faculty_id = f.id
-                SET f.specialty_ids = t.arr
-            """)
-            # specialties.application_ids
-            await cur.execute("""
-                UPDATE specialties s
-                JOIN (
-                  SELECT specialty_id, JSON_ARRAYAGG(application_id) AS arr
-                  FROM specialty_applications GROUP BY specialty_id
-                ) t ON t.specialty_id = s.id
-                SET s.application_ids = t.arr
-            """)
+            for table, adds in backup.items():
+                present = await index_names(cur, table)
+                missing = [add for name, add in adds.items() if name not in present]
+                if missing:
+                    # индекс строится один раз по всем данным, а не на каждую вставку
+                    await cur.execute(f"ALTER TABLE `{table}` " + ", ".join(missing))
+                    restored += len(missing)
+    if backup:
+        os.remove(INDEX_BACKUP_PATH)
+    return restored
+
+# --------- JSON-списки *_ids ---------
+# родитель -> (таблица связей, колонка родителя, колонка ребёнка, JSON-колонка родителя)
+JSON_LISTS = {
+    "universities": ("university_faculties", "university_id", "faculty_id", "faculty_ids"),
+    "faculties": ("faculty_specialties", "faculty_id", "specialty_id", "specialty_ids"),
+    "specialties": ("specialty_applications", "specialty_id", "application_id", "application_ids"),
+}
+
+def new_touched() -> dict:
+    """Родители, у которых в этом импорте изменился набор связей"""
+    return {parent: set() for parent in JSON_LISTS}
+
+def merge_touched(into: dict, other: dict) -> None:
+    for parent, ids in other.items():
+        into[parent] |= ids
+
+async def refresh_json_list(cur, parent: str, ids: Optional[list[int]] = None) -> None:
+    """
+    Пересобирает parent.<json> по таблице связей. ids=None -> все родители со связями
+    (полный проход); иначе только перечисленные, у оставшихся без связей -> [].
+    """
+    link, parent_col, child_col, json_col = JSON_LISTS[parent]
+    if ids is None:
+        await cur.execute(f"""
+            UPDATE {parent} p
+            JOIN (
+              SELECT {parent_col}, JSON_ARRAYAGG({child_col}) AS arr
+              FROM {link} GROUP BY {parent_col}
+            ) t ON t.{parent_col} = p.id
+            SET p.{json_col} = t.arr
+        """)
+        return
+    for i in range(0, len(ids), BULK_BATCH_SIZE):
+        chunk = ids[i:i + BULK_BATCH_SIZE]
+        marks = ",".join(["%s"] * len(chunk))
+        await cur.execute(f"""
+            UPDATE {parent} p
+            LEFT JOIN (
+              SELECT {parent_col}, JSON_ARRAYAGG({child_col}) AS arr
+              FROM {link} WHERE {parent_col} IN ({marks}) GROUP BY {parent_col}
+            ) t ON t.{parent_col} = p.id
+            SET p.{json_col} = COALESCE(t.arr, JSON_ARRAY())
+            WHERE p.id IN ({marks})
+        """, chunk + chunk)
+
+async def refresh_json_lists(pool, touched: Optional[dict] = None):
+    """touched=None -> полная пересборка; иначе только затронутые импортом родители"""
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            for parent in JSON_LISTS:
+                ids = None if touched is None else sorted(touched[parent])
+                if ids is None or ids:
+                    await refresh_json_list(cur, parent, ids)
+        await conn.commit()
 
 # --------- Парсеры HTML (как у вас, но без сохранения JSON-файлов) ---------
 def parse_faculties_from_report(report_html: str) -> list[dict]:
-    soup = BeautifulSoup(report_html, "html.parser")
+    soup = make_soup(report_html)
     faculties = []
     for card in soup.select("li.card-item"):
         faculty_name = clean_text(card.select_one("p.university-name"))
@@ -282,141 +696,290 @@ def parse_faculties_from_report(report_html: str) -> list[dict]:
         faculties.append({"faculty_name": faculty_name, "raw_html": str(card), "directions": directions})
     return faculties
 
-def parse_rating_table(html: str) -> tuple[dict, list[dict]]:
-    soup = BeautifulSoup(html, "html.parser")
+def application_params(r: RatingRow) -> dict:
+    """Запись из общего потока rating_core -> строка applications"""
+    return {
+        "raw_html": r.raw_html,
+        "num": r.num,
+        "certificate": r.certificate,
+        "main_score": r.main,
+        "extra_score": r.extra,
+        "total_score": r.total,
+        "category": r.category,
+        "date": r.date,
+        "admitted": 1 if r.admitted else 0
+    }
 
+def parse_rating_table(html: str) -> tuple[dict, list[dict]]:
     header = {}
-    top_block = soup.select_one("div.text-right")
-    if top_block:
-        spans = top_block.find_all("span")
-        if len(spans) >= 1: header["university"] = clean_text(spans[0])
-        if len(spans) >= 2: header["director"] = clean_text(spans[1])
-    program_tag = soup.select_one("p.headerColor b")
-    if program_tag:
-        header["program"] = clean_text(program_tag)
-
     rows_out = []
-    # Каждая <table.table> может быть бюджет/ваучер/контракт
-    for table in soup.select("table.table"):
-        header_text = clean_text(table.select_one("div.cityColir"))
-        is_contract = header_text is None
-        for tr in table.select("tbody tr"):
-            cols = [clean_text(td) for td in tr.find_all(["td", "th"])]
-            if len(cols) < 2: continue
-            cert_text, admitted, _note = parse_certificate(cols[1])
-            if is_contract and len(cols) >= 6:
-                category = cols[5]
-            elif header_text:
-                category = header_text.split(":")[0].strip()
-            else:
-                category = None
-            rows_out.append({
-                "raw_html": str(tr),
-                "num": cols[0],
-                "certificate": cert_text,
-                "main_score": parse_int_safe(cols[2] if len(cols) > 2 else None),
-                "extra_score": parse_int_safe(cols[3] if len(cols) > 3 else None),
-                "total_score": parse_int_safe(cols[4] if len(cols) > 4 else None),
-                "category": category,
-                "date": cols[6] if is_contract and len(cols) >= 7 else (cols[5] if not is_contract and len(cols) >= 6 else None),
-                "admitted": 1 if admitted else 0
-            })
+    for item in iter_rating_items_html(html, with_raw=True):
+        if isinstance(item, RatingRow):
+            rows_out.append(application_params(item))
+        elif isinstance(item, RatingMeta):
+            header[item.field] = item.value
     return header, rows_out
 
-# --------- Главный ETL ---------
-async def run_pipeline():
-    pool = await get_pool()
+def write_rating_sync(path: str, data: dict) -> None:
+    with open(rating_path(path, RATINGS_FORMAT), "wb") as f:
+        f.write(dump_rating(data, RATINGS_FORMAT))
 
-    # 1) index.html -> список университетов (с базовыми полями)
-    index_html = await read_file(INDEX_HTML)
-    soup = BeautifulSoup(index_html, "html.parser")
-    uni_cards = soup.select("li.universities-item")
+def write_ratings_sync(exports: list[tuple[str, dict]]) -> None:
+    for path, data in exports:
+        write_rating_sync(path, data)
 
-    for li in uni_cards:
+# --------- Главный ETL ---------
+def parse_university_cards(index_html: str) -> list[dict]:
+    """index.html -> список университетов (с базовыми полями)"""
+    soup = make_soup(index_html)
+    unis = []
+    for li in soup.select("li.universities-item"):
         name_tag = li.select_one("a.university-name")
         if not name_tag: continue
-        uni_name = clean_text(name_tag)
-        report_file = name_tag["href"].split("?")[0] if name_tag.has_attr("href") else None
 
         addr_tag = li.find("div", string=lambda t: t and "Адрес" in t)
-        address = clean_text(addr_tag.find_next("p")) if addr_tag else None
-
         rector_tag = li.find("div", string=lambda t: t and any(k in t for k in ["Ректор", "Начальник", "И.о.ректор"]))
-        rector = clean_text(rector_tag.find_next("p")) if rector_tag else None
-
         site_tag = li.find("a", href=True, class_="sm-text")
-        site = site_tag.get("href") if site_tag else None
-
-        university_id = await upsert_university(pool, uni_name, site, address, rector, str(li))
-
-        # 2) reports*.html — факультеты и направления
-        if not report_file:
-            continue
-        report_path = os.path.join(REPORTS_DIR, report_file)
-        if not os.path.exists(report_path):
-            continue
-
-        report_html = await read_file(report_path)
-        faculties = parse_faculties_from_report(report_html)
-
-        for fac in faculties:
-            faculty_id = await insert_faculty(pool, fac["faculty_name"], fac["raw_html"])
-            await link_university_faculty(pool, university_id, faculty_id)
-
-            for d in fac["directions"]:
-                # признаки форм
-                has_contract = 1 if d["payment_form"] == "Контракт" else 0
-                has_budget  = 1 if d["payment_form"] == "Бюджет"   else 0
-                has_voucher = 1 if d["payment_form"] == "Ваучер"   else 0
-
-                spec_id = await insert_specialty(
-                    pool,
-                    code=d["code"],
-                    specialty_name=d["specialty"],
-                    major_name=d["major"],
-                    faculty_name=fac["faculty_name"],
-                    university_name=uni_name,
-                    has_contract=has_contract,
-                    has_budget=has_budget,
-                    has_voucher=has_voucher,
-                    contract_amount=d["payment_amount"],
-                    is_part_time_flag=is_part_time(d["education_type"]),
-                    main_pass=d["main_pass"],
-                    extra_count=d["extra_count"],
-                    extra_subjects=d["extra_subjects"],
-                    raw_html=d["raw_html"]
+
+        unis.append({
+            "name": clean_text(name_tag),
+            "report_file": name_tag["href"].split("?")[0] if name_tag.has_attr("href") else None,
+            "address": clean_text(addr_tag.find_next("p")) if addr_tag else None,
+            "rector": clean_text(rector_tag.find_next("p")) if rector_tag else None,
+            "site": site_tag.get("href") if site_tag else None,
+            "raw_html": str(li)
+        })
+    return unis
+
+async def load_university(cur, uni: dict, export_json: bool, full_reimport: bool = False,
+                          touched: dict | None = None, exports: list | None = None) -> int:
+    """
+    Все строки одного университета; вызывается внутри его транзакции. Возвращает число заявок.
+    В touched (new_touched()) отмечаются родители, у которых изменились связи.
+    full_reimport — applications была пуста в начале прогона: у специальностей нет заявок.
+    В exports копятся (путь, данные) rating_*.json — пишет их вызывающий после коммита.
+    """
+    touched = touched if touched is not None else new_touched()
+    exports = exports if exports is not None else []
+    batch = InfileBatch() if APPLICATIONS_LOADER == "infile" else None
+    faculties_seen, specialties_seen = set(), set()
+    uni_name = uni["name"]
+    university_id = await upsert_university(cur, uni_name, uni["site"], uni["address"], uni["rector"],
+                                            uni["raw_html"])
+    loaded = 0
+
+    # 2) reports*.html — факультеты и направления
+    report_file = uni["report_file"]
+    if not report_file:
+        return loaded
+    report_path = os.path.join(REPORTS_DIR, report_file)
+    if not os.path.exists(report_path):
+        return loaded
+
+    report_html = await read_file(report_path)
+    faculties = parse_faculties_from_report(report_html)
+
+    for fac in faculties:
+        faculty_id = await upsert_faculty(cur, university_id, fac["faculty_name"], fac["raw_html"])
+        faculties_seen.add(faculty_id)
+        if await link_university_faculty(cur, university_id, faculty_id):
+            touched["universities"].add(university_id)
+
+        for d in fac["directions"]:
+            # признаки форм
+            has_contract = 1 if d["payment_form"] == "Контракт" else 0
+            has_budget  = 1 if d["payment_form"] == "Бюджет"   else 0
+            has_voucher = 1 if d["payment_form"] == "Ваучер"   else 0
+
+            spec_id, spec_is_new = await upsert_specialty(
+                cur,
+                faculty_id=faculty_id,
+                payment_form=d["payment_form"],
+                rating_file=d["rating_file"],
+                code=d["code"],
+                specialty_name=d["specialty"],
+                major_name=d["major"],
+                faculty_name=fac["faculty_name"],
+                university_name=uni_name,
+                has_contract=has_contract,
+                has_budget=has_budget,
+                has_voucher=has_voucher,
+                contract_amount=d["payment_amount"],
+                is_part_time_flag=is_part_time(d["education_type"]),
+                main_pass=d["main_pass"],
+                extra_count=d["extra_count"],
+                extra_subjects=d["extra_subjects"],
+                raw_html=d["raw_html"]
+            )
+            if await link_faculty_specialty(cur, faculty_id, spec_id):
+                touched["faculties"].add(faculty_id)
+            first_seen = spec_id not in specialties_seen
+            specialties_seen.add(spec_id)
+
+            # 3) На этом шаге сразу прогружаем заявки из рейтингов
+            rating_file = d.get("rating_file")
+            if not rating_file:
+                continue
+            rating_path = os.path.join(RATINGS_HTML_DIR, rating_file)
+            if not os.path.exists(rating_path):
+                continue
+
+            # один проход по файлу: строки -> MySQL и (опц.) тот же поток -> rating_*.json
+            json_out = RatingJsonBuilder(rating_file) if export_json else None
+            buffered = []
+            metrics.count("rating_files")
+            metrics.count("bytes_read", os.path.getsize(rating_path))
+            for item in iter_rating_items(rating_path, with_raw=True):
+                if json_out is not None:
+                    json_out.add(item)
+                if not isinstance(item, RatingRow):
+                    continue
+                buffered.append(application_params(item))
+            loaded += len(buffered)
+            metrics.count("rows", len(buffered))
+
+            # заявок у специальности ещё нет: новая или полный реимпорт (и в этом проходе не встречалась)
+            empty = spec_is_new or (full_reimport and first_seen)
+            if batch is not None and spec_id in batch.specialties:
+                await load_infile(cur, batch)   # повтор направления: дельте нужны уже загруженные заявки
+
+            # дельта: изменённые/пропавшие заявки обработаны, остаются только новые
+            fresh, removed = await sync_applications(cur, buffered, specialty_id=spec_id, is_new=empty)
+            if fresh or removed:
+                touched["specialties"].add(spec_id)
+            if fresh and batch is not None and empty:
+                batch.add(fresh, specialty_id=spec_id, faculty_id=faculty_id, university_id=university_id)
+            elif fresh and APPLICATIONS_LOADER in ("bulk", "infile"):
+                await insert_applications_bulk(
+                    cur, fresh,
+                    specialty_id=spec_id, faculty_id=faculty_id, university_id=university_id
                 )
-                await link_faculty_specialty(pool, faculty_id, spec_id)
-
-                # 3) На этом шаге сразу прогружаем заявки из рейтингов
-                rating_file = d.get("rating_file")
-                if rating_file:
-                    rating_path = os.path.join(RATINGS_HTML_DIR, rating_file)
-                    if os.path.exists(rating_path):
-                        r_html = await read_file(rating_path)
-                        header, rows = parse_rating_table(r_html)
-                        for r in rows:
-                            await insert_application(
-                                pool,
-                                certificate_no=r["certificate"],
-                                main_score=r["main_score"],
-                                extra_score=r["extra_score"],
-                                total_score=r["total_score"],
-                                category=r["category"],
-                                date_text=r["date"],
-                                admitted=r["admitted"],
-                                specialty_id=spec_id,
-                                faculty_id=faculty_id,
-                                university_id=university_id,
-                                raw_html=r["raw_html"]
-                            )
-
-    # 4) Пересобрать JSON-списки *_ids по связям
-    await refresh_json_lists(pool)
+            else:
+                for r in fresh:
+                    await insert_application(
+                        cur,
+                        certificate_no=r["certificate"],
+                        main_score=r["main_score"],
+                        extra_score=r["extra_score"],
+                        total_score=r["total_score"],
+                        category=r["category"],
+                        date_text=r["date"],
+                        admitted=r["admitted"],
+                        specialty_id=spec_id,
+                        faculty_id=faculty_id,
+                        university_id=university_id,
+                        raw_html=r["raw_html"]
+                    )
+            if json_out is not None and rating_json_name(rating_file):
+                exports.append((os.path.join(RATING_JSON_DIR, rating_json_name(rating_file)), json_out.data))
+    if batch is not None:
+        await load_infile(cur, batch)
+    # пустой разбор отчёта (например, сменилась разметка) ничего не удаляет
+    if faculties:
+        await prune_university(cur, university_id, faculties_seen, specialties_seen, touched)
+    return loaded
+
+async def ingest_university(pool, sem: asyncio.Semaphore, uni: dict, export_json: bool,
+                            full_reimport: bool = False, touched: dict | None = None) -> int:
+    """Университет целиком (и его заявки): одно соединение, одна транзакция — всё или ничего"""
+    async with sem:
+        for attempt in range(1, INGEST_RETRIES + 1):
+            async with pool.acquire() as conn:
+                t0 = time.perf_counter()
+                await conn.begin()
+                uni_touched = new_touched()
+                exports = []
+                try:
+                    async with conn.cursor() as cur:
+                        loaded = await load_university(cur, uni, export_json, full_reimport, uni_touched, exports)
+                    await conn.commit()
+                    # rating_*.json — только закоммиченные строки; запись вне цикла событий и без блокировок
+                    if exports:
+                        await asyncio.to_thread(write_ratings_sync, exports)
+                    if touched is not None:
+                        merge_touched(touched, uni_touched)
+                    metrics.observe("university_transaction", time.perf_counter() - t0)
+                    return loaded
+                except aiomysql.OperationalError as e:
+                    await conn.rollback()
+                    # дедлок / таймаут блокировки между параллельными транзакциями -> повторить
+                    if e.args and e.args[0] in RETRYABLE_MYSQL_ERRORS and attempt < INGEST_RETRIES:
+                        metrics.count("transaction_retries")
+                        continue
+                    raise
+                except BaseException:
+                    await conn.rollback()
+                    raise
+
+async def run_pipeline(export_json: bool = EXPORT_RATING_JSON, concurrency: int = INGEST_CONCURRENCY):
+    with RunMetrics("pl_sql", PROFILE, PROFILE_DIR) as run:
+        failed = await run_phases(run, export_json, concurrency)
+        os.makedirs(os.path.dirname(RUN_REPORT_PATH), exist_ok=True)
+        run.write(RUN_REPORT_PATH, RUN_HISTORY_PATH)
+    # частичный импорт — ненулевой код выхода для cron / CI
+    if failed:
+        sys.exit(f"❌ Не загружено университетов: {failed} (см. ❌ выше и {RUN_REPORT_PATH})")
+
+async def run_phases(run: RunMetrics, export_json: bool, concurrency: int) -> int:
+    """Возвращает число университетов, чьи транзакции откатены"""
+    pool = await get_pool()
+    with run.stage("schema"):
+        await ensure_natural_keys(pool)
+        # индексы, не восстановленные упавшим полным реимпортом
+        restored = await restore_secondary_indexes(pool)
+        if restored:
+            print(f"✅ Восстановлено индексов после прошлого прогона: {restored}")
+        full_reimport = APPLICATIONS_LOADER == "infile" and await applications_empty(pool)
+    if export_json:
+        check_format(RATINGS_FORMAT)
+        os.makedirs(RATING_JSON_DIR, exist_ok=True)
+
+    # 1) index.html -> список университетов (с базовыми полями)
+    with run.stage("index"):
+        index_html = await read_file(INDEX_HTML)
+        unis = parse_university_cards(index_html)
+        metrics.count("universities", len(unis))
+
+    # 2-3) университеты параллельно, не больше concurrency транзакций одновременно;
+    # полный реимпорт в пустые таблицы — без неуникальных вторичных индексов
+    if full_reimport:
+        with run.stage("drop_indexes"):
+            await drop_secondary_indexes(pool)
+    try:
+        with run.stage("ingest"):
+            sem = asyncio.Semaphore(concurrency)
+            touched = new_touched()
+            results = await asyncio.gather(
+                *(ingest_university(pool, sem, uni, export_json, full_reimport, touched) for uni in unis),
+                return_exceptions=True
+            )
+            failed = [(uni["name"], res) for uni, res in zip(unis, results) if isinstance(res, BaseException)]
+            metrics.count("universities_loaded", len(unis) - len(failed))
+            metrics.count("universities_failed", len(failed))
+    finally:
+        if full_reimport:
+            with run.stage("restore_indexes"):
+                await restore_secondary_indexes(pool)
+    for name, err in failed:
+        print(f"❌ {name}: {err!r} (транзакция откатена)")
+
+    # 4) JSON-списки *_ids: только у родителей, чьи связи изменились
+    with run.stage("json_lists"):
+        if JSON_LISTS_MODE == "incremental":
+            for p, ids in touched.items():
+                metrics.count(f"{p}_refreshed", len(ids))
+            await refresh_json_lists(pool, touched)
+            print("✅ *_ids обновлены: " + ", ".join(f"{p} {len(ids)}" for p, ids in touched.items()))
+        elif JSON_LISTS_MODE == "full":
+            await refresh_json_lists(pool)
 
     pool.close()
     await pool.wait_closed()
-    print("✅ Импорт в MySQL завершён.")
+    loaded = sum(r for r in results if not isinstance(r, BaseException))
+    mark = "❌" if failed else "✅"
+    print(f"{mark} Импорт в MySQL завершён: {len(unis) - len(failed)}/{len(unis)} университетов, "
+          f"{loaded} заявок, с ошибкой: {len(failed)}.")
+    return len(failed)
 
 # ======== Точка входа ========
 if __name__ == "__main__":
@@ -0,0 +1,340 @@
+# -*- coding: utf-8 -*-
+"""
+SQLite-вариант pl_sql: те же таблицы (universities, faculties, specialties, applications
+и таблицы связей), но без сервера MySQL — один файл базы, только stdlib.
+
+    python pl_sqlite.py [results/admissions.sqlite3]
+
+Разбор страниц — те же функции pl_sql / rating_core. Загрузка — полная перезагрузка
+одной транзакцией в режиме WAL: схема создаётся при необходимости (create_schema),
+вторичные индексы снимаются на время вставки и строятся заново в конце, id назначаются
+на клиенте, JSON-списки *_ids собираются по таблицам связей одним UPDATE на таблицу.
+Повторы ключей (факультет в университете, специальность, сертификат в специальности)
+схлопываются так же, как natural_key в pl_sql.
+"""
+import os
+import sys
+import json
+import time
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from rating_core import RatingRow, iter_rating_items
+from pl_sql import (
+    INDEX_HTML, REPORTS_DIR, RATINGS_HTML_DIR, SPECIALTY_COLUMNS, APPLICATION_COLUMNS,
+    application_params, is_part_time, natural_key, parse_faculties_from_report, parse_university_cards
+)
+
+# --------- Конфиг ---------
+SQLITE_PATH = os.path.join("results", "admissions.sqlite3")
+PARSE_WORKERS = os.cpu_count() or 1    # рейтинги разбираются пулом процессов, пишет один процесс
+PARSE_CHUNK_SIZE = 32
+
+# --------- Схема ---------
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS universities (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE,
+        site TEXT, address TEXT, rector_name TEXT, raw_data TEXT,
+        faculty_ids TEXT NOT NULL DEFAULT '[]'
+    )""",
+    """CREATE TABLE IF NOT EXISTS faculties (
+        id INTEGER PRIMARY KEY,
+        name TEXT, raw_data TEXT,
+        specialty_ids TEXT NOT NULL DEFAULT '[]',
+        natural_key BLOB UNIQUE
+    )""",
+    """CREATE TABLE IF NOT EXISTS specialties (
+        id INTEGER PRIMARY KEY,
+        code TEXT, specialty_name TEXT, major_name TEXT, faculty_name TEXT, university_name TEXT,
+        has_contract INTEGER, has_budget INTEGER, has_voucher INTEGER, contract_amount_year INTEGER,
+        is_part_time INTEGER, main_pass_score INTEGER, extra_pass_scores TEXT,
+        required_extra_subjects INTEGER, raw_data TEXT,
+        application_ids TEXT NOT NULL DEFAULT '[]',
+        natural_key BLOB UNIQUE
+    )""",
+    """CREATE TABLE IF NOT EXISTS applications (
+        id INTEGER PRIMARY KEY,
+        certificate_no TEXT, main_score INTEGER, extra_score INTEGER, total_score INTEGER,
+        category TEXT, date_text TEXT, admitted INTEGER,
+        specialty_ids TEXT, faculty_ids TEXT, university_ids TEXT, raw_data TEXT,
+        natural_key BLOB UNIQUE
+    )""",
+    """CREATE TABLE IF NOT EXISTS university_faculties (
+        university_id INTEGER NOT NULL REFERENCES universities(id),
+        faculty_id INTEGER NOT NULL REFERENCES faculties(id),
+        PRIMARY KEY (university_id, faculty_id)
+    ) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS faculty_specialties (
+        faculty_id INTEGER NOT NULL REFERENCES faculties(id),
+        specialty_id INTEGER NOT NULL REFERENCES specialties(id),
+        PRIMARY KEY (faculty_id, specialty_id)
+    ) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS specialty_applications (
+        specialty_id INTEGER NOT NULL REFERENCES specialties(id),
+        application_id INTEGER NOT NULL REFERENCES applications(id),
+        PRIMARY KEY (specialty_id, application_id)
+    ) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS application_specialties (
+        application_id INTEGER NOT NULL REFERENCES applications(id),
+        specialty_id INTEGER NOT NULL REFERENCES specialties(id),
+        PRIMARY KEY (application_id, specialty_id)
+    ) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS application_faculties (
+        application_id INTEGER NOT NULL REFERENCES applications(id),
+        faculty_id INTEGER NOT NULL REFERENCES faculties(id),
+        PRIMARY KEY (application_id, faculty_id)
+    ) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS application_universities (
+        application_id INTEGER NOT NULL REFERENCES applications(id),
+        university_id INTEGER NOT NULL REFERENCES universities(id),
+        PRIMARY KEY (application_id, university_id)
+    ) WITHOUT ROWID""",
+]
+
+# Вторичные индексы: баллы (выборки/сортировки по порогам) и обратная сторона внешних ключей.
+# Снимаются на время загрузки и строятся одним проходом после неё
+INDEXES = {
+    "idx_applications_total": "applications(total_score)",
+    "idx_applications_main": "applications(main_score)",
+    "idx_applications_extra": "applications(extra_score)",
+    "idx_applications_certificate": "applications(certificate_no)",
+    "idx_applications_category_total": "applications(category, total_score)",
+    "idx_university_faculties_faculty": "university_faculties(faculty_id)",
+    "idx_faculty_specialties_specialty": "faculty_specialties(specialty_id)",
+    "idx_specialty_applications_application": "specialty_applications(application_id)",
+    "idx_application_specialties_specialty": "application_specialties(specialty_id)",
+    "idx_application_faculties_faculty": "application_faculties(faculty_id)",
+    "idx_application_universities_university": "application_universities(university_id)",
+}
+
+# порядок очистки: сначала таблицы связей, потом родители
+TABLES = ["university_faculties", "faculty_specialties", "specialty_applications",
+          "application_specialties", "application_faculties", "application_universities",
+          "applications", "specialties", "faculties", "universities"]
+
+# колонки вставки (JSON-списки *_ids заполняет refresh_json_lists)
+COLUMNS = {
+    "universities": "id, name, site, address, rector_name, raw_data",
+    "faculties": "id, name, raw_data, natural_key",
+    "specialties": f"id, {SPECIALTY_COLUMNS}, natural_key",
+    "applications": f"id, {APPLICATION_COLUMNS}",
+    "university_faculties": "university_id, faculty_id",
+    "faculty_specialties": "faculty_id, specialty_id",
+    "specialty_applications": "specialty_id, application_id",
+    "application_specialties": "application_id, specialty_id",
+    "application_faculties": "application_id, faculty_id",
+    "application_universities": "application_id, university_id",
+}
+
+# родитель -> (таблица связей, колонка родителя, колонка ребёнка, JSON-колонка), как pl_sql.JSON_LISTS
+JSON_LISTS = {
+    "universities": ("university_faculties", "university_id", "faculty_id", "faculty_ids"),
+    "faculties": ("faculty_specialties", "faculty_id", "specialty_id", "specialty_ids"),
+    "specialties": ("specialty_applications", "specialty_id", "application_id", "application_ids"),
+}
+
+def connect(path: str = SQLITE_PATH) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, isolation_level=None)   # транзакции — явным BEGIN
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+def create_schema(conn: sqlite3.Connection) -> None:
+    for ddl in SCHEMA:
+        conn.execute(ddl)
+    create_indexes(conn)
+
+def drop_indexes(conn: sqlite3.Connection) -> None:
+    for name in INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+
+def create_indexes(conn: sqlite3.Connection) -> None:
+    for name, target in INDEXES.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+
+def refresh_json_lists(conn: sqlite3.Connection) -> None:
+    for parent, (link, parent_col, child_col, json_col) in JSON_LISTS.items():
+        conn.execute(f"""
+            UPDATE {parent} SET {json_col} = (
+              SELECT json_group_array({child_col}) FROM (
+                SELECT {child_col} FROM {link} WHERE {parent_col} = {parent}.id ORDER BY {child_col}
+              )
+            )
+        """)
+
+# --------- Разбор рейтингов (пул процессов) ---------
+def parse_rating_rows(path: str) -> list[dict]:
+    return [application_params(item) for item in iter_rating_items(path, with_raw=True)
+            if isinstance(item, RatingRow)]
+
+def parse_rating_chunk(paths: list[str]) -> list[list[dict]]:
+    return [parse_rating_rows(p) for p in paths]
+
+def parse_ratings(paths: list[str], workers: int = PARSE_WORKERS, chunk_size: int = PARSE_CHUNK_SIZE) -> dict:
+    if workers <= 1:
+        return dict(zip(paths, parse_rating_chunk(paths)))
+    chunks = [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        parts = list(pool.map(parse_rating_chunk, chunks))
+    return dict(zip(paths, (rows for part in parts for rows in part)))
+
+# --------- Университеты и направления ---------
+def read_text(path: str) -> str:
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+def collect_universities() -> list[dict]:
+    """index.html + reports*.html -> университеты с faculties (как в pl_sql.load_university)"""
+    unis = parse_university_cards(read_text(INDEX_HTML))
+    for uni in unis:
+        report_path = os.path.join(REPORTS_DIR, uni["report_file"]) if uni["report_file"] else None
+        uni["faculties"] = (parse_faculties_from_report(read_text(report_path))
+                            if report_path and os.path.exists(report_path) else [])
+    return unis
+
+def rating_paths(unis: list[dict]) -> list[str]:
+    paths = {os.path.join(RATINGS_HTML_DIR, d["rating_file"])
+             for uni in unis for fac in uni["faculties"] for d in fac["directions"] if d["rating_file"]}
+    return sorted(p for p in paths if os.path.exists(p))
+
+# --------- Загрузка ---------
+class Loader:
+    """Строки всех таблиц с id, назначенными на клиенте; вставка — executemany по таблицам"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.ids = {"universities": 0, "faculties": 0, "specialties": 0, "applications": 0}
+        self.universities = {}         # name -> id
+        self.faculties = {}            # natural_key -> id
+        self.specialties = {}          # natural_key -> id
+        self.rows = {table: [] for table in TABLES}
+
+    def next_id(self, table: str) -> int:
+        self.ids[table] += 1
+        return self.ids[table]
+
+    def add_university(self, uni: dict) -> int:
+        values = (uni["site"], uni["address"], uni["rector"], uni["raw_html"])
+        uid = self.universities.get(uni["name"])
+        if uid is not None:
+            # повтор названия: как ON DUPLICATE KEY UPDATE в pl_sql
+            self.flush()
+            self.conn.execute("UPDATE universities SET site=?, address=?, rector_name=?, raw_data=? WHERE id=?",
+                              values + (uid,))
+            return uid
+        uid = self.universities[uni["name"]] = self.next_id("universities")
+        self.rows["universities"].append((uid, uni["name"]) + values)
+        return uid
+
+    def add_faculty(self, university_id: int, fac: dict) -> int:
+        key = natural_key(university_id, fac["faculty_name"])
+        fid = self.faculties.get(key)
+        if fid is None:
+            fid = self.faculties[key] = self.next_id("faculties")
+            self.rows["faculties"].append((fid, fac["faculty_name"], fac["raw_html"], key))
+        self.rows["university_faculties"].append((university_id, fid))
+        return fid
+
+    def add_specialty(self, faculty_id: int, d: dict, faculty_name: str, uni_name: str) -> int | None:
+        """id новой специальности; None — такая уже загружена (ключ как в pl_sql.upsert_specialty)"""
+        key = natural_key(faculty_id, d["code"], d["payment_form"], d["rating_file"])
+        if key in self.specialties:
+            self.rows["faculty_specialties"].append((faculty_id, self.specialties[key]))
+            return None
+        sid = self.specialties[key] = self.next_id("specialties")
+        # порядок значений — как params в pl_sql.upsert_specialty
+        self.rows["specialties"].append((
+            sid, d["code"], d["specialty"], d["major"], faculty_name, uni_name,
+            1 if d["payment_form"] == "Контракт" else 0,
+            1 if d["payment_form"] == "Бюджет" else 0,
+            1 if d["payment_form"] == "Ваучер" else 0,
+            d["payment_amount"], is_part_time(d["education_type"]), d["main_pass"],
+            json.dumps(d["extra_subjects"], ensure_ascii=False) if d["extra_subjects"] else None,
+            d["extra_count"], d["raw_html"], key
+        ))
+        self.rows["faculty_specialties"].append((faculty_id, sid))
+        return sid
+
+    def add_applications(self, rows: list[dict], *, specialty_id: int, faculty_id: int, university_id: int) -> int:
+        spec_json, fac_json, uni_json = (json.dumps([specialty_id]), json.dumps([faculty_id]),
+                                         json.dumps([university_id]))
+        seen = set()
+        for r in rows:
+            if r["certificate"] in seen:
+                continue   # (специальность, сертификат) — ключ, как в pl_sql.sync_applications
+            seen.add(r["certificate"])
+            aid = self.next_id("applications")
+            self.rows["applications"].append((
+                aid, r["certificate"], r["main_score"], r["extra_score"], r["total_score"],
+                r["category"], r["date"], r["admitted"], spec_json, fac_json, uni_json, r["raw_html"],
+                natural_key(specialty_id, r["certificate"])
+            ))
+            self.rows["specialty_applications"].append((specialty_id, aid))
+            self.rows["application_specialties"].append((aid, specialty_id))
+            self.rows["application_faculties"].append((aid, faculty_id))
+            self.rows["application_universities"].append((aid, university_id))
+        return len(seen)
+
+    def flush(self) -> None:
+        # родители раньше детей: внешние ключи проверяются сразу
+        for table in reversed(TABLES):
+            rows = self.rows[table]
+            if rows:
+                marks = ",".join("?" * len(rows[0]))
+                self.conn.executemany(f"INSERT OR IGNORE INTO {table} ({COLUMNS[table]}) VALUES ({marks})", rows)
+                rows.clear()
+
+def load_all(conn: sqlite3.Connection, unis: list[dict], ratings: dict) -> dict:
+    loader = Loader(conn)
+    loaded = 0
+    for uni in unis:
+        university_id = loader.add_university(uni)
+        for fac in uni["faculties"]:
+            faculty_id = loader.add_faculty(university_id, fac)
+            for d in fac["directions"]:
+                spec_id = loader.add_specialty(faculty_id, d, fac["faculty_name"], uni["name"])
+                if spec_id is None or not d["rating_file"]:
+                    continue
+                rows = ratings.get(os.path.join(RATINGS_HTML_DIR, d["rating_file"]))
+                if rows:
+                    loaded += loader.add_applications(rows, specialty_id=spec_id, faculty_id=faculty_id,
+                                                      university_id=university_id)
+        loader.flush()
+    return {**loader.ids, "loaded_applications": loaded}
+
+def run_pipeline(path: str = SQLITE_PATH, workers: int = PARSE_WORKERS) -> dict:
+    t0 = time.perf_counter()
+    unis = collect_universities()
+    ratings = parse_ratings(rating_paths(unis), workers)
+    t_parse = time.perf_counter() - t0
+
+    conn = connect(path)
+    try:
+        create_schema(conn)
+        conn.execute("BEGIN")
+        try:
+            drop_indexes(conn)
+            for table in TABLES:
+                conn.execute(f"DELETE FROM {table}")
+            counts = load_all(conn, unis, ratings)
+            refresh_json_lists(conn)
+            create_indexes(conn)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("PRAGMA optimize")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        conn.close()
+    t_total = time.perf_counter() - t0
+    print(f"✅ SQLite: {path} — университетов {counts['universities']}, факультетов {counts['faculties']}, "
+          f"специальностей {counts['specialties']}, заявок {counts['applications']} "
+          f"(разбор {t_parse:.1f}s, загрузка {t_total - t_parse:.1f}s)")
+    return counts
+
+if __name__ == "__main__":
+    run_pipeline(sys.argv[1] if len(sys.argv) > 1 else SQLITE_PATH)
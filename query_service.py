@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+"""
+Долгоживущий слой запросов поверх выходов pl_json (stats.json, universities/*.json,
+score_index.json): данные читаются один раз в индексированный снимок (Snapshot) в памяти,
+ответы на частые запросы сериализуются заранее.
+
+Горячая перезагрузка: pl_json последним шагом атомарно пишет results/build.json.
+QueryService.watch() опрашивает маркер, при новом build_id собирает новый снимок в потоке
+и подменяет ссылку одним присваиванием — запрос видит либо старый снимок, либо новый
+целиком. Всё время сборки лежит results/building.json (выходы переписываются на месте):
+пока он есть — выходы не читаются; если он появился или build_id сменился за время
+чтения, снимок отбрасывается и читается позже.
+
+Библиотека:
+    svc = QueryService(); svc.load()
+    svc.rankings("total", "universities", limit=10); svc.where(185, form="Бюджет")
+HTTP (asyncio, stdlib, только GET, ответы JSON):
+    python query_service.py [--port 8080]
+    /stats  /rankings?kind=total&level=universities|faculties|directions&university=&limit=&offset=
+    /universities  /university?name=  /directions?university=&code=&form=&limit=
+    /where?score=185&form=Бюджет&category=Бишкек&kind=total&main=120&limit=
+    /health
+"""
+import os
+import glob
+import asyncio
+import argparse
+from urllib.parse import urlsplit, parse_qs, unquote
+from output_format import dumps_json, loads_json
+from score_index import ALL_CATEGORIES, ScoreIndex
+
+RESULTS_DIR = "results"
+UNIVERSITIES_DIR = "universities"
+BUILD_MARKER = os.path.join(RESULTS_DIR, "build.json")
+BUILDING_MARKER = os.path.join(RESULTS_DIR, "building.json")   # идёт сборка pl_json
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8080
+RELOAD_INTERVAL = 2.0                  # секунд между проверками маркера
+DEFAULT_LIMIT = 50
+LEVELS = {"universities": "universities_by_avg_score", "faculties": "faculties_by_avg_score",
+          "directions": "directions_by_avg_score"}
+FORM_FLAGS = {"Бюджет": "has_budget", "Контракт": "has_contract", "Ваучер": "has_voucher"}
+
+def read_json(path: str):
+    with open(path, "rb") as f:
+        return loads_json(f.read())
+
+def read_build_id(results_dir: str = RESULTS_DIR):
+    path = os.path.join(results_dir, os.path.basename(BUILD_MARKER))
+    try:
+        return read_json(path).get("build_id")
+    except (OSError, ValueError):
+        return None
+
+def is_building(results_dir: str = RESULTS_DIR) -> bool:
+    return os.path.exists(os.path.join(results_dir, os.path.basename(BUILDING_MARKER)))
+
+class QueryError(Exception):
+    """Неверный запрос (-> HTTP 400/404)"""
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+# --------- Снимок ---------
+class Snapshot:
+    """Неизменяемые после сборки данные одной сборки pipeline"""
+    __slots__ = ("build_id", "stats", "stats_bytes", "universities", "university_bytes",
+                 "directions", "by_code", "by_university", "score_index")
+
+    def __init__(self, build_id, stats: dict, universities: dict, score_index: ScoreIndex | None):
+        self.build_id = build_id
+        self.stats = stats
+        self.stats_bytes = dumps_json(stats, pretty=False)
+        self.universities = universities                                  # name -> university_*.json
+        self.university_bytes = {name: dumps_json(u, pretty=False) for name, u in universities.items()}
+        self.score_index = score_index
+        # плоский список направлений + индексы по коду и университету
+        self.directions = []
+        self.by_code = {}
+        self.by_university = {}
+        for name, uni in universities.items():
+            for fac in uni.get("faculties", []):
+                for d in fac.get("directions", []):
+                    i = len(self.directions)
+                    self.directions.append({"university": name, "faculty": fac.get("faculty_name"), **d})
+                    self.by_code.setdefault(d.get("code"), []).append(i)
+                    self.by_university.setdefault(name, []).append(i)
+
+    @classmethod
+    def from_files(cls, results_dir: str = RESULTS_DIR, universities_dir: str = UNIVERSITIES_DIR) -> "Snapshot":
+        build_id = read_build_id(results_dir)
+        stats = read_json(os.path.join(results_dir, "stats.json"))
+        universities = {}
+        for path in sorted(glob.glob(os.path.join(universities_dir, "university_*.json"))):
+            uni = read_json(path)
+            universities[uni.get("name")] = uni
+        index_path = os.path.join(results_dir, "score_index.json")
+        index = ScoreIndex.load(index_path) if os.path.exists(index_path) else None
+        return cls(build_id, stats, universities, index)
+
+# --------- Сервис ---------
+class QueryService:
+    def __init__(self, results_dir: str = RESULTS_DIR, universities_dir: str = UNIVERSITIES_DIR):
+        self.results_dir = results_dir
+        self.universities_dir = universities_dir
+        self.snapshot: Snapshot | None = None
+        self.reloads = 0
+
+    def load(self) -> bool:
+        """Читает выходы в новый снимок и подменяет текущий; False — идёт сборка, снимок не тронут"""
+        if is_building(self.results_dir):
+            return False
+        before = read_build_id(self.results_dir)
+        snap = Snapshot.from_files(self.results_dir, self.universities_dir)
+        if is_building(self.results_dir) or read_build_id(self.results_dir) != before:
+            return False
+        self.snapshot = snap           # атомарная подмена: одно присваивание ссылки
+        self.reloads += 1
+        return True
+
+    def current(self) -> Snapshot:
+        if self.snapshot is None:
+            raise QueryError("Данные ещё не загружены", 503)
+        return self.snapshot
+
+    async def watch(self, interval: float = RELOAD_INTERVAL) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            build_id = read_build_id(self.results_dir)
+            if build_id is not None and (self.snapshot is None or build_id != self.snapshot.build_id):
+                try:
+                    if await asyncio.to_thread(self.load):
+                        print(f"✅ Данные перезагружены: build_id={build_id}")
+                except Exception as e:
+                    # недописанный / другой схемы stats.json и т.п.: наблюдатель должен жить дальше
+                    print(f"❌ Перезагрузка не удалась, остаются прежние данные: {e!r}")
+
+    # --------- Запросы ---------
+    def stats(self) -> dict:
+        return self.current().stats
+
+    def rankings(self, kind: str = "total", level: str = "universities", *, university: str | None = None,
+                 limit: int = DEFAULT_LIMIT, offset: int = 0) -> list[dict]:
+        snap = self.current()
+        if kind not in snap.stats["rankings"] or level not in LEVELS:
+            raise QueryError(f"Нет рейтинга: kind={kind}, level={level}")
+        items = snap.stats["rankings"][kind][LEVELS[level]]
+        if university is not None:
+            items = [x for x in items if x["university"] == university]
+        return items[offset:offset + limit]
+
+    def university_names(self) -> list[str]:
+        return list(self.current().universities)
+
+    def university(self, name: str) -> dict:
+        uni = self.current().universities.get(name)
+        if uni is None:
+            raise QueryError(f"Университет не найден: {name}", 404)
+        return uni
+
+    def directions(self, *, university: str | None = None, code: str | None = None, form: str | None = None,
+                   limit: int = DEFAULT_LIMIT) -> list[dict]:
+        snap = self.current()
+        if code is not None:
+            ids = snap.by_code.get(code, [])
+        elif university is not None:
+            ids = snap.by_university.get(university, [])
+        else:
+            ids = range(len(snap.directions))
+        out = []
+        for i in ids:
+            d = snap.directions[i]
+            if university is not None and d["university"] != university:
+                continue
+            if form is not None and not d.get(FORM_FLAGS.get(form, ""), False):
+                continue
+            out.append(d)
+            if len(out) >= limit:
+                break
+        return out
+
+    def where(self, score: int, *, form: str, category: str = ALL_CATEGORIES, kind: str = "total",
+              main_score: int | None = None, limit: int = DEFAULT_LIMIT) -> list[dict]:
+        index = self.current().score_index
+        if index is None:
+            raise QueryError("Нет score_index.json (pl_json.BUILD_SCORE_INDEX)", 503)
+        return index.lookup(score, form=form, category=category, kind=kind, main_score=main_score, limit=limit)
+
+    # --------- HTTP-маршруты ---------
+    def handle(self, target: str) -> tuple[int, bytes]:
+        """GET-запрос -> (статус, тело JSON)"""
+        url = urlsplit(target)
+        q = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        path = unquote(url.path).rstrip("/") or "/"
+
+        def num(name: str, default=None):
+            if name not in q:
+                return default
+            try:
+                value = int(q[name])
+            except ValueError:
+                raise QueryError(f"{name} должно быть целым")
+            if value < 0:
+                # отрицательные limit / offset иначе работают как срезы Python с конца
+                raise QueryError(f"{name} должно быть >= 0")
+            return value
+
+        try:
+            if path == "/health":
+                snap = self.snapshot
+                return 200, dumps_json({"loaded": snap is not None, "build_id": snap and snap.build_id,
+                                        "reloads": self.reloads}, pretty=False)
+            if path == "/stats":
+                return 200, self.current().stats_bytes
+            if path == "/university":
+                self.university(q.get("name", ""))
+                return 200, self.current().university_bytes[q["name"]]
+            if path == "/universities":
+                result = self.university_names()
+            elif path == "/rankings":
+                result = self.rankings(q.get("kind", "total"), q.get("level", "universities"),
+                                       university=q.get("university"), limit=num("limit", DEFAULT_LIMIT),
+                                       offset=num("offset", 0))
+            elif path == "/directions":
+                result = self.directions(university=q.get("university"), code=q.get("code"), form=q.get("form"),
+                                         limit=num("limit", DEFAULT_LIMIT))
+            elif path == "/where":
+                if "score" not in q or "form" not in q:
+                    raise QueryError("Нужны score и form")
+                result = self.where(num("score"), form=q["form"], category=q.get("category", ALL_CATEGORIES),
+                                    kind=q.get("kind", "total"), main_score=num("main"),
+                                    limit=num("limit", DEFAULT_LIMIT))
+            else:
+                raise QueryError(f"Нет маршрута: {path}", 404)
+        except QueryError as e:
+            return e.status, dumps_json({"error": str(e)}, pretty=False)
+        return 200, dumps_json(result, pretty=False)
+
+# --------- HTTP-сервер (asyncio streams) ---------
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           503: "Service Unavailable"}
+
+async def handle_connection(service: QueryService, reader: asyncio.StreamReader,
+                            writer: asyncio.StreamWriter) -> None:
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            parts = request_line.decode("latin-1").split()
+            if len(parts) < 2:
+                break
+            method, target = parts[0], parts[1]
+            if method == "GET":
+                status, body = service.handle(target)
+            else:
+                status, body = 405, dumps_json({"error": "Только GET"}, pretty=False)
+            keep_alive = headers.get("connection", "").lower() != "close"
+            writer.write(
+                f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + body
+            )
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+async def serve(service: QueryService, host: str = SERVICE_HOST, port: int = SERVICE_PORT,
+                interval: float = RELOAD_INTERVAL) -> None:
+    try:
+        loaded = service.load()
+    except (OSError, ValueError) as e:
+        raise SystemExit(f"❌ Не прочитать выходы pl_json ({e!r}) — сначала python pl_json.py")
+    server = await asyncio.start_server(lambda r, w: handle_connection(service, r, w), host, port)
+    if loaded:
+        print(f"✅ Сервис запросов: http://{host}:{port} (build_id={service.snapshot.build_id})")
+    else:
+        # watch() загрузит данные после сборки; до тех пор запросы -> 503
+        print(f"⏳ Сервис запросов: http://{host}:{port} — идёт сборка pl_json, данные загрузятся после неё")
+    watcher = asyncio.create_task(service.watch(interval))
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        watcher.cancel()
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default=SERVICE_HOST)
+    ap.add_argument("--port", type=int, default=SERVICE_PORT)
+    ap.add_argument("--interval", type=float, default=RELOAD_INTERVAL)
+    args = ap.parse_args()
+    asyncio.run(serve(QueryService(), args.host, args.port, args.interval))
@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+"""
+Общее ядро разбора страниц рейтинга (personalcabinet_report_*.html) для pl_json и pl_sql.
+
+Страница превращается в поток типизированных элементов:
+    RatingMeta(field, value)   university / director / program
+    RatingTable(header)        начало таблицы (header None -> контракт)
+    RatingRow(...)             запись абитуриента
+Потребители (sinks) читают один и тот же поток: RatingJsonBuilder собирает
+results/rating_*.json, pl_sql пишет строки в MySQL. pl_sql.run_pipeline(export_json=True)
+кормит оба из одного прохода по файлу.
+"""
+import os
+import re
+import sys
+from dataclasses import dataclass
+from bs4 import NavigableString
+from html_backend import make_soup
+from rating_stream import iter_rating_events
+
+RATING_PARSER = "stream"               # "stream" (SAX, без DOM) | "soup" (BeautifulSoup)
+
+# --------- Утилиты ---------
+def norm_space(s: str | None) -> str | None:
+    # split() без аргумента режет по тем же пробельным символам, что и \s в re
+    if s is None:
+        return None
+    return " ".join(s.split())
+
+def clean_text(tag) -> str | None:
+    if tag is None:
+        return None
+    if hasattr(tag, "get_text"):
+        # почти все ячейки — один текстовый узел: без обхода потомков get_text;
+        # Comment и прочие подклассы get_text пропускает — им общий путь
+        s = tag.string
+        if type(s) is NavigableString:
+            return " ".join(s.split())
+        # пробелы между узлами и по краям схлопнет split(), strip=True не нужен
+        return " ".join(tag.get_text(" ").split())
+    return " ".join(str(tag).split())
+
+def parse_int_safe(x: str | None) -> int | None:
+    if not x:
+        return None
+    digits = re.sub(r"[^\d]", "", str(x))
+    if not digits:
+        return None
+    try:
+        return int(digits)
+    except ValueError:
+        return None
+
+def score_int(x: str | None) -> int | None:
+    # баллы почти всегда — чистые ASCII-цифры; остальное как в parse_int_safe
+    return int(x) if x and x.isascii() and x.isdigit() else parse_int_safe(x)
+
+def intern(x: str | None) -> str | None:
+    """Повторяющиеся значения (категории, баллы, даты, номера) — один объект на процесс"""
+    return sys.intern(x) if x is not None else None
+
+# --------- Сертификат ---------
+def parse_certificate(text: str | None):
+    admitted = False
+    note = None
+    if not text:
+        return None, admitted, note
+    if "(Реком" in text:
+        admitted = True
+        text = text.replace("(Реком)", "").strip()
+    m = re.search(r"\[(.*)\]", text)
+    if m:
+        note = m.group(1).strip()
+        text = re.sub(r"\[.*\]", "", text).strip()
+    return text, admitted, note
+
+# --------- Элементы потока ---------
+@dataclass
+class RatingMeta:
+    field: str                         # university | director | program
+    value: str | None
+
+@dataclass
+class RatingTable:
+    header: str | None                 # текст div.cityColir; None -> контрактная таблица
+
+@dataclass(slots=True)
+class RatingRow:
+    """
+    Запись абитуриента. Строковые поля — как в HTML (и в rating_*.json), повторяющиеся
+    значения интернированы; баллы заодно разобраны в int один раз при извлечении.
+    """
+    num: str | None
+    certificate: str | None
+    note: str | None
+    main_score: str | None             # баллы как в HTML
+    extra_score: str | None
+    total_score: str | None
+    category: str | None
+    date: str | None
+    admitted: bool
+    main: int | None                   # score_int(main_score) и т.д.
+    extra: int | None
+    total: int | None
+    raw_html: str | None = None        # разметка <tr>, только при with_raw=True
+
+    @classmethod
+    def from_json(cls, rec: dict) -> "RatingRow":
+        """Запись из прочитанного rating_*.json"""
+        main, extra, total = rec.get("main_score"), rec.get("extra_score"), rec.get("total_score")
+        return cls(
+            num=intern(rec.get("num")),
+            certificate=rec.get("certificate"),
+            note=rec.get("note"),
+            main_score=intern(main),
+            extra_score=intern(extra),
+            total_score=intern(total),
+            category=intern(rec.get("category")),
+            date=intern(rec.get("date")),
+            admitted=bool(rec.get("admitted")),
+            main=score_int(main),
+            extra=score_int(extra),
+            total=score_int(total)
+        )
+
+    def to_json(self) -> dict:
+        return {
+            "num": self.num,
+            "certificate": self.certificate,
+            "note": self.note,
+            "main_score": self.main_score,
+            "extra_score": self.extra_score,
+            "total_score": self.total_score,
+            "category": self.category,
+            "date": self.date,
+            "admitted": self.admitted
+        }
+
+def make_row(cols: list, header: str | None, raw_html: str | None = None) -> RatingRow | None:
+    """Строка таблицы (очищенные тексты ячеек) -> запись абитуриента"""
+    if len(cols) < 2:
+        return None
+    is_contract = header is None
+
+    cert_text, admitted, note = parse_certificate(cols[1])
+    if is_contract and len(cols) >= 6:
+        category = cols[5]
+    elif header:
+        category = header.split(":")[0].strip()
+    else:
+        category = None
+
+    main = cols[2] if len(cols) > 2 else None
+    extra = cols[3] if len(cols) > 3 else None
+    total = cols[4] if len(cols) > 4 else None
+    return RatingRow(
+        num=intern(cols[0]),
+        certificate=cert_text,
+        note=note,
+        main_score=intern(main),
+        extra_score=intern(extra),
+        total_score=intern(total),
+        category=intern(category),
+        date=intern(cols[6] if is_contract and len(cols) >= 7 else (cols[5] if not is_contract and len(cols) >= 6 else None)),
+        admitted=admitted,
+        main=score_int(main),
+        extra=score_int(extra),
+        total=score_int(total),
+        raw_html=raw_html
+    )
+
+# --------- Источники потока ---------
+def iter_rating_items_html(html: str, with_raw: bool = False):
+    """Поток элементов из уже прочитанного HTML (через дерево BeautifulSoup)"""
+    soup = make_soup(html)
+
+    top_block = soup.select_one("div.text-right")
+    if top_block:
+        spans = top_block.find_all("span")
+        if len(spans) >= 1: yield RatingMeta("university", clean_text(spans[0]))
+        if len(spans) >= 2: yield RatingMeta("director", clean_text(spans[1]))
+
+    program_tag = soup.select_one("p.headerColor b")
+    if program_tag:
+        yield RatingMeta("program", clean_text(program_tag))
+
+    for table in soup.select("table.table"):
+        header = clean_text(table.select_one("div.cityColir"))
+        yield RatingTable(header)
+        for tr in table.select("tbody tr"):
+            row = make_row([clean_text(td) for td in tr.find_all(["td", "th"])], header,
+                           str(tr) if with_raw else None)
+            if row is not None:
+                yield row
+
+def iter_rating_items(path: str, with_raw: bool = False, parser: str | None = None):
+    """Поток элементов страницы рейтинга; по умолчанию потоково, без DOM"""
+    if (parser or RATING_PARSER) != "stream":
+        with open(path, "r", encoding="utf-8") as f:
+            yield from iter_rating_items_html(f.read(), with_raw)
+        return
+
+    header, raw = None, None
+    for kind, value in iter_rating_events(path, with_raw=with_raw):
+        if kind == "row":
+            row = make_row(value, header, raw)
+            if row is not None:
+                yield row
+        elif kind == "raw":
+            raw = value
+        elif kind == "table":
+            header = value
+            yield RatingTable(header)
+        else:
+            yield RatingMeta(kind, value)
+
+# --------- Sink: results/rating_*.json ---------
+def rating_json_name(file_name: str) -> str | None:
+    base = os.path.splitext(os.path.basename(file_name))[0]
+    if "Ranjirk" in base:
+        return f"rating_r_{base}.json"
+    if "Ranjirb" in base:
+        return f"rating_b_{base}.json"
+    return None
+
+class RatingJsonBuilder:
+    """
+    Собирает документ rating_*.json из потока элементов. В tables[].records лежат сами
+    RatingRow: в dict их превращает сериализация (output_format, RatingRow.to_json)
+    """
+
+    def __init__(self, file_name: str):
+        self.data = {
+            "file": file_name,
+            "university": None,
+            "director": None,
+            "program": None,
+            "admitted_count": 0,
+            "not_admitted_count": 0,
+            "tables": []
+        }
+        self._records = []
+
+    def add(self, item) -> None:
+        if isinstance(item, RatingRow):
+            if item.admitted: self.data["admitted_count"] += 1
+            else:             self.data["not_admitted_count"] += 1
+            self._records.append(item)
+        elif isinstance(item, RatingTable):
+            self._records = []
+            self.data["tables"].append({"header": item.header, "records": self._records})
+        else:
+            self.data[item.field] = item.value
+
+def rating_json_from_items(file_name: str, items) -> dict:
+    builder = RatingJsonBuilder(file_name)
+    for item in items:
+        builder.add(item)
+    return builder.data
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""
+Потоковый (SAX) разбор страниц рейтинга personalcabinet_report_*.html без построения DOM.
+
+Файл читается кусками по STREAM_CHUNK_SIZE и скармливается html.parser.HTMLParser;
+события отдаются генератором сразу, как только закрывается соответствующий тег,
+поэтому память на файл не зависит от его размера.
+
+События (kind, value):
+    ("university", str)   первый <span> в div.text-right
+    ("director", str)     второй <span> в div.text-right
+    ("program", str)      первый <b> внутри p.headerColor
+    ("table", str|None)   начало таблицы table.table; value — текст div.cityColir (None -> контракт)
+    ("raw", str)          только при with_raw=True: разметка строки <tr> (как str(tr) в BeautifulSoup),
+                          идёт непосредственно перед своим ("row", ...)
+    ("row", list[str])    очищенные тексты всех <td>/<th> строки из tbody
+
+Тексты ячеек совпадают с clean_text(): строки узлов обрезаются, пустые выкидываются,
+склеиваются через пробел, пробелы схлопываются.
+"""
+from html.parser import HTMLParser
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# как в BeautifulSoup: пустые элементы без закрывающего тега, class — список через пробел
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+MULTI_VALUED_ATTRS = {"class", "rel", "rev", "accept-charset", "headers", "accesskey", "dropzone"}
+
+def _has_class(attrs, name: str) -> bool:
+    for key, value in attrs:
+        if key == "class" and value and name in value.split():
+            return True
+    return False
+
+def _escape_text(s: str) -> str:
+    return s.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+def _start_tag(tag: str, attrs) -> str:
+    out = [tag]
+    for key, value in attrs:
+        value = value or ""
+        if key in MULTI_VALUED_ATTRS:
+            value = " ".join(value.split())
+        value = _escape_text(value)
+        if '"' in value:
+            if "'" in value:
+                value, quote = value.replace('"', "&quot;"), '"'
+            else:
+                quote = "'"
+        else:
+            quote = '"'
+        out.append(f"{key}={quote}{value}{quote}")
+    return "<" + " ".join(out) + ("/>" if tag in VOID_TAGS else ">")
+
+class _RatingParser(HTMLParser):
+    def __init__(self, with_raw: bool = False):
+        super().__init__(convert_charrefs=True)
+        self.events = []
+        self._with_raw = with_raw
+        self._raw = None             # разметка текущей строки (list[str]) | None
+        self._raw_stack = []         # открытые внутри строки теги
+
+        # div.text-right (первый на странице)
+        self._top_done = False
+        self._top_depth = 0          # >0 -> внутри div.text-right
+        self._spans_seen = 0
+        self._span_parts = None
+
+        # p.headerColor b (первый на странице)
+        self._program_done = False
+        self._in_header_p = False
+        self._program_parts = None
+
+        # table.table
+        self._in_table = False
+        self._table_announced = False
+        self._header_parts = None
+        self._header = None
+        self._header_found = False
+        self._in_tbody = False
+        self._row = None             # list[str] | None
+        self._cell_parts = None      # list[str] | None
+
+        self._text = []              # текущий текстовый узел (может прийти несколькими кусками)
+
+    # --- текст ---
+    def handle_data(self, data):
+        self._text.append(data)
+
+    def handle_comment(self, data):
+        # комментарий разрывает текстовый узел, как и в дереве BeautifulSoup
+        self._flush_text()
+        if self._raw is not None:
+            self._raw.append(f"<!--{data}-->")
+
+    def _flush_text(self):
+        if not self._text:
+            return
+        text = "".join(self._text)
+        self._text = []
+        piece = text.strip()
+        if self._raw is not None:
+            # BeautifulSoup схлопывает пробельные узлы до "\n" или " "
+            self._raw.append(_escape_text(text) if piece else ("\n" if "\n" in text else " "))
+        if not piece:
+            return
+        for parts in (self._span_parts, self._program_parts, self._header_parts, self._cell_parts):
+            if parts is not None:
+                parts.append(piece)
+
+    @staticmethod
+    def _join(parts: list[str]) -> str:
+        return " ".join(" ".join(parts).split())
+
+    # --- таблицы ---
+    def _announce_table(self):
+        if not self._table_announced:
+            self._table_announced = True
+            self.events.append(("table", self._header))
+
+    def _close_cell(self):
+        if self._cell_parts is not None:
+            self._row.append(self._join(self._cell_parts))
+            self._cell_parts = None
+
+    def _close_row(self):
+        if self._row is not None:
+            self._close_cell()
+            if self._raw is not None:
+                while self._raw_stack:
+                    self._raw.append(f"</{self._raw_stack.pop()}>")
+                self.events.append(("raw", "".join(self._raw)))
+                self._raw = None
+            self.events.append(("row", self._row))
+            self._row = None
+
+    def _close_table(self):
+        self._close_row()
+        self._in_tbody = False
+        self._announce_table()
+        self._in_table = False
+
+    # --- теги ---
+    def handle_starttag(self, tag, attrs):
+        self._flush_text()
+        if self._raw is not None and tag not in ("tr", "tbody", "table"):
+            self._raw.append(_start_tag(tag, attrs))
+            if tag not in VOID_TAGS:
+                self._raw_stack.append(tag)
+
+        if tag == "div":
+            if self._top_depth:
+                self._top_depth += 1
+            elif not self._top_done and _has_class(attrs, "text-right"):
+                self._top_depth = 1
+            elif self._in_table and not self._header_found and _has_class(attrs, "cityColir"):
+                self._header_found = True
+                self._header_parts = []
+        elif tag == "span" and self._top_depth and self._spans_seen < 2:
+            self._span_parts = []
+        elif tag == "p" and not self._program_done and _has_class(attrs, "headerColor"):
+            self._in_header_p = True
+        elif tag == "b" and self._in_header_p and self._program_parts is None:
+            self._program_parts = []
+        elif tag == "table":
+            if self._in_table:
+                self._close_table()
+            if _has_class(attrs, "table"):
+                self._in_table = True
+                self._table_announced = False
+                self._header = None
+                self._header_found = False
+                self._header_parts = None
+        elif not self._in_table:
+            return
+        elif tag == "tbody":
+            self._in_tbody = True
+        elif tag == "tr" and self._in_tbody:
+            self._close_row()
+            self._announce_table()
+            self._row = []
+            if self._with_raw:
+                self._raw = [_start_tag(tag, attrs)]
+                self._raw_stack = ["tr"]
+        elif tag in ("td", "th") and self._row is not None:
+            self._close_cell()
+            self._cell_parts = []
+
+    def handle_endtag(self, tag):
+        self._flush_text()
+        if self._raw is not None and tag != "tr" and tag in self._raw_stack:
+            while self._raw_stack[-1] != tag:
+                self._raw.append(f"</{self._raw_stack.pop()}>")
+            self._raw.append(f"</{self._raw_stack.pop()}>")
+
+        if tag == "div":
+            if self._top_depth:
+                self._top_depth -= 1
+                if not self._top_depth:
+                    self._top_done = True
+            elif self._header_parts is not None:
+                self._header = self._join(self._header_parts)
+                self._header_parts = None
+        elif tag == "span" and self._span_parts is not None:
+            text = self._join(self._span_parts)
+            self._span_parts = None
+            self._spans_seen += 1
+            self.events.append(("university" if self._spans_seen == 1 else "director", text))
+        elif tag == "b" and self._program_parts is not None:
+            self.events.append(("program", self._join(self._program_parts)))
+            self._program_parts = None
+            self._program_done = True
+            self._in_header_p = False
+        elif tag == "p" and self._in_header_p:
+            self._in_header_p = False
+        elif tag == "table" and self._in_table:
+            self._close_table()
+        elif not self._in_table:
+            return
+        elif tag == "tbody":
+            self._close_row()
+            self._in_tbody = False
+        elif tag == "tr":
+            self._close_row()
+        elif tag in ("td", "th"):
+            self._close_cell()
+
+    def close(self):
+        super().close()
+        self._flush_text()
+        if self._in_table:
+            self._close_table()
+
+def iter_rating_events(path: str, chunk_size: int = STREAM_CHUNK_SIZE, with_raw: bool = False):
+    parser = _RatingParser(with_raw)
+    with open(path, "r", encoding="utf-8") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            parser.feed(chunk)
+            if parser.events:
+                yield from parser.events
+                parser.events = []
+    parser.close()
+    yield from parser.events
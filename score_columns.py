@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+Колоночная агрегация баллов для pl_json (движок AGG_ENGINE = "numpy").
+
+Все допущенные баллы университета один раз складываются в колонки
+(direction, form, kind, cat, value), где direction — индекс группы направлений по коду.
+Сырые строки сворачиваются одной сгруппированной редукцией до самых мелких групп
+(направление, форма, вид, категория, балл) — число строк и позиция первой;
+все остальные уровни (направление, факультет, университет и их разрезы) получаются
+повторной редукцией этих групп, а не копированием списков баллов между уровнями.
+Из счётчиков по баллам собираются ScoreSummary (min / avg / max / перцентили).
+
+Порядок категорий в выходных словарях — порядок первого появления в потоке,
+как у defaultdict(list) в построчном движке; для этого у группы хранится позиция
+её первой строки.
+
+NumPy необязателен: без него available() -> False и pl_json считает по-старому.
+"""
+from array import array
+from score_summary import ScoreSummary
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+def available() -> bool:
+    return np is not None
+
+class ScoreColumns:
+    """Колонки допущенных баллов одного университета (int32: баллы и коды небольшие)"""
+
+    def __init__(self):
+        self.direction = array("i")
+        self.form = array("i")
+        self.kind = array("i")
+        self.cat = array("i")
+        self.value = array("i")
+        self.cat_codes = {}            # название категории -> код
+        self.cat_names = []            # код -> название
+
+    def cat_code(self, name: str) -> int:
+        code = self.cat_codes.get(name)
+        if code is None:
+            code = self.cat_codes[name] = len(self.cat_names)
+            self.cat_names.append(name)
+        return code
+
+    def extend(self, direction: int, form: int, kinds: list[int], cats: list[int], values: list[int]) -> None:
+        n = len(values)
+        self.direction.extend([direction] * n)
+        self.form.extend([form] * n)
+        self.kind.extend(kinds)
+        self.cat.extend(cats)
+        self.value.extend(values)
+
+    def __len__(self) -> int:
+        return len(self.value)
+
+    def arrays(self) -> dict:
+        return {name: np.frombuffer(getattr(self, name), dtype=np.int32)
+                for name in ("direction", "form", "kind", "cat", "value")}
+
+# --------- Сгруппированные редукции ---------
+def owner_map(owners: list[int]):
+    """Массив направление -> группа уровня (факультет, университет) для columnar-уровней"""
+    return np.asarray(owners or [0], dtype=np.int64)
+
+def _encode(parts: list, radices: list[int]):
+    code = np.zeros(len(parts[0]), dtype=np.int64)
+    for part, radix in zip(parts, radices):
+        code = code * radix + part
+    return code
+
+def reduce_rows(parts: list, radices: list[int]) -> dict:
+    """Сырые строки -> группы по parts (parts[i] < radices[i]): число строк и первая позиция"""
+    n = len(parts[0])
+    return regroup({"first": np.arange(n, dtype=np.int64), "count": np.ones(n, dtype=np.int64)}, parts, radices)
+
+def regroup(groups: dict, parts: list, radices: list[int]) -> dict:
+    """Укрупнение групп: parts — новый ключ для каждой исходной группы"""
+    if not len(groups["first"]):
+        return {"parts": [p[:0] for p in parts], "first": groups["first"][:0], "count": groups["count"][:0]}
+    code = _encode(parts, radices)
+    order = np.argsort(code, kind="stable")
+    code = code[order]
+    starts = np.flatnonzero(np.r_[True, code[1:] != code[:-1]])
+    return {
+        "parts": [np.asarray(p)[order][starts] for p in parts],
+        "first": np.minimum.reduceat(groups["first"][order], starts),
+        "count": np.add.reduceat(groups["count"][order], starts),
+    }
+
+def summaries(groups: dict) -> dict:
+    """
+    Группы, у которых последняя часть ключа — сам балл -> {ключ без балла: (первая позиция, ScoreSummary)}.
+    Строки идут по возрастанию ключа, т.е. баллы группы подряд и по возрастанию.
+    """
+    parts, value, count = groups["parts"][:-1], groups["parts"][-1], groups["count"]
+    if not len(value):
+        return {}
+    change = np.zeros(len(value), dtype=bool)
+    change[0] = True
+    for p in parts:
+        change[1:] |= p[1:] != p[:-1]
+    starts = np.flatnonzero(change)
+    ends = np.r_[starts[1:], len(value)]
+    value = value.astype(np.int64)
+    keys = zip(*(p[starts].tolist() for p in parts))
+    values, counts = value.tolist(), count.tolist()
+    out = {}
+    for key, first, n, total, start, end in zip(
+            keys, np.minimum.reduceat(groups["first"], starts).tolist(), np.add.reduceat(count, starts).tolist(),
+            np.add.reduceat(value * count, starts).tolist(), starts.tolist(), ends.tolist()):
+        out[key] = (first, ScoreSummary.build(n, total, values[start], values[end - 1],
+                                              dict(zip(values[start:end], counts[start:end]))))
+    return out
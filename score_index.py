@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+Индекс «куда я прохожу с баллом X» (results/score_index.json).
+
+Для каждой тройки (форма оплаты, категория, вид балла) — направления, отсортированные
+по минимальному баллу допущенных: поиск «минимум ≤ X» — один bisect, ответ — префикс
+списка. Категория "*" — все категории вместе. Рядом с каждым направлением хранится
+порог из parse_threshold (Негизги балл); если передан основной балл абитуриента,
+направления с порогом выше него отсекаются.
+
+Строится в pl_json (стадия 5) из тех же допущенных баллов, что и статистика:
+    build(universities, scores_of, kinds) -> ScoreIndex
+
+Запрос из кода:
+    idx = ScoreIndex.load()
+    idx.lookup(185, form="Бюджет", category="Бишкек")          # [{"min_score": ..., направление}]
+Из командной строки:
+    python score_index.py 185 --form Бюджет --category Бишкек [--kind total] [--main 120]
+"""
+import os
+import sys
+import time
+import argparse
+from array import array
+from bisect import bisect_right
+from output_format import dumps_json, loads_json
+
+SCORE_INDEX_PATH = os.path.join("results", "score_index.json")
+ALL_CATEGORIES = "*"
+INDEX_VERSION = 1
+
+# поля направления в индексе (из results/universities.json + факультет/университет)
+DIRECTION_FIELDS = ["university", "faculty", "code", "major", "specialty", "education_type",
+                    "payment_form", "plan", "threshold_main", "extra_required", "rating_json"]
+
+def index_key(form: str | None, category: str, kind: str) -> str:
+    return f"{form}|{category}|{kind}"
+
+class ScoreIndex:
+    __slots__ = ("directions", "keys")
+
+    def __init__(self, directions: list[dict], keys: dict):
+        self.directions = directions
+        # ключ -> (минимальные баллы по возрастанию, id направлений, пороги main; 0 — порога нет)
+        self.keys = keys
+
+    # --------- Запросы ---------
+    def lookup_ids(self, score: int, *, form: str, category: str = ALL_CATEGORIES, kind: str = "total",
+                   main_score: int | None = None) -> list[tuple[int, int]]:
+        """[(минимальный балл допущенных, id направления)] для всех направлений с минимумом ≤ score"""
+        entry = self.keys.get(index_key(form, category, kind))
+        if entry is None:
+            return []
+        mins, ids, thresholds = entry
+        n = bisect_right(mins, score)
+        if main_score is None:
+            return list(zip(mins[:n], ids[:n]))
+        return [(m, d) for m, d, t in zip(mins[:n], ids[:n], thresholds[:n]) if t <= main_score]
+
+    def lookup(self, score: int, *, form: str, category: str = ALL_CATEGORIES, kind: str = "total",
+               main_score: int | None = None, limit: int | None = None) -> list[dict]:
+        """Направления с минимумом ≤ score, ближайшие к баллу — первыми"""
+        found = self.lookup_ids(score, form=form, category=category, kind=kind, main_score=main_score)
+        found.reverse()
+        if limit is not None:
+            found = found[:limit]
+        return [{"min_score": m, **self.directions[d]} for m, d in found]
+
+    def categories(self, form: str, kind: str = "total") -> list[str]:
+        prefix, suffix = f"{form}|", f"|{kind}"
+        return sorted(k[len(prefix):-len(suffix)] for k in self.keys if k.startswith(prefix) and k.endswith(suffix))
+
+    # --------- Файл ---------
+    def to_json(self) -> dict:
+        return {
+            "version": INDEX_VERSION,
+            "fields": DIRECTION_FIELDS,
+            "directions": [[d[f] for f in DIRECTION_FIELDS] for d in self.directions],
+            "index": {k: [list(mins), list(ids), list(th)] for k, (mins, ids, th) in self.keys.items()},
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "ScoreIndex":
+        if data.get("version") != INDEX_VERSION:
+            raise ValueError(f"Неподдерживаемая версия индекса: {data.get('version')}")
+        fields = data["fields"]
+        directions = [dict(zip(fields, row)) for row in data["directions"]]
+        keys = {k: (array("i", mins), array("i", ids), array("i", th)) for k, (mins, ids, th) in data["index"].items()}
+        return cls(directions, keys)
+
+    def save(self, path: str = SCORE_INDEX_PATH) -> None:
+        with open(path, "wb") as f:
+            f.write(dumps_json(self.to_json(), pretty=False))
+
+    @classmethod
+    def load(cls, path: str = SCORE_INDEX_PATH) -> "ScoreIndex":
+        with open(path, "rb") as f:
+            return cls.from_json(loads_json(f.read()))
+
+# --------- Сборка ---------
+def direction_mins(scores, kinds: list[str]) -> dict:
+    """Допущенные баллы рейтинга -> {(категория, вид): минимум}, включая категорию "*" """
+    mins = {}
+    for ci, k, val in zip(scores.cat, scores.kind, scores.value):
+        for key in ((scores.categories[ci], kinds[k]), (ALL_CATEGORIES, kinds[k])):
+            prev = mins.get(key)
+            if prev is None or val < prev:
+                mins[key] = val
+    return mins
+
+def build(universities: list[dict], scores_of, kinds: list[str]) -> ScoreIndex:
+    """
+    universities — results/universities.json; scores_of(rating_json) -> допущенные баллы
+    (pl_json.RatingScores) или None; kinds — названия видов по индексу kind.
+    """
+    directions = []
+    buckets = {}                       # ключ -> [(минимум, id, порог)]
+    for uni in universities:
+        for fac in uni.get("faculties", []):
+            for d in fac.get("directions", []):
+                scores = scores_of(d.get("rating_json")) if d.get("rating_json") else None
+                mins = direction_mins(scores, kinds) if scores is not None else None
+                if not mins:
+                    continue   # нет допущенных — направлению нечего сравнивать с баллом
+                threshold = d.get("threshold") or {}
+                did = len(directions)
+                directions.append({
+                    "university": uni.get("name"),
+                    "faculty": fac.get("faculty_name"),
+                    "code": d.get("code"),
+                    "major": d.get("major"),
+                    "specialty": d.get("specialty"),
+                    "education_type": d.get("education_type"),
+                    "payment_form": d.get("payment_form"),
+                    "plan": d.get("plan"),
+                    "threshold_main": threshold.get("main_score"),
+                    "extra_required": threshold.get("extra_required"),
+                    "rating_json": d.get("rating_json"),
+                })
+                for (cat, kind), m in mins.items():
+                    buckets.setdefault(index_key(d.get("payment_form"), cat, kind), []).append(
+                        (m, did, threshold.get("main_score") or 0))
+    keys = {}
+    for key, rows in buckets.items():
+        rows.sort()
+        keys[key] = tuple(array("i", col) for col in zip(*rows))
+    return ScoreIndex(directions, keys)
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("score", type=int)
+    ap.add_argument("--form", default="Бюджет")
+    ap.add_argument("--category", default=ALL_CATEGORIES)
+    ap.add_argument("--kind", default="total", choices=["main", "extra", "total"])
+    ap.add_argument("--main", type=int, default=None, help="основной балл: отсечь направления с порогом выше")
+    ap.add_argument("--limit", type=int, default=20)
+    ap.add_argument("--path", default=SCORE_INDEX_PATH)
+    args = ap.parse_args()
+    if not os.path.exists(args.path):
+        sys.exit(f"Нет {args.path} — сначала python pl_json.py")
+    idx = ScoreIndex.load(args.path)
+    t0 = time.perf_counter()
+    found = idx.lookup_ids(args.score, form=args.form, category=args.category, kind=args.kind,
+                           main_score=args.main)
+    dt = time.perf_counter() - t0
+    for row in idx.lookup(args.score, form=args.form, category=args.category, kind=args.kind,
+                          main_score=args.main, limit=args.limit):
+        print(f"{row['min_score']:>4}  {row['code']}  {row['specialty']} — {row['university']}")
+    print(f"✅ Направлений: {len(found)} (поиск {dt * 1e6:.0f} мкс)")
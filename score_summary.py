@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+Сливаемая сводка набора баллов: count / sum / min / max + распределение.
+
+Уровни pl_json (направление -> факультет -> университет -> GLOBAL) сливают сводки
+(merge), а не склеивают списки баллов, поэтому память агрегации — O(число групп),
+а не O(заявки × уровни). Из сводки получается тот же {"min", "avg", "max"},
+что давал safe_stats() по списку.
+
+Баллы ОРТ — целые из ограниченного диапазона (до ~500), поэтому распределение
+хранится точно: счётчик на каждое встреченное значение. Размер сводки ограничен
+диапазоном баллов, слияние — сложение счётчиков, а перцентили и гистограмма
+считаются по счётчикам точно (без приближений t-digest/KLL).
+"""
+
+from bisect import bisect_right
+from itertools import accumulate
+
+PERCENTILES = (25, 50, 75, 90)
+HISTOGRAM_BIN = 10                     # ширина корзины гистограммы, баллов
+
+class ScoreSummary:
+    __slots__ = ("count", "total", "min", "max", "counts")
+
+    def __init__(self, distribution: bool = True):
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+        self.counts = {} if distribution else None   # значение -> число; None -> без распределения
+
+    @classmethod
+    def build(cls, count: int, total: int, min: int | None, max: int | None,
+              counts: dict | None) -> "ScoreSummary":
+        """Сводка из готовых полей (колоночный движок, кэш)"""
+        s = cls(distribution=False)
+        s.count, s.total, s.min, s.max, s.counts = count, total, min, max, counts
+        return s
+
+    @classmethod
+    def of(cls, values, distribution: bool = True) -> "ScoreSummary":
+        s = cls(distribution)
+        for v in values:
+            s.add(v)
+        return s
+
+    def add(self, value: int, n: int = 1) -> None:
+        if not self.count:
+            self.min = self.max = value
+        elif value < self.min:
+            self.min = value
+        elif value > self.max:
+            self.max = value
+        self.count += n
+        self.total += value * n
+        if self.counts is not None:
+            self.counts[value] = self.counts.get(value, 0) + n
+
+    def merge(self, other: "ScoreSummary") -> "ScoreSummary":
+        if other.count:
+            if not self.count:
+                self.min, self.max = other.min, other.max
+            else:
+                self.min = min(self.min, other.min)
+                self.max = max(self.max, other.max)
+            self.count += other.count
+            self.total += other.total
+            if self.counts is not None:
+                for value, n in other.counts.items():
+                    self.counts[value] = self.counts.get(value, 0) + n
+        return self
+
+    def __bool__(self) -> bool:
+        return self.count > 0
+
+    def __repr__(self) -> str:
+        return f"ScoreSummary(count={self.count}, total={self.total}, min={self.min}, max={self.max})"
+
+    def mean(self):
+        # как statistics.mean для целых: точная дробь -> int, если делится нацело, иначе float
+        if isinstance(self.total, int) and self.total % self.count == 0:
+            return self.total // self.count
+        return self.total / self.count
+
+    def percentiles(self) -> dict:
+        """Линейная интерполяция между соседними рангами (как numpy.percentile по умолчанию)"""
+        values = sorted(self.counts)
+        ends = list(accumulate(self.counts[v] for v in values))   # values[i] занимает ранги [ends[i-1], ends[i])
+        out = {}
+        for p in PERCENTILES:
+            h = (self.count - 1) * p / 100
+            lo = int(h)
+            i = bisect_right(ends, lo)
+            x = values[i]
+            if h > lo:
+                nxt = x if lo + 1 < ends[i] else values[i + 1]
+                x = x + (nxt - x) * (h - lo)
+            x = round(x, 2)
+            out[f"p{p}"] = int(x) if x == int(x) else x
+        return out
+
+    def histogram(self) -> dict:
+        """{"начало корзины": число} по непустым корзинам шириной HISTOGRAM_BIN, по возрастанию"""
+        bins = {}
+        for value, n in self.counts.items():
+            start = value // HISTOGRAM_BIN * HISTOGRAM_BIN
+            bins[start] = bins.get(start, 0) + n
+        return {str(start): bins[start] for start in sorted(bins)}
+
+    def stats(self) -> dict | None:
+        if not self.count:
+            return None
+        out = {"min": self.min, "avg": round(self.mean(), 2), "max": self.max}
+        if self.counts is not None:
+            out["percentiles"] = self.percentiles()
+            out["histogram"] = self.histogram()
+        return out
+
+    # кэш вкладов университетов (results/cache) хранит сводки списком
+    def to_json(self) -> list:
+        counts = None if self.counts is None else sorted(self.counts.items())
+        return [self.count, self.total, self.min, self.max, counts]
+
+    @classmethod
+    def from_json(cls, data: list) -> "ScoreSummary":
+        count, total, mn, mx, counts = data
+        return cls.build(count, total, mn, mx, None if counts is None else {value: n for value, n in counts})